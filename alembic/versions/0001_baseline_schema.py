@@ -0,0 +1,121 @@
+"""baseline schema
+
+Tables as the app created them with Base.metadata.create_all before
+migrations were tracked. Existing tables are left untouched, so databases
+created that way can simply be upgraded.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _missing(table: str) -> bool:
+    return not sa.inspect(op.get_bind()).has_table(table)
+
+
+def upgrade() -> None:
+    if _missing('retailers'):
+        op.create_table(
+            'retailers',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('name', sa.String(100)),
+            sa.Column('base_url', sa.String(500)),
+            sa.Column('logo_url', sa.String(500), nullable=True),
+            sa.Column('is_active', sa.Boolean()),
+            sa.Column('scraper_type', sa.String(50)),
+            sa.Column('config', sa.JSON()),
+            sa.Column('created_at', sa.DateTime()),
+        )
+        op.create_index('ix_retailers_id', 'retailers', ['id'])
+        op.create_index('ix_retailers_name', 'retailers', ['name'], unique=True)
+
+    if _missing('products'):
+        op.create_table(
+            'products',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('name', sa.String(500)),
+            sa.Column('category', sa.String(50)),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('image_url', sa.String(500), nullable=True),
+            sa.Column('source_url', sa.String(500), nullable=True),
+            sa.Column('is_active', sa.Boolean()),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime()),
+            sa.Column('model_identifier', sa.String(100), nullable=True),
+            sa.Column('release_year', sa.Integer(), nullable=True),
+            sa.Column('specs', sa.JSON()),
+            sa.Column('set_name', sa.String(100), nullable=True),
+            sa.Column('card_number', sa.String(20), nullable=True),
+            sa.Column('rarity', sa.String(50), nullable=True),
+            sa.Column('condition', sa.String(20), nullable=True),
+            sa.Column('brand', sa.String(100), nullable=True),
+            sa.Column('model', sa.String(100), nullable=True),
+            sa.Column('attributes', sa.JSON()),
+        )
+        op.create_index('ix_products_id', 'products', ['id'])
+        op.create_index('ix_products_name', 'products', ['name'])
+        op.create_index('ix_products_category', 'products', ['category'])
+
+    if _missing('prices'):
+        op.create_table(
+            'prices',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('product_id', sa.Integer(), sa.ForeignKey('products.id')),
+            sa.Column('retailer_id', sa.Integer(), sa.ForeignKey('retailers.id')),
+            sa.Column('price', sa.Float()),
+            sa.Column('currency', sa.String(3)),
+            sa.Column('condition', sa.String(50), nullable=True),
+            sa.Column('availability', sa.String(50), nullable=True),
+            sa.Column('listing_url', sa.String(500), nullable=True),
+            sa.Column('listing_title', sa.String(500), nullable=True),
+            sa.Column('seller_rating', sa.Float(), nullable=True),
+            sa.Column('shipping_cost', sa.Float(), nullable=True),
+            sa.Column('scraped_at', sa.DateTime()),
+        )
+        op.create_index('ix_prices_id', 'prices', ['id'])
+
+    if _missing('price_alerts'):
+        op.create_table(
+            'price_alerts',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('product_id', sa.Integer(), sa.ForeignKey('products.id')),
+            sa.Column('target_price', sa.Float()),
+            sa.Column('condition', sa.String(20)),
+            sa.Column('is_active', sa.Boolean()),
+            sa.Column('email', sa.String(255), nullable=True),
+            sa.Column('webhook_url', sa.String(500), nullable=True),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('last_triggered', sa.DateTime(), nullable=True),
+            sa.Column('trigger_count', sa.Integer()),
+        )
+        op.create_index('ix_price_alerts_id', 'price_alerts', ['id'])
+
+    if _missing('price_history'):
+        op.create_table(
+            'price_history',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('product_id', sa.Integer(), sa.ForeignKey('products.id')),
+            sa.Column('retailer_id', sa.Integer(), sa.ForeignKey('retailers.id')),
+            sa.Column('price', sa.Float()),
+            sa.Column('recorded_at', sa.DateTime()),
+            sa.Column('avg_price', sa.Float(), nullable=True),
+            sa.Column('min_price', sa.Float(), nullable=True),
+            sa.Column('max_price', sa.Float(), nullable=True),
+        )
+        op.create_index('ix_price_history_id', 'price_history', ['id'])
+
+
+def downgrade() -> None:
+    for table in ('price_history', 'price_alerts', 'prices', 'products', 'retailers'):
+        op.drop_table(table)
@@ -0,0 +1,142 @@
+"""scrape scheduling and ingest tables
+
+Sweep checkpoints, adaptive schedules, the scrape work queue, the
+latest_prices read model and the unique (name, category) product index used
+by the ingest upsert. Duplicate products are merged into the lowest id
+before the unique index is built.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+# Rows of these tables follow their product into the surviving duplicate
+PRODUCT_CHILDREN = ('prices', 'price_alerts', 'price_history')
+
+DUPLICATE = (
+    "EXISTS (SELECT 1 FROM products keep WHERE keep.name = {alias}.name "
+    "AND keep.category = {alias}.category AND keep.id < {alias}.id)"
+)
+
+
+def _missing(table: str) -> bool:
+    return not sa.inspect(op.get_bind()).has_table(table)
+
+
+def _has_index(table: str, name: str) -> bool:
+    return any(index['name'] == name for index in sa.inspect(op.get_bind()).get_indexes(table))
+
+
+def _merge_duplicate_products() -> None:
+    for table in PRODUCT_CHILDREN:
+        op.execute(
+            f"UPDATE {table} SET product_id = ("
+            "SELECT MIN(keep.id) FROM products dup JOIN products keep "
+            "ON keep.name = dup.name AND keep.category = dup.category "
+            f"WHERE dup.id = {table}.product_id) "
+            f"WHERE product_id IN (SELECT id FROM products p WHERE {DUPLICATE.format(alias='p')})"
+        )
+    op.execute(f"DELETE FROM products WHERE {DUPLICATE.format(alias='products')}")
+
+
+def upgrade() -> None:
+    if not _has_index('products', 'uq_products_name_category'):
+        _merge_duplicate_products()
+        op.create_index('uq_products_name_category', 'products', ['name', 'category'], unique=True)
+
+    if _missing('latest_prices'):
+        op.create_table(
+            'latest_prices',
+            sa.Column('product_id', sa.Integer(), sa.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True),
+            sa.Column('retailer_id', sa.Integer(), sa.ForeignKey('retailers.id'), primary_key=True),
+            sa.Column('condition', sa.String(50), primary_key=True),
+            sa.Column('price_id', sa.Integer()),
+            sa.Column('price', sa.Float()),
+            sa.Column('currency', sa.String(3)),
+            sa.Column('availability', sa.String(50), nullable=True),
+            sa.Column('listing_url', sa.String(500), nullable=True),
+            sa.Column('listing_title', sa.String(500), nullable=True),
+            sa.Column('seller_rating', sa.Float(), nullable=True),
+            sa.Column('shipping_cost', sa.Float(), nullable=True),
+            sa.Column('scraped_at', sa.DateTime()),
+            sa.Column('previous_price', sa.Float(), nullable=True),
+            sa.Column('lowest_price', sa.Float()),
+        )
+        # Seeded from the existing history; `python -m app.services.latest_prices rebuild` also fills previous_price
+        op.execute(
+            "INSERT INTO latest_prices (product_id, retailer_id, condition, price_id, price, currency, "
+            "availability, listing_url, listing_title, seller_rating, shipping_cost, scraped_at, lowest_price) "
+            "SELECT product_id, retailer_id, condition_key, id, price, COALESCE(currency, 'USD'), availability, "
+            "listing_url, listing_title, seller_rating, shipping_cost, scraped_at, lowest_price FROM ("
+            "SELECT prices.*, COALESCE(condition, 'unknown') AS condition_key, "
+            "ROW_NUMBER() OVER (PARTITION BY product_id, retailer_id, COALESCE(condition, 'unknown') "
+            "ORDER BY scraped_at DESC, price, id) AS row_rank, "
+            "MIN(price) OVER (PARTITION BY product_id, retailer_id, COALESCE(condition, 'unknown')) AS lowest_price "
+            "FROM prices) ranked WHERE row_rank = 1"
+        )
+
+    if _missing('scrape_checkpoints'):
+        op.create_table(
+            'scrape_checkpoints',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('retailer_id', sa.Integer(), sa.ForeignKey('retailers.id')),
+            sa.Column('last_product_id', sa.Integer()),
+            sa.Column('completed_sweeps', sa.Integer()),
+            sa.Column('sweep_started_at', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime()),
+        )
+        op.create_index('ix_scrape_checkpoints_id', 'scrape_checkpoints', ['id'])
+        op.create_index('ix_scrape_checkpoints_retailer_id', 'scrape_checkpoints', ['retailer_id'], unique=True)
+
+    if _missing('scrape_schedules'):
+        op.create_table(
+            'scrape_schedules',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('product_id', sa.Integer(), sa.ForeignKey('products.id', ondelete='CASCADE')),
+            sa.Column('retailer_id', sa.Integer(), sa.ForeignKey('retailers.id')),
+            sa.Column('next_due_at', sa.DateTime()),
+            sa.Column('interval_minutes', sa.Float()),
+            sa.Column('volatility', sa.Float()),
+            sa.Column('alert_proximity', sa.Float(), nullable=True),
+            sa.Column('last_scraped_at', sa.DateTime(), nullable=True),
+            sa.UniqueConstraint('product_id', 'retailer_id', name='uq_scrape_schedules_product_retailer'),
+        )
+        op.create_index('ix_scrape_schedules_id', 'scrape_schedules', ['id'])
+        op.create_index('ix_scrape_schedules_product_id', 'scrape_schedules', ['product_id'])
+        op.create_index('ix_scrape_schedules_next_due_at', 'scrape_schedules', ['next_due_at'])
+
+    if _missing('scrape_jobs'):
+        op.create_table(
+            'scrape_jobs',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('product_id', sa.Integer(), sa.ForeignKey('products.id', ondelete='CASCADE')),
+            sa.Column('retailer_id', sa.Integer(), sa.ForeignKey('retailers.id')),
+            sa.Column('status', sa.String(20)),
+            sa.Column('run_after', sa.DateTime()),
+            sa.Column('attempts', sa.Integer()),
+            sa.Column('last_error', sa.Text(), nullable=True),
+            sa.Column('lease_owner', sa.String(100), nullable=True),
+            sa.Column('leased_until', sa.DateTime(), nullable=True),
+            sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_scrape_jobs_id', 'scrape_jobs', ['id'])
+        op.create_index('ix_scrape_jobs_product_id', 'scrape_jobs', ['product_id'])
+        op.create_index('ix_scrape_jobs_claim', 'scrape_jobs', ['status', 'run_after'])
+
+
+def downgrade() -> None:
+    for table in ('scrape_jobs', 'scrape_schedules', 'scrape_checkpoints', 'latest_prices'):
+        op.drop_table(table)
+    op.drop_index('uq_products_name_category', table_name='products')
@@ -0,0 +1,47 @@
+"""price time-series indexes
+
+prices and price_history are read per product newest-first (history,
+alert checks, restock checks, volatility) and by time range (daily
+summary, restock window). Until now both only had primary-key indexes.
+
+On PostgreSQL the indexes are built CONCURRENTLY so ingest keeps writing
+while they build.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# (name, table, columns); must match the standalone Index() declarations in app/models.py
+INDEXES = [
+    ('ix_prices_product_scraped_at', 'prices', ['product_id', sa.text('scraped_at DESC')]),
+    ('ix_prices_scraped_at', 'prices', ['scraped_at']),
+    ('ix_price_history_product_recorded_at', 'price_history', ['product_id', sa.text('recorded_at DESC')]),
+    ('ix_price_history_recorded_at', 'price_history', ['recorded_at']),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+    # Fresh statistics so the planner picks the new indexes right away
+    op.execute('ANALYZE prices')
+    op.execute('ANALYZE price_history')
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
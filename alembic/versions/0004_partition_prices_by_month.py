@@ -0,0 +1,123 @@
+"""partition prices by month (PostgreSQL)
+
+Rebuilds prices as a table range-partitioned on scraped_at, with one
+partition per month of existing data plus a few months ahead, and a DEFAULT
+partition so ingest never fails if the retention job falls behind. Partitions
+let the retention job drop whole expired months instead of DELETE + VACUUM.
+
+The primary key becomes (id, scraped_at) because Postgres requires the
+partition key in unique constraints; ids still come from prices_id_seq.
+The existing rows are copied in this migration, so run it in a maintenance
+window on large tables. No-op on other databases.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:00
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+COLUMNS = (
+    "product_id INTEGER REFERENCES products (id), "
+    "retailer_id INTEGER REFERENCES retailers (id), "
+    "price FLOAT, "
+    "currency VARCHAR(3), "
+    "condition VARCHAR(50), "
+    "availability VARCHAR(50), "
+    "listing_url VARCHAR(500), "
+    "listing_title VARCHAR(500), "
+    "seller_rating FLOAT, "
+    "shipping_cost FLOAT"
+)
+
+INDEXES = ('ix_prices_id', 'ix_prices_product_scraped_at', 'ix_prices_scraped_at')
+
+
+def _month(year: int, month: int, offset: int = 0) -> datetime:
+    month = year * 12 + month - 1 + offset
+    return datetime(month // 12, month % 12 + 1, 1)
+
+
+def _is_postgres() -> bool:
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def _create_indexes() -> None:
+    op.create_index('ix_prices_id', 'prices', ['id'])
+    op.create_index('ix_prices_product_scraped_at', 'prices', ['product_id', sa.text('scraped_at DESC')])
+    op.create_index('ix_prices_scraped_at', 'prices', ['scraped_at'])
+
+
+def upgrade() -> None:
+    if not _is_postgres():
+        return
+
+    bind = op.get_bind()
+    op.execute('ALTER TABLE prices RENAME TO prices_legacy')
+    op.execute('ALTER TABLE prices_legacy RENAME CONSTRAINT prices_pkey TO prices_legacy_pkey')
+    for index in INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {index}')
+
+    op.execute(
+        "CREATE TABLE prices ("
+        "id INTEGER NOT NULL DEFAULT nextval('prices_id_seq'), "
+        f"{COLUMNS}, "
+        "scraped_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc'), "
+        "PRIMARY KEY (id, scraped_at)"
+        ") PARTITION BY RANGE (scraped_at)"
+    )
+    op.execute('ALTER SEQUENCE prices_id_seq OWNED BY prices.id')
+
+    now = datetime.utcnow()
+    first = bind.execute(sa.text('SELECT MIN(scraped_at) FROM prices_legacy')).scalar() or now
+    month, last = _month(first.year, first.month), _month(now.year, now.month, MONTHS_AHEAD)
+    while month <= last:
+        end = _month(month.year, month.month, 1)
+        op.execute(
+            f"CREATE TABLE prices_y{month.year}m{month.month:02d} PARTITION OF prices "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+        )
+        month = end
+    op.execute('CREATE TABLE prices_default PARTITION OF prices DEFAULT')
+
+    op.execute(
+        "INSERT INTO prices SELECT id, product_id, retailer_id, price, currency, condition, availability, "
+        "listing_url, listing_title, seller_rating, shipping_cost, "
+        "COALESCE(scraped_at, now() AT TIME ZONE 'utc') FROM prices_legacy"
+    )
+    op.execute('DROP TABLE prices_legacy')
+    _create_indexes()
+    op.execute('ANALYZE prices')
+
+
+def downgrade() -> None:
+    if not _is_postgres():
+        return
+
+    op.execute('ALTER TABLE prices RENAME TO prices_partitioned')
+    op.execute('ALTER TABLE prices_partitioned RENAME CONSTRAINT prices_pkey TO prices_partitioned_pkey')
+    for index in INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {index}')
+    op.execute(
+        "CREATE TABLE prices ("
+        "id INTEGER NOT NULL DEFAULT nextval('prices_id_seq') PRIMARY KEY, "
+        f"{COLUMNS}, "
+        "scraped_at TIMESTAMP WITHOUT TIME ZONE"
+        ")"
+    )
+    op.execute('ALTER SEQUENCE prices_id_seq OWNED BY prices.id')
+    op.execute('INSERT INTO prices SELECT * FROM prices_partitioned')
+    op.execute('DROP TABLE prices_partitioned')
+    _create_indexes()
@@ -0,0 +1,45 @@
+"""product keyset pagination indexes and best_price
+
+products.best_price holds the lowest latest_prices price so best-price
+ordering can page through an index like name and created_at do.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+# (name, columns); must match Product.__table_args__ in app/models.py
+INDEXES = [
+    ('ix_products_name_id', ['name', 'id']),
+    ('ix_products_created_at_id', ['created_at', 'id']),
+    ('ix_products_best_price_id', ['best_price', 'id']),
+]
+
+
+def upgrade() -> None:
+    if 'best_price' not in {column['name'] for column in sa.inspect(op.get_bind()).get_columns('products')}:
+        op.add_column('products', sa.Column('best_price', sa.Float(), nullable=True))
+    op.execute(
+        "UPDATE products SET best_price = "
+        "(SELECT MIN(price) FROM latest_prices WHERE latest_prices.product_id = products.id)"
+    )
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, 'products', columns, if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='products', postgresql_concurrently=True)
+    op.drop_column('products', 'best_price')
@@ -0,0 +1,66 @@
+"""product full-text search index
+
+PostgreSQL: weighted tsvector generated column on products with a GIN
+index, and pg_trgm with a trigram GIN index on name for fuzzy matches.
+SQLite: FTS5 external-content table kept in sync by triggers, filled from
+the existing rows. Same DDL as PRODUCT_SEARCH_DDL in app/models.py.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+POSTGRES = [
+    "ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(brand, '') || ' ' || coalesce(model, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'C')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING gin (search_vector)",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops)",
+]
+
+SQLITE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+    "name, brand, model, description, content='products', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN "
+    "INSERT INTO products_fts (rowid, name, brand, model, description) "
+    "VALUES (new.id, new.name, new.brand, new.model, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN "
+    "INSERT INTO products_fts (products_fts, rowid, name, brand, model, description) "
+    "VALUES ('delete', old.id, old.name, old.brand, old.model, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, brand, model, description ON products BEGIN "
+    "INSERT INTO products_fts (products_fts, rowid, name, brand, model, description) "
+    "VALUES ('delete', old.id, old.name, old.brand, old.model, old.description); "
+    "INSERT INTO products_fts (rowid, name, brand, model, description) "
+    "VALUES (new.id, new.name, new.brand, new.model, new.description); END",
+    "INSERT INTO products_fts (products_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    for statement in POSTGRES if dialect == 'postgresql' else SQLITE if dialect == 'sqlite' else []:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_products_name_trgm')
+        op.execute('DROP INDEX IF EXISTS ix_products_search_vector')
+        op.execute('ALTER TABLE products DROP COLUMN IF EXISTS search_vector')
+    elif dialect == 'sqlite':
+        for trigger in ('products_fts_insert', 'products_fts_delete', 'products_fts_update'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS products_fts')
@@ -0,0 +1,47 @@
+"""notification outbox
+
+Alert notifications written in the same transaction as the alert claim and
+delivered by the outbox dispatcher with retries.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table('notification_outbox'):
+        return
+    op.create_table(
+        'notification_outbox',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('alert_id', sa.Integer(), sa.ForeignKey('price_alerts.id', ondelete='SET NULL'), nullable=True),
+        sa.Column('idempotency_key', sa.String(200), nullable=False, unique=True),
+        sa.Column('channel', sa.String(20)),
+        sa.Column('target', sa.String(500)),
+        sa.Column('payload', sa.JSON()),
+        sa.Column('status', sa.String(20)),
+        sa.Column('next_attempt_at', sa.DateTime()),
+        sa.Column('attempts', sa.Integer()),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('lease_owner', sa.String(100), nullable=True),
+        sa.Column('created_at', sa.DateTime()),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_notification_outbox_id', 'notification_outbox', ['id'])
+    op.create_index('ix_notification_outbox_alert_id', 'notification_outbox', ['alert_id'])
+    op.create_index('ix_notification_outbox_claim', 'notification_outbox', ['status', 'next_attempt_at'])
+
+
+def downgrade() -> None:
+    op.drop_table('notification_outbox')
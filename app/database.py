@@ -2,7 +2,7 @@
 Database configuration
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import DateTime, create_engine, func, type_coerce
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -41,3 +41,27 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def dialect_insert(db, table):
+    """INSERT supporting ON CONFLICT for the session's database (Postgres or SQLite)"""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+# SQLite stand-ins for date_trunc, in the format SQLAlchemy stores DateTime values
+SQLITE_BUCKETS = {
+    "hour": ("%Y-%m-%d %H:00:00.000000",),
+    "day": ("%Y-%m-%d 00:00:00.000000",),
+    "week": ("%Y-%m-%d 00:00:00.000000", "-6 days", "weekday 1"),  # Monday, like date_trunc
+}
+
+def time_bucket(db, column, unit: str):
+    """Start of the hour/day/week containing column, as a DateTime expression"""
+    if unit not in SQLITE_BUCKETS:
+        raise ValueError(f"Unsupported time bucket: {unit}")
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date_trunc(unit, column)
+    fmt, *modifiers = SQLITE_BUCKETS[unit]
+    return type_coerce(func.strftime(fmt, column, *modifiers), DateTime)
@@ -3,11 +3,16 @@ Price Aggregator API - Main Application
 FastAPI entry point with Tier 1-2 field support
 """
 
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from app.routers import products, alerts, retailers, mactrackr
+from app.services.email_sender import close_smtp_pools
+from app.services.notification_outbox import NOTIFICATION_DISPATCHER_ENABLED, get_outbox_dispatcher
+from app.services.response_cache import ResponseCacheMiddleware, response_cache_enabled
+from app.services.telegram_service import get_telegram_client
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -19,7 +24,17 @@ async def lifespan(app: FastAPI):
         print("✅ Database tables created/verified")
     except Exception as e:
         print(f"⚠️ Database setup warning: {e}")
+    # One pooled Telegram session for every alert sent by this process
+    telegram = get_telegram_client()
+    await telegram.start()
+    # Delivers alert notifications queued in notification_outbox
+    dispatcher = get_outbox_dispatcher()
+    if NOTIFICATION_DISPATCHER_ENABLED:
+        dispatcher.start()
     yield
+    await dispatcher.stop()
+    await telegram.close()
+    await asyncio.to_thread(close_smtp_pools)  # flush queued email, close SMTP connections
     print("🛑 Price Aggregator API shutting down...")
 
 app = FastAPI(
@@ -29,6 +44,10 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Cached product reads with ETag/304, inside CORS so 304s carry CORS headers
+if response_cache_enabled():
+    app.add_middleware(ResponseCacheMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -36,6 +55,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-Cache"],
 )
 
 # Include routers
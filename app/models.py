@@ -2,7 +2,7 @@
 SQLAlchemy Models with Tier 1-2 Field Support
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, JSON, Index, UniqueConstraint, DDL, event
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -23,6 +23,13 @@ class Retailer(Base):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        Index("uq_products_name_category", "name", "category", unique=True),
+        # Keyset pagination orderings: (sort key, id)
+        Index("ix_products_name_id", "name", "id"),
+        Index("ix_products_created_at_id", "created_at", "id"),
+        Index("ix_products_best_price_id", "best_price", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -35,6 +42,7 @@ class Product(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    best_price = Column(Float, nullable=True)  # lowest latest_prices price, maintained on ingest
 
     # Tier 2: Category-Specific Fields (JSON for flexibility)
     # Mac Products
@@ -57,6 +65,44 @@ class Product(Base):
 
     prices = relationship("Price", back_populates="product", cascade="all, delete-orphan")
     alerts = relationship("PriceAlert", back_populates="product", cascade="all, delete-orphan")
+    latest_prices = relationship("LatestPrice", back_populates="product", cascade="all, delete-orphan")
+
+# Full-text search over name, brand, model and description (app/services/product_search.py),
+# created with the table here and by alembic revision 0006 on existing databases.
+# Postgres: weighted tsvector generated column + GIN, and pg_trgm on name for fuzzy matches.
+# SQLite: FTS5 external-content table kept in sync by triggers.
+PRODUCT_SEARCH_DDL = {
+    "postgresql": [
+        "ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(brand, '') || ' ' || coalesce(model, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'C')) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING gin (search_vector)",
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops)",
+    ],
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+        "name, brand, model, description, content='products', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN "
+        "INSERT INTO products_fts (rowid, name, brand, model, description) "
+        "VALUES (new.id, new.name, new.brand, new.model, new.description); END",
+        "CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN "
+        "INSERT INTO products_fts (products_fts, rowid, name, brand, model, description) "
+        "VALUES ('delete', old.id, old.name, old.brand, old.model, old.description); END",
+        "CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, brand, model, description ON products BEGIN "
+        "INSERT INTO products_fts (products_fts, rowid, name, brand, model, description) "
+        "VALUES ('delete', old.id, old.name, old.brand, old.model, old.description); "
+        "INSERT INTO products_fts (rowid, name, brand, model, description) "
+        "VALUES (new.id, new.name, new.brand, new.model, new.description); END",
+    ],
+}
+
+for dialect, statements in PRODUCT_SEARCH_DDL.items():
+    for statement in statements:
+        event.listen(Product.__table__, "after_create", DDL(statement).execute_if(dialect=dialect))
+event.listen(Product.__table__, "before_drop", DDL("DROP TABLE IF EXISTS products_fts").execute_if(dialect="sqlite"))
 
 class Price(Base):
     __tablename__ = "prices"
@@ -81,6 +127,35 @@ class Price(Base):
     product = relationship("Product", back_populates="prices")
     retailer = relationship("Retailer", back_populates="prices")
 
+# Per-product history newest first, and time-range scans (alembic revision 0003)
+Index("ix_prices_product_scraped_at", Price.product_id, Price.scraped_at.desc())
+Index("ix_prices_scraped_at", Price.scraped_at)
+
+class LatestPrice(Base):
+    """Current best listing per product, retailer and condition, maintained on ingest"""
+    __tablename__ = "latest_prices"
+
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    retailer_id = Column(Integer, ForeignKey("retailers.id"), primary_key=True)
+    condition = Column(String(50), primary_key=True)  # Price.condition, 'unknown' when missing
+
+    # Lowest-priced listing from the most recent scrape
+    price_id = Column(Integer)
+    price = Column(Float)
+    currency = Column(String(3), default="USD")
+    availability = Column(String(50), nullable=True)
+    listing_url = Column(String(500), nullable=True)
+    listing_title = Column(String(500), nullable=True)
+    seller_rating = Column(Float, nullable=True)
+    shipping_cost = Column(Float, nullable=True)
+    scraped_at = Column(DateTime)
+
+    previous_price = Column(Float, nullable=True)  # best price from the scrape before
+    lowest_price = Column(Float)  # lowest price ever seen
+
+    product = relationship("Product", back_populates="latest_prices")
+    retailer = relationship("Retailer")
+
 class PriceAlert(Base):
     __tablename__ = "price_alerts"
 
@@ -117,3 +192,79 @@ class PriceHistory(Base):
     avg_price = Column(Float, nullable=True)
     min_price = Column(Float, nullable=True)
     max_price = Column(Float, nullable=True)
+
+Index("ix_price_history_product_recorded_at", PriceHistory.product_id, PriceHistory.recorded_at.desc())
+Index("ix_price_history_recorded_at", PriceHistory.recorded_at)
+
+class ScrapeCheckpoint(Base):
+    __tablename__ = "scrape_checkpoints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    retailer_id = Column(Integer, ForeignKey("retailers.id"), unique=True, index=True)
+
+    # Keyset position: the next sweep resumes at products with id > last_product_id
+    last_product_id = Column(Integer, default=0)
+    completed_sweeps = Column(Integer, default=0)
+
+    sweep_started_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ScrapeSchedule(Base):
+    __tablename__ = "scrape_schedules"
+    __table_args__ = (UniqueConstraint("product_id", "retailer_id", name="uq_scrape_schedules_product_retailer"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), index=True)
+    retailer_id = Column(Integer, ForeignKey("retailers.id"))
+
+    # When this product is next worth scraping at this retailer
+    next_due_at = Column(DateTime, index=True)
+    interval_minutes = Column(Float)
+
+    # Inputs behind the interval, kept for inspection
+    volatility = Column(Float, default=0.0)  # coefficient of variation of recent prices
+    alert_proximity = Column(Float, nullable=True)  # relative distance to nearest alert target
+    last_scraped_at = Column(DateTime, nullable=True)
+
+class ScrapeJob(Base):
+    __tablename__ = "scrape_jobs"
+    __table_args__ = (Index("ix_scrape_jobs_claim", "status", "run_after"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), index=True)
+    retailer_id = Column(Integer, ForeignKey("retailers.id"))
+
+    status = Column(String(20), default="pending")  # 'pending', 'leased', 'done', 'failed'
+    run_after = Column(DateTime, default=datetime.utcnow)
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+
+    # Lease: the owning worker must heartbeat before leased_until or the job is retried
+    lease_owner = Column(String(100), nullable=True)
+    leased_until = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+    __table_args__ = (Index("ix_notification_outbox_claim", "status", "next_attempt_at"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    alert_id = Column(Integer, ForeignKey("price_alerts.id", ondelete="SET NULL"), nullable=True, index=True)
+
+    # One row per alert trigger and channel; re-enqueueing the same key is a no-op
+    idempotency_key = Column(String(200), unique=True, nullable=False)
+    channel = Column(String(20))  # 'telegram', 'email', 'webhook'
+    target = Column(String(500))  # email address or webhook URL; none for the Telegram channel chat
+    payload = Column(JSON)  # alert snapshot rendered by the channel at delivery
+
+    status = Column(String(20), default="pending")  # 'pending', 'sending', 'sent', 'skipped', 'failed'
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)  # retry time, or lease expiry while sending
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+    lease_owner = Column(String(100), nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
@@ -0,0 +1,94 @@
+"""
+Keyset Pagination
+Opaque cursors over (sort key, id), so every page is an index range scan
+however deep into the catalog it is
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+from app.models import Product
+
+SORT_COLUMNS = {
+    "id": Product.id,
+    "name": Product.name,
+    "created_at": Product.created_at,
+    "best_price": Product.best_price,
+}
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(sort: str, value: Any, last_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps({"s": sort, "v": value, "id": last_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, int]:
+    """(sort key value, id) of the last row of the previous page"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        cursor_sort, value, last_id = data["s"], data["v"], int(data["id"])
+        if sort == "created_at" and value is not None:
+            value = datetime.fromisoformat(value)
+    except (binascii.Error, UnicodeDecodeError, KeyError, TypeError, ValueError) as e:
+        raise InvalidCursor("Malformed cursor") from e
+    if cursor_sort != sort:
+        raise InvalidCursor(f"Cursor was issued for sort={cursor_sort}")
+    return value, last_id
+
+def _segments(query: Query, column, after: Optional[Tuple[Any, int]], nullable: bool = True) -> List[Query]:
+    """Queries to read in order: rows with a sort key, then rows without one (NULLs last)"""
+    if column is Product.id:
+        return [query.filter(Product.id > after[1]) if after else query]
+
+    with_key = query.filter(column.isnot(None)) if nullable else query
+    without_key = [query.filter(column.is_(None)).order_by(Product.id)] if nullable else []
+    if after is None:
+        return [with_key.order_by(column, Product.id)] + without_key
+    value, last_id = after
+    if value is None:
+        return [without_key[0].filter(Product.id > last_id)]
+    return [with_key.filter(tuple_(column, Product.id) > tuple_(value, last_id)).order_by(column, Product.id)] + without_key
+
+def sort_order(sort: str) -> List:
+    """ORDER BY matching keyset_page (sort key with NULLs last, then id), for offset pages"""
+    column = SORT_COLUMNS[sort]
+    if column is Product.id:
+        return [Product.id]
+    return [column.is_(None), column, Product.id]
+
+def keyset_page(query: Query, sort: str, cursor: Optional[str], limit: int, key=None) -> Tuple[List, Optional[str]]:
+    """One page of Products from query and the cursor for the next one (None on the last page).
+
+    key sorts by an SQL expression instead of a Product column, ascending and
+    never NULL (e.g. search relevance); cursors then carry its value.
+    """
+    after = decode_cursor(cursor, sort) if cursor else None
+    column = SORT_COLUMNS[sort] if key is None else key
+    if column is Product.id:
+        query = query.order_by(Product.id)
+    if key is not None:
+        query = query.add_columns(key)
+
+    rows: List = []
+    for segment in _segments(query, column, after, nullable=key is None):
+        rows += segment.limit(limit + 1 - len(rows)).all()
+        if len(rows) > limit:
+            break
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if key is not None:
+        products, last_value = [row[0] for row in rows], rows[-1][1] if rows else None
+    else:
+        products, last_value = rows, getattr(rows[-1], column.key) if rows else None
+    if not more:
+        return products, None
+    return products, encode_cursor(sort, last_value, products[-1].id)
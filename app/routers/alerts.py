@@ -12,7 +12,11 @@ from datetime import datetime, timedelta
 from app.database import get_db
 from app.models import PriceAlert, Product, Price, Retailer
 from app.schemas import PriceAlertCreate, PriceAlertResponse
-from app.services.telegram_service import send_price_alert, send_restocker_alert, send_daily_summary
+from app.services.alert_evaluation import claim_fired_alerts
+from app.services.alert_index import get_alert_index
+from app.services.notification_outbox import get_outbox_dispatcher
+from app.services.scrape_priority import make_due
+from app.services.telegram_service import send_restocker_alert, send_daily_summary
 
 router = APIRouter(prefix="/alerts", tags=["alerts"])
 
@@ -46,6 +50,10 @@ def create_alert(alert: PriceAlertCreate, db: Session = Depends(get_db)):
     db.add(db_alert)
     db.commit()
     db.refresh(db_alert)
+    get_alert_index().add(db_alert)
+
+    # Refresh the product soon so its schedule reflects the new alert
+    make_due(db, alert.product_id)
     return db_alert
 
 @router.get("/{alert_id}", response_model=PriceAlertResponse)
@@ -65,6 +73,7 @@ def toggle_alert(alert_id: int, db: Session = Depends(get_db)):
 
     alert.is_active = not alert.is_active
     db.commit()
+    get_alert_index().add(alert)
     return {"id": alert_id, "is_active": alert.is_active}
 
 @router.delete("/{alert_id}")
@@ -76,6 +85,7 @@ def delete_alert(alert_id: int, db: Session = Depends(get_db)):
 
     db.delete(alert)
     db.commit()
+    get_alert_index().remove(alert_id)
     return {"message": "Alert deleted"}
 
 @router.post("/check")
@@ -129,48 +139,15 @@ async def trigger_check_webhook(
 
 
 async def check_and_trigger_alerts_async(db: Session):
-    """Async version of alert checking with Telegram notifications"""
-    alerts = db.query(PriceAlert).filter(PriceAlert.is_active == True).all()
-    triggered = []
-
-    for alert in alerts:
-        # Get latest price
-        latest_price = db.query(Price).filter(
-            Price.product_id == alert.product_id
-        ).order_by(Price.scraped_at.desc()).first()
-
-        if not latest_price:
-            continue
-
-        # Get previous price (2nd most recent) for drop detection
-        previous_price = db.query(Price).filter(
-            Price.product_id == alert.product_id,
-            Price.id != latest_price.id
-        ).order_by(Price.scraped_at.desc()).first()
-
-        condition_met = False
-        
-        # Check target price condition
-        if alert.condition == "below" and latest_price.price <= alert.target_price:
-            condition_met = True
-        elif alert.condition == "above" and latest_price.price >= alert.target_price:
-            condition_met = True
-        
-        # Also trigger on significant price drops (>5%) even without target
-        if not condition_met and previous_price:
-            price_drop_pct = ((previous_price.price - latest_price.price) / previous_price.price) * 100
-            if price_drop_pct >= 5:  # 5% or more drop
-                condition_met = True
-        
-        # Don't re-trigger within 24 hours
-        if alert.last_triggered and (datetime.utcnow() - alert.last_triggered) < timedelta(hours=24):
-            condition_met = False
-
-        if condition_met:
-            await trigger_alert_async(alert, latest_price, previous_price, db)
-            triggered.append(alert.id)
-
-    return triggered
+    """Evaluate every active alert in one query; notifications are queued in
+    the same transaction and delivered by the outbox dispatcher"""
+    fired = claim_fired_alerts(db)
+    if fired:
+        get_alert_index().mark_triggered([alert.alert_id for alert in fired], datetime.utcnow())
+        get_outbox_dispatcher().wake()
+    for alert in fired:
+        print(f"🚨 ALERT QUEUED: {alert.product_name} at ${alert.price}")
+    return [alert.alert_id for alert in fired]
 
 
 def check_and_trigger_alerts(db: Session):
@@ -178,40 +155,13 @@ def check_and_trigger_alerts(db: Session):
     return asyncio.run(check_and_trigger_alerts_async(db))
 
 
-async def trigger_alert_async(alert, price, previous_price, db):
-    """Send alert notification via Telegram"""
-    alert.last_triggered = datetime.utcnow()
-    alert.trigger_count += 1
-    db.commit()
-
-    # Get product and retailer details
-    product = db.query(Product).filter(Product.id == alert.product_id).first()
-    retailer = db.query(Retailer).filter(Retailer.id == price.retailer_id).first()
-    
-    if not product:
-        print(f"⚠️ Product {alert.product_id} not found for alert")
-        return
-
-    # Send Telegram notification
-    await send_price_alert(
-        product_name=product.name,
-        current_price=price.price,
-        previous_price=previous_price.price if previous_price else None,
-        retailer_name=retailer.name if retailer else "Unknown",
-        product_url=price.listing_url or product.source_url or "",
-        image_url=product.image_url,
-        target_price=alert.target_price
-    )
-    
-    print(f"🚨 ALERT SENT: {product.name} at ${price.price}")
-
-
 async def check_restock_alerts(db: Session):
     """Check for items that came back in stock"""
     # Find products that were out of stock but now have prices
     # This is simplified - you'd want more sophisticated logic
     
     restocked = []
+    sends = []
     
     # Get products with recent price updates that had no prices before
     recent_prices = db.query(Price).filter(
@@ -230,19 +180,20 @@ async def check_restock_alerts(db: Session):
             retailer = db.query(Retailer).filter(Retailer.id == price.retailer_id).first()
             
             if product:
-                await send_restocker_alert(
+                sends.append(send_restocker_alert(
                     product_name=product.name,
                     retailer_name=retailer.name if retailer else "Unknown",
                     product_url=price.listing_url or product.source_url or "",
                     price=price.price,
                     image_url=product.image_url
-                )
+                ))
                 restocked.append({
                     "product_id": product.id,
                     "name": product.name,
                     "price": price.price
                 })
     
+    await asyncio.gather(*sends)
     return restocked
 
 
@@ -2,74 +2,138 @@
 Product API Router with Tier 1-2 Field Support
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import func, and_
+from sqlalchemy.exc import IntegrityError
+from typing import Dict, List, Optional
 from datetime import datetime
 
 from app.database import get_db
-from app.models import Product, Price, Retailer
+from app.pagination import InvalidCursor, keyset_page, sort_order
+from app.models import Product, Price, LatestPrice
+from app.services.latest_prices import price_row, upsert_latest_prices
+from app.services.alert_index import get_alert_index
+from app.services.product_cache import get_product_cache
+from app.services.price_history import MAX_HISTORY_POINTS, price_history
+from app.services.product_search import apply_search
+from app.services.response_cache import invalidate_products
 from app.schemas import (
     ProductCreate, ProductUpdate, ProductResponse, 
     ProductSearch, ProductWithPrices, PriceComparison,
-    PriceCreate, PriceResponse, Category
+    PriceCreate, PriceResponse, Category, HistoryResolution, ProductSort
 )
 
 router = APIRouter(prefix="/products", tags=["products"])
 
+# Prices with their retailers, loaded alongside products instead of per row
+PRICES_WITH_RETAILERS = selectinload(Product.prices).joinedload(Price.retailer)
+
+def _price_with_retailer(price) -> dict:
+    """Price row plus the retailer fields shown next to it"""
+    retailer = price.retailer
+    return {
+        **price.__dict__,
+        "retailer_name": retailer.name if retailer else "Unknown",
+        "retailer_logo": retailer.logo_url if retailer else None
+    }
+
+EMPTY_PRICE_STATS = {"count": 0, "avg": 0, "min": 0, "max": 0}
+
+def _price_stats(db: Session, product_ids: List[int]) -> Dict[int, dict]:
+    """count/avg/min/max per product with one GROUP BY"""
+    if not product_ids:
+        return {}
+    rows = db.query(
+        Price.product_id,
+        func.count(Price.id),
+        func.avg(Price.price),
+        func.min(Price.price),
+        func.max(Price.price)
+    ).filter(Price.product_id.in_(product_ids)).group_by(Price.product_id).all()
+    return {
+        product_id: {"count": count, "avg": round(avg, 2), "min": min_price, "max": max_price}
+        for product_id, count, avg, min_price, max_price in rows
+    }
+
+def _page(query, response: Response, skip: int, limit: int, sort: Optional[ProductSort], cursor: Optional[str],
+          relevance=None):
+    """Keyset page of query, with the next cursor in the X-Next-Cursor header.
+
+    Without an explicit sort, text searches are ordered by relevance.
+    skip keeps the old offset paging for clients that still send it.
+    """
+    by_relevance = relevance is not None and sort is None
+    if skip and not cursor:
+        order = (relevance, Product.id) if by_relevance else sort_order(sort.value if sort else "id")
+        return query.order_by(*order).offset(skip).limit(limit).all()
+    try:
+        if by_relevance:
+            products, next_cursor = keyset_page(query, "relevance", cursor, limit, key=relevance)
+        else:
+            products, next_cursor = keyset_page(query, sort.value if sort else "id", cursor, limit)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return products
+
 @router.get("/", response_model=List[ProductResponse])
 def list_products(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1),
     category: Optional[Category] = None,
     search: Optional[str] = None,
+    sort: Optional[ProductSort] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """List products with optional filtering"""
+    """List products with optional filtering.
+
+    Pages are ordered by sort (then id); pass the X-Next-Cursor response
+    header back as cursor for the next page.
+    """
     query = db.query(Product)
+    relevance = None
 
     if category:
         query = query.filter(Product.category == category.value)
 
     if search:
-        search_filter = or_(
-            Product.name.ilike(f"%{search}%"),
-            Product.description.ilike(f"%{search}%"),
-            Product.brand.ilike(f"%{search}%"),
-            Product.model.ilike(f"%{search}%")
-        )
-        query = query.filter(search_filter)
+        query, relevance = apply_search(db, query, search)
 
-    return query.offset(skip).limit(limit).all()
+    return _page(query, response, skip, limit, sort, cursor, relevance)
 
 @router.post("/search", response_model=List[ProductWithPrices])
 def search_products(
     filters: ProductSearch,
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1),
+    sort: Optional[ProductSort] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """Advanced search with Tier 1-2 filters"""
-    query = db.query(Product).outerjoin(Price)
+    """Advanced search with Tier 1-2 filters, paged like list_products"""
+    query = db.query(Product)
+    relevance = None
 
     # Tier 1: Common filters
     if filters.query:
-        query = query.filter(
-            or_(
-                Product.name.ilike(f"%{filters.query}%"),
-                Product.description.ilike(f"%{filters.query}%")
-            )
-        )
+        query, relevance = apply_search(db, query, filters.query)
 
     if filters.category:
         query = query.filter(Product.category == filters.category.value)
 
-    # Price range filter
+    # Price range over current listings, as an EXISTS so each product appears once
+    in_range = []
     if filters.min_price is not None:
-        query = query.filter(Price.price >= filters.min_price)
+        in_range.append(LatestPrice.price >= filters.min_price)
     if filters.max_price is not None:
-        query = query.filter(Price.price <= filters.max_price)
+        in_range.append(LatestPrice.price <= filters.max_price)
+    if in_range:
+        query = query.filter(Product.latest_prices.any(and_(*in_range)))
 
     # Tier 2: Category-specific vertical filters
     if filters.brand:
@@ -90,40 +154,18 @@ def search_products(
     if filters.condition:
         query = query.filter(Product.condition == filters.condition)
 
-    products = query.offset(skip).limit(limit).all()
+    products = _page(query.options(PRICES_WITH_RETAILERS), response, skip, limit, sort, cursor, relevance)
+    stats = _price_stats(db, [product.id for product in products])
 
     # Enrich with price data
-    result = []
-    for product in products:
-        prices = db.query(Price).filter(Price.product_id == product.id).all()
-        price_list = []
-        for p in prices:
-            retailer = db.query(Retailer).filter(Retailer.id == p.retailer_id).first()
-            price_list.append({
-                **p.__dict__,
-                "retailer_name": retailer.name if retailer else "Unknown",
-                "retailer_logo": retailer.logo_url if retailer else None
-            })
-
-        # Calculate stats
-        if price_list:
-            prices_only = [p.price for p in prices]
-            stats = {
-                "count": len(prices),
-                "avg": round(sum(prices_only) / len(prices_only), 2),
-                "min": min(prices_only),
-                "max": max(prices_only)
-            }
-        else:
-            stats = {"count": 0, "avg": 0, "min": 0, "max": 0}
-
-        result.append({
+    return [
+        {
             **product.__dict__,
-            "prices": price_list,
-            "price_stats": stats
-        })
-
-    return result
+            "prices": [_price_with_retailer(p) for p in product.prices],
+            "price_stats": stats.get(product.id, EMPTY_PRICE_STATS)
+        }
+        for product in products
+    ]
 
 @router.get("/categories")
 def get_categories():
@@ -142,42 +184,25 @@ def create_product(product: ProductCreate, db: Session = Depends(get_db)):
     """Create a new product with Tier 1-2 fields"""
     db_product = Product(**product.dict())
     db.add(db_product)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Product with this name and category already exists")
     db.refresh(db_product)
     return db_product
 
 @router.get("/{product_id}", response_model=ProductWithPrices)
 def get_product(product_id: int, db: Session = Depends(get_db)):
     """Get product details with all prices"""
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = db.query(Product).options(PRICES_WITH_RETAILERS).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    prices = db.query(Price).filter(Price.product_id == product_id).all()
-    price_list = []
-    for p in prices:
-        retailer = db.query(Retailer).filter(Retailer.id == p.retailer_id).first()
-        price_list.append({
-            **p.__dict__,
-            "retailer_name": retailer.name if retailer else "Unknown",
-            "retailer_logo": retailer.logo_url if retailer else None
-        })
-
-    if price_list:
-        prices_only = [p.price for p in prices]
-        stats = {
-            "count": len(prices),
-            "avg": round(sum(prices_only) / len(prices_only), 2),
-            "min": min(prices_only),
-            "max": max(prices_only)
-        }
-    else:
-        stats = {"count": 0, "avg": 0, "min": 0, "max": 0}
-
     return {
         **product.__dict__,
-        "prices": price_list,
-        "price_stats": stats
+        "prices": [_price_with_retailer(p) for p in product.prices],
+        "price_stats": _price_stats(db, [product_id]).get(product_id, EMPTY_PRICE_STATS)
     }
 
 @router.get("/{product_id}/comparison", response_model=PriceComparison)
@@ -187,18 +212,14 @@ def compare_prices(product_id: int, db: Session = Depends(get_db)):
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    prices = db.query(Price).filter(Price.product_id == product_id).order_by(Price.price).all()
+    # Current best listing per retailer and condition, not the whole history
+    latest = db.query(LatestPrice).options(joinedload(LatestPrice.retailer)).filter(
+        LatestPrice.product_id == product_id
+    ).order_by(LatestPrice.price).all()
 
-    price_list = []
-    for p in prices:
-        retailer = db.query(Retailer).filter(Retailer.id == p.retailer_id).first()
-        price_list.append({
-            **p.__dict__,
-            "retailer_name": retailer.name if retailer else "Unknown",
-            "retailer_logo": retailer.logo_url if retailer else None
-        })
+    price_list = [{**_price_with_retailer(p), "id": p.price_id} for p in latest]
 
-    prices_only = [p.price for p in prices] if prices else [0]
+    prices_only = [p.price for p in latest] if latest else [0]
 
     return {
         "product": product,
@@ -223,7 +244,13 @@ def update_product(product_id: int, product_update: ProductUpdate, db: Session =
         setattr(product, field, value)
 
     product.updated_at = datetime.utcnow()
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Product with this name and category already exists")
+    get_product_cache().invalidate(product_id)
+    invalidate_products([product_id])
     db.refresh(product)
     return product
 
@@ -236,6 +263,9 @@ def delete_product(product_id: int, db: Session = Depends(get_db)):
 
     db.delete(product)
     db.commit()
+    get_product_cache().invalidate(product_id)
+    get_alert_index().remove_product(product_id)
+    invalidate_products([product_id])
     return {"message": "Product deleted successfully"}
 
 # Price endpoints
@@ -246,9 +276,12 @@ def add_price(product_id: int, price: PriceCreate, db: Session = Depends(get_db)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    db_price = Price(**price.dict(), product_id=product_id)
+    db_price = Price(**{**price.dict(), "product_id": product_id})
     db.add(db_price)
+    db.flush()
+    upsert_latest_prices(db, [price_row(db_price)])
     db.commit()
+    invalidate_products([product_id])
     db.refresh(db_price)
     return db_price
 
@@ -256,28 +289,20 @@ def add_price(product_id: int, price: PriceCreate, db: Session = Depends(get_db)
 def get_price_history(
     product_id: int,
     days: int = Query(30, ge=1, le=365),
+    resolution: Optional[HistoryResolution] = None,
+    buckets: Optional[int] = Query(None, ge=1, le=MAX_HISTORY_POINTS),
+    max_points: Optional[int] = Query(None, ge=3, le=MAX_HISTORY_POINTS),
     db: Session = Depends(get_db)
 ):
-    """Get price history for a product"""
-    from datetime import timedelta
-
-    cutoff = datetime.utcnow() - timedelta(days=days)
-
-    history = db.query(Price).filter(
-        Price.product_id == product_id,
-        Price.scraped_at >= cutoff
-    ).order_by(Price.scraped_at).all()
-
-    return {
-        "product_id": product_id,
-        "days": days,
-        "data_points": len(history),
-        "history": [
-            {
-                "price": h.price,
-                "retailer_id": h.retailer_id,
-                "scraped_at": h.scraped_at
-            }
-            for h in history
-        ]
-    }
+    """Get price history for a product.
+
+    resolution=hour|day|week returns last/min/avg/max per retailer and bucket;
+    buckets picks the finest resolution with at most that many buckets;
+    max_points caps the response with LTTB downsampling.
+    """
+    return price_history(
+        db, product_id, days,
+        resolution=resolution.value if resolution else None,
+        buckets=buckets,
+        max_points=max_points
+    )
@@ -9,6 +9,7 @@ from typing import List
 from app.database import get_db
 from app.models import Retailer
 from app.schemas import RetailerCreate, RetailerResponse
+from app.services.response_cache import invalidate_all
 
 router = APIRouter(prefix="/retailers", tags=["retailers"])
 
@@ -56,6 +57,7 @@ def update_retailer(retailer_id: int, updates: RetailerCreate, db: Session = Dep
         setattr(retailer, field, value)
 
     db.commit()
+    invalidate_all()  # product responses embed retailer names and logos
     return retailer
 
 @router.delete("/{retailer_id}")
@@ -67,4 +69,5 @@ def delete_retailer(retailer_id: int, db: Session = Depends(get_db)):
 
     db.delete(retailer)
     db.commit()
+    invalidate_all()
     return {"message": "Retailer deleted"}
@@ -26,6 +26,17 @@ class PriceCondition(str, Enum):
     BELOW = "below"
     ABOVE = "above"
 
+class ProductSort(str, Enum):
+    NAME = "name"
+    CREATED_AT = "created_at"
+    BEST_PRICE = "best_price"
+
+class HistoryResolution(str, Enum):
+    RAW = "raw"
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"
+
 # Tier 1: Base Product Schema (Common fields)
 class ProductBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=500)
@@ -75,6 +86,7 @@ class ProductResponse(ProductBase):
     model: Optional[str]
     attributes: Dict[str, Any]
     is_active: bool
+    best_price: Optional[float] = None
     created_at: datetime
     updated_at: datetime
 
@@ -0,0 +1,114 @@
+"""
+Alert Evaluation
+Set-based check of every active price alert against latest_prices: one query
+finds the alerts that fire, one UPDATE claims them and their notifications
+are queued in the same transaction
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Set
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models import LatestPrice, PriceAlert, Product, Retailer
+from app.services.notification_outbox import enqueue_alert_notifications
+
+ALERT_COOLDOWN_HOURS = float(os.getenv("ALERT_COOLDOWN_HOURS", "24"))
+ALERT_DROP_PERCENT = float(os.getenv("ALERT_DROP_PERCENT", "5"))
+
+def _alert_rows(alerted):
+    """Alerts joined to their product's current listing, retailer and product,
+    plus the ranked subquery; `alerted` selects the product ids worth ranking"""
+    # Most recently scraped latest_prices row per product, best price on ties
+    ranked = select(
+        LatestPrice.product_id,
+        LatestPrice.retailer_id,
+        LatestPrice.price,
+        LatestPrice.previous_price,
+        LatestPrice.listing_url,
+        func.row_number().over(
+            partition_by=LatestPrice.product_id,
+            order_by=(LatestPrice.scraped_at.desc(), LatestPrice.price)
+        ).label("row_rank")
+    ).where(LatestPrice.product_id.in_(alerted)).subquery("ranked")
+
+    return select(
+        PriceAlert.id.label("alert_id"),
+        PriceAlert.product_id,
+        PriceAlert.condition,
+        PriceAlert.target_price,
+        PriceAlert.email,
+        PriceAlert.webhook_url,
+        ranked.c.price,
+        ranked.c.previous_price,
+        ranked.c.retailer_id,
+        ranked.c.listing_url,
+        Retailer.name.label("retailer_name"),
+        Product.name.label("product_name"),
+        Product.source_url,
+        Product.image_url
+    ).join(
+        ranked, and_(ranked.c.product_id == PriceAlert.product_id, ranked.c.row_rank == 1)
+    ).join(
+        Product, Product.id == PriceAlert.product_id
+    ).outerjoin(
+        Retailer, Retailer.id == ranked.c.retailer_id
+    ), ranked
+
+def fired_alerts_query(now: datetime):
+    """Active alerts whose product's current price meets the target, or dropped
+    ALERT_DROP_PERCENT since the previous scrape, outside the cooldown"""
+    query, ranked = _alert_rows(select(PriceAlert.product_id).where(PriceAlert.is_active == True))
+    return query.where(
+        PriceAlert.is_active == True,
+        or_(
+            and_(PriceAlert.condition == "below", ranked.c.price <= PriceAlert.target_price),
+            and_(PriceAlert.condition == "above", ranked.c.price >= PriceAlert.target_price),
+            and_(
+                ranked.c.previous_price > 0,
+                ranked.c.previous_price - ranked.c.price >= ranked.c.previous_price * (ALERT_DROP_PERCENT / 100)
+            )
+        ),
+        _cooled_down(now)
+    ).order_by(PriceAlert.id)
+
+def alert_rows_query(alert_ids: Iterable[int]):
+    """The same rows as fired_alerts_query for already claimed alerts"""
+    alert_ids = list(alert_ids)
+    query, _ = _alert_rows(select(PriceAlert.product_id).where(PriceAlert.id.in_(alert_ids)))
+    return query.where(PriceAlert.id.in_(alert_ids)).order_by(PriceAlert.id)
+
+def _cooled_down(now: datetime):
+    return or_(
+        PriceAlert.last_triggered.is_(None),
+        PriceAlert.last_triggered <= now - timedelta(hours=ALERT_COOLDOWN_HOURS)
+    )
+
+def claim_fired_alerts(db: Session, now: Optional[datetime] = None) -> List:
+    """Evaluate all active alerts, mark the fired ones triggered and queue
+    their notifications (commits).
+
+    The claiming UPDATE re-checks the cooldown, so overlapping runs never
+    notify the same alert twice. Returns the fired rows in alert id order.
+    """
+    now = now or datetime.utcnow()
+    fired = db.execute(fired_alerts_query(now)).all()
+    if not fired:
+        return []
+
+    claimed = claim_alerts(db, [row.alert_id for row in fired], now)
+    fired = [row for row in fired if row.alert_id in claimed]
+    enqueue_alert_notifications(db, fired, now)
+    db.commit()
+    return fired
+
+def claim_alerts(db: Session, alert_ids: List[int], now: datetime) -> Set[int]:
+    """Mark alerts triggered unless still in their cooldown (no commit); returns the claimed ids"""
+    return set(db.execute(
+        update(PriceAlert)
+        .where(PriceAlert.id.in_(alert_ids), _cooled_down(now))
+        .values(last_triggered=now, trigger_count=func.coalesce(PriceAlert.trigger_count, 0) + 1)
+        .returning(PriceAlert.id)
+        .execution_options(synchronize_session=False)
+    ).scalars())
@@ -0,0 +1,170 @@
+"""
+Alert Index
+In-process index of active alert targets, per product and condition, so
+ingested prices are matched against alerts without querying price_alerts
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+
+from app.models import PriceAlert
+from app.services.alert_evaluation import ALERT_COOLDOWN_HOURS
+
+# Alerts written outside this process (other workers, SQL) show up after a reload
+ALERT_INDEX_REFRESH_SECONDS = int(os.getenv("ALERT_INDEX_REFRESH_SECONDS", "300"))
+
+class Thresholds:
+    """Ascending targets with their alert ids, for one product and condition"""
+
+    __slots__ = ("targets", "ids")
+
+    def __init__(self, pairs: Iterable[Tuple[float, int]] = ()):
+        pairs = sorted(pairs)
+        self.targets = [target for target, _ in pairs]
+        self.ids = [alert_id for _, alert_id in pairs]
+
+    def add(self, target: float, alert_id: int):
+        i = bisect_right(self.targets, target)
+        self.targets.insert(i, target)
+        self.ids.insert(i, alert_id)
+
+    def remove(self, target: float, alert_id: int):
+        i = bisect_left(self.targets, target)
+        while i < len(self.targets) and self.targets[i] == target:
+            if self.ids[i] == alert_id:
+                del self.targets[i], self.ids[i]
+                return
+            i += 1
+
+    def at_or_above(self, price: float) -> List[int]:
+        """'below' alerts a price meets: targets >= price"""
+        return self.ids[bisect_left(self.targets, price):]
+
+    def at_or_below(self, price: float) -> List[int]:
+        """'above' alerts a price meets: targets <= price"""
+        return self.ids[:bisect_right(self.targets, price)]
+
+class AlertIndex:
+    """Thread-safe below/above target index shared by every ScraperService in the process.
+
+    Matching a price is O(log n + k) for n alerts on the product and k hits.
+    The alerts router keeps it current as alerts are created, toggled and
+    deleted; it is reloaded from the database every ALERT_INDEX_REFRESH_SECONDS.
+    """
+
+    def __init__(self, refresh_seconds: int = ALERT_INDEX_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._thresholds: Dict[Tuple[int, str], Thresholds] = {}
+        self._alerts: Dict[int, Tuple[int, str, float]] = {}  # id -> (product_id, condition, target)
+        self._last_triggered: Dict[int, datetime] = {}
+        self._loaded_at: Optional[float] = None
+
+    def load(self, db: Session):
+        """Rebuild from all active alerts with one query"""
+        pairs: Dict[Tuple[int, str], List[Tuple[float, int]]] = {}
+        alerts = {}
+        last_triggered = {}
+        for alert_id, product_id, condition, target, triggered_at in db.query(
+            PriceAlert.id, PriceAlert.product_id, PriceAlert.condition,
+            PriceAlert.target_price, PriceAlert.last_triggered
+        ).filter(PriceAlert.is_active == True):
+            if condition not in ("below", "above") or target is None:
+                continue
+            pairs.setdefault((product_id, condition), []).append((target, alert_id))
+            alerts[alert_id] = (product_id, condition, target)
+            if triggered_at is not None:
+                last_triggered[alert_id] = triggered_at
+        with self._lock:
+            self._thresholds = {key: Thresholds(values) for key, values in pairs.items()}
+            self._alerts = alerts
+            self._last_triggered = last_triggered
+            self._loaded_at = time.monotonic()
+
+    def ensure_loaded(self, db: Session):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.refresh_seconds:
+            self.load(db)
+
+    def add(self, alert: PriceAlert):
+        """Index a new or changed alert (drops it if inactive)"""
+        self.remove(alert.id)
+        if not alert.is_active or alert.condition not in ("below", "above") or alert.target_price is None:
+            return
+        with self._lock:
+            self._thresholds.setdefault((alert.product_id, alert.condition), Thresholds()).add(alert.target_price, alert.id)
+            self._alerts[alert.id] = (alert.product_id, alert.condition, alert.target_price)
+            if alert.last_triggered is not None:
+                self._last_triggered[alert.id] = alert.last_triggered
+
+    def remove(self, alert_id: int):
+        with self._lock:
+            indexed = self._alerts.pop(alert_id, None)
+            self._last_triggered.pop(alert_id, None)
+            if indexed is None:
+                return
+            product_id, condition, target = indexed
+            thresholds = self._thresholds.get((product_id, condition))
+            if thresholds is not None:
+                thresholds.remove(target, alert_id)
+                if not thresholds.ids:
+                    del self._thresholds[(product_id, condition)]
+
+    def remove_product(self, product_id: int):
+        """Forget a deleted product's alerts"""
+        with self._lock:
+            alert_ids = [alert_id for alert_id, indexed in self._alerts.items() if indexed[0] == product_id]
+        for alert_id in alert_ids:
+            self.remove(alert_id)
+
+    def match(self, product_id: int, price: float, now: Optional[datetime] = None) -> List[int]:
+        """Ids of alerts on the product that price meets, outside their cooldown"""
+        cutoff = (now or datetime.utcnow()) - timedelta(hours=ALERT_COOLDOWN_HOURS)
+        with self._lock:
+            below = self._thresholds.get((product_id, "below"))
+            above = self._thresholds.get((product_id, "above"))
+            matched = (below.at_or_above(price) if below else []) + (above.at_or_below(price) if above else [])
+            return [
+                alert_id for alert_id in matched
+                if alert_id not in self._last_triggered or self._last_triggered[alert_id] <= cutoff
+            ]
+
+    def mark_triggered(self, alert_ids: Iterable[int], when: datetime):
+        with self._lock:
+            for alert_id in alert_ids:
+                if alert_id in self._alerts:
+                    self._last_triggered[alert_id] = when
+
+    def clear(self):
+        with self._lock:
+            self._thresholds.clear()
+            self._alerts.clear()
+            self._last_triggered.clear()
+            self._loaded_at = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'alerts': len(self._alerts), 'products': len({product_id for product_id, _ in self._thresholds})}
+
+_alert_index = AlertIndex()
+
+def get_alert_index() -> AlertIndex:
+    """Process-wide alert index"""
+    return _alert_index
+
+def current_prices(rows: Iterable[Dict]) -> Dict[int, float]:
+    """Best price per product among its most recently scraped new price rows"""
+    latest: Dict[int, Tuple[datetime, float]] = {}
+    for row in rows:
+        if row.get('price') is None:
+            continue
+        key = (row['scraped_at'], -row['price'])
+        current = latest.get(row['product_id'])
+        if current is None or key > current:
+            latest[row['product_id']] = key
+    return {product_id: -negated for product_id, (_, negated) in latest.items()}
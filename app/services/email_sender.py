@@ -0,0 +1,286 @@
+"""
+Email Sender
+Pooled SMTP delivery: worker threads keep authenticated connections open and
+send queued messages in batches, reconnecting when the server drops them.
+NotificationService builds alert emails and sends them through the pool
+"""
+
+import os
+import queue
+import smtplib
+import threading
+from concurrent.futures import Future, InvalidStateError
+from email.message import Message
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Open connections (and worker threads) per SMTP server
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+# Queued messages a worker takes per round, all sent on its one connection
+SMTP_BATCH_SIZE = int(os.getenv("SMTP_BATCH_SIZE", "50"))
+# Reconnect after this many messages (providers cap messages per session)
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
+# Close connections idle this long, before the server times them out
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "60"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") != "0"
+SMTP_TIMEOUT_SECONDS = 30
+
+class SMTPPool:
+    """Sends email over up to `size` persistent SMTP connections.
+
+    submit() queues a message and returns a Future resolving to True once
+    the server accepted it. Each worker thread owns one connection (connect,
+    STARTTLS and login happen once), takes up to batch_size queued messages
+    at a time and sends them back to back. A dropped connection (disconnect,
+    421, socket error) is reopened and the message retried once; messages
+    the server rejects, and any other error, fail without a retry. Every
+    future resolves, even if a worker hits an unexpected error.
+    """
+
+    def __init__(self, host: str, port: int, username: Optional[str] = None, password: Optional[str] = None,
+                 starttls: bool = SMTP_STARTTLS, size: int = SMTP_POOL_SIZE, batch_size: int = SMTP_BATCH_SIZE,
+                 max_messages_per_connection: int = SMTP_MAX_MESSAGES_PER_CONNECTION,
+                 idle_seconds: float = SMTP_IDLE_SECONDS, timeout: float = SMTP_TIMEOUT_SECONDS):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.size = size
+        self.batch_size = batch_size
+        self.max_messages_per_connection = max_messages_per_connection
+        self.idle_seconds = idle_seconds
+        self.timeout = timeout
+        self._queue: "queue.Queue[Optional[Tuple[Message, Future]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self.sent = 0
+        self.failed = 0
+        self.connections = 0
+        self.reconnects = 0
+
+    def submit(self, message: Message) -> Future:
+        """Queue a message; the Future resolves to True once delivered, False on failure"""
+        future = Future()
+        self._ensure_started()
+        self._queue.put((message, future))
+        return future
+
+    def send(self, message: Message) -> bool:
+        """Send one message, blocking until the server accepts or rejects it"""
+        return self.submit(message).result()
+
+    def send_many(self, messages: Iterable[Message]) -> List[bool]:
+        futures = [self.submit(message) for message in messages]
+        return [future.result() for future in futures]
+
+    def _ensure_started(self):
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.size:
+                thread = threading.Thread(target=self._work, name=f"smtp-{self.host}-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.username and self.password:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        with self._lock:
+            self.connections += 1
+        return smtp
+
+    @staticmethod
+    def _quit(smtp: Optional[smtplib.SMTP]) -> None:
+        """Close a connection politely if it still answers; always returns None"""
+        if smtp is None:
+            return None
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+        return None
+
+    def _work(self):
+        """Worker loop: one connection, batches of queued messages"""
+        smtp = None
+        sent_on_connection = 0
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self.idle_seconds if smtp is not None else None)
+            except queue.Empty:
+                smtp = self._quit(smtp)
+                continue
+            batch = []
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            stopping = item is None
+
+            try:
+                for message, future in batch:
+                    # Skip messages whose caller gave up waiting
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    if smtp is not None and sent_on_connection >= self.max_messages_per_connection:
+                        smtp = self._quit(smtp)
+                    connection = smtp
+                    smtp, delivered = self._deliver(smtp, message)
+                    if smtp is not connection:
+                        sent_on_connection = 0
+                    sent_on_connection += delivered
+                    future.set_result(delivered)
+            finally:
+                # Never leave a caller blocked on .result()
+                for _, future in batch:
+                    if not future.done():
+                        try:
+                            future.set_result(False)
+                        except InvalidStateError:
+                            pass
+        self._quit(smtp)
+
+    def _deliver(self, smtp: Optional[smtplib.SMTP], message: Message) -> Tuple[Optional[smtplib.SMTP], bool]:
+        """Send on the worker's connection, reopening it once if it was dropped"""
+        error = None
+        for attempt in range(2):
+            try:
+                if smtp is None:
+                    smtp = self._connect()
+                smtp.send_message(message)
+                with self._lock:
+                    self.sent += 1
+                return smtp, True
+            except smtplib.SMTPServerDisconnected as e:
+                error = e
+            except smtplib.SMTPResponseException as e:
+                error = e
+                if e.smtp_code != 421:
+                    break
+            except smtplib.SMTPException as e:
+                error = e
+                break
+            except OSError as e:
+                error = e
+            except Exception as e:
+                # A malformed message or a broken TLS/login setup: not worth a retry
+                error = e
+                break
+            # The connection is gone: reopen it for the retry
+            smtp = self._quit(smtp)
+            if attempt == 0:
+                with self._lock:
+                    self.reconnects += 1
+
+        if smtp is not None:
+            try:
+                smtp.rset()
+            except Exception:
+                smtp = self._quit(smtp)
+        print(f"❌ Email failed: {error}")
+        with self._lock:
+            self.failed += 1
+        return smtp, False
+
+    def close(self):
+        """Send what is queued, then close every connection"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout=self.timeout)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'sent': self.sent, 'failed': self.failed, 'connections': self.connections,
+                    'reconnects': self.reconnects, 'queued': self._queue.qsize()}
+
+_pools: Dict[Tuple, SMTPPool] = {}
+_pools_lock = threading.Lock()
+
+def get_smtp_pool(host: str, port: int, username: Optional[str] = None, password: Optional[str] = None) -> SMTPPool:
+    """Process-wide pool per SMTP server and account"""
+    key = (host, port, username, password)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = SMTPPool(host, port, username, password)
+        return pool
+
+def close_smtp_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+class NotificationService:
+    def __init__(self):
+        self.smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+        self.smtp_port = int(os.getenv("SMTP_PORT", "587"))
+        self.smtp_username = os.getenv("SMTP_USERNAME")
+        self.smtp_password = os.getenv("SMTP_PASSWORD")
+        self.from_email = os.getenv("FROM_EMAIL", "alerts@priceaggregator.com")
+
+    @property
+    def email_configured(self) -> bool:
+        return bool(self.smtp_username and self.smtp_password)
+
+    def submit_email(self, to_email: str, subject: str, body: str, html: bool = False) -> Future:
+        """Queue an email on the pooled SMTP sender; the Future resolves to True once sent"""
+        future = Future()
+        if not self.email_configured:
+            print(f"⚠️ Email not configured. Would send to {to_email}:")
+            print(f"Subject: {subject}")
+            future.set_result(False)
+            return future
+
+        msg = MIMEMultipart()
+        msg['From'] = self.from_email
+        msg['To'] = to_email
+        msg['Subject'] = subject
+
+        content_type = 'html' if html else 'plain'
+        msg.attach(MIMEText(body, content_type))
+
+        return get_smtp_pool(self.smtp_server, self.smtp_port, self.smtp_username, self.smtp_password).submit(msg)
+
+    def send_email(self, to_email: str, subject: str, body: str, html: bool = False):
+        """Send email notification over a pooled, already authenticated SMTP connection"""
+        sent = self.submit_email(to_email, subject, body, html).result()
+        if sent:
+            print(f"✅ Email sent to {to_email}")
+        return sent
+
+    @staticmethod
+    def alert_email(product_name: str, current_price: float, target_price: float, condition: str,
+                    listing_url: str) -> Tuple[str, str]:
+        """Subject and HTML body of a price alert email"""
+        subject = f"🚨 Price Alert: {product_name}"
+
+        body = f"""
+        <html>
+        <body style="font-family: Arial, sans-serif;">
+            <h2>Price Alert Triggered!</h2>
+            <p><strong>Product:</strong> {product_name}</p>
+            <p><strong>Current Price:</strong> ${current_price}</p>
+            <p><strong>Your Target:</strong> ${target_price} ({condition})</p>
+            <p><a href="{listing_url}" style="background: #007bff; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">View Deal</a></p>
+        </body>
+        </html>
+        """
+        return subject, body
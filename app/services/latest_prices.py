@@ -0,0 +1,154 @@
+"""
+Latest Prices
+Maintains latest_prices: the current best listing per (product, retailer, condition)
+
+    python -m app.services.latest_prices rebuild
+"""
+
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import and_, case, func, select, update
+from sqlalchemy.orm import Session, aliased
+
+from app.database import dialect_insert
+from app.models import LatestPrice, Price, Product
+from app.services.response_cache import invalidate_all, invalidate_products
+
+UNKNOWN_CONDITION = "unknown"
+
+LISTING_FIELDS = ('currency', 'availability', 'listing_url', 'listing_title', 'seller_rating', 'shipping_cost')
+
+def condition_key(condition: Optional[str]) -> str:
+    return condition or UNKNOWN_CONDITION
+
+def price_row(price: Price) -> Dict:
+    """Column values of a flushed Price, as upsert_latest_prices expects"""
+    return {column.key: getattr(price, column.key) for column in Price.__table__.columns}
+
+def upsert_latest_prices(db: Session, rows: Iterable[Dict]):
+    """Fold newly inserted price rows into latest_prices (no commit).
+
+    Rows need id, product_id, retailer_id, price and scraped_at. Per key the
+    lowest price of the newest scrape wins; an older scrape arriving late
+    only lowers lowest_price.
+    """
+    best: Dict[Tuple[int, int, str], Dict] = {}
+    lowest: Dict[Tuple[int, int, str], float] = {}
+    for row in rows:
+        key = (row['product_id'], row['retailer_id'], condition_key(row.get('condition')))
+        lowest[key] = min(lowest.get(key, row['price']), row['price'])
+        current = best.get(key)
+        if current is None or (row['scraped_at'], -row['price'], row['id']) > (current['scraped_at'], -current['price'], current['id']):
+            best[key] = row
+    if not best:
+        return
+
+    values = [
+        {
+            'product_id': product_id,
+            'retailer_id': retailer_id,
+            'condition': condition,
+            'price_id': row['id'],
+            'price': row['price'],
+            'scraped_at': row['scraped_at'],
+            'previous_price': None,
+            'lowest_price': lowest[(product_id, retailer_id, condition)],
+            **{field: row.get(field) for field in LISTING_FIELDS},
+            'currency': row.get('currency') or 'USD'
+        }
+        for (product_id, retailer_id, condition), row in best.items()
+    ]
+
+    stmt = dialect_insert(db, LatestPrice)
+    new = stmt.excluded
+    newer = new.scraped_at > LatestPrice.scraped_at
+    same_scrape = new.scraped_at == LatestPrice.scraped_at
+    replaces = newer | (same_scrape & (new.price < LatestPrice.price))
+
+    def pick(column):
+        return case((replaces, getattr(new, column)), else_=getattr(LatestPrice, column))
+
+    changes = {column: pick(column) for column in ('price_id', 'price', 'scraped_at') + LISTING_FIELDS}
+    changes['previous_price'] = case((newer, LatestPrice.price), else_=LatestPrice.previous_price)
+    changes['lowest_price'] = case((new.lowest_price < LatestPrice.lowest_price, new.lowest_price), else_=LatestPrice.lowest_price)
+
+    db.execute(
+        stmt.on_conflict_do_update(index_elements=['product_id', 'retailer_id', 'condition'], set_=changes),
+        values
+    )
+    refresh_best_prices(db, {product_id for product_id, _, _ in best})
+
+def refresh_best_prices(db: Session, product_ids: Optional[Iterable[int]] = None):
+    """Copy each product's lowest latest price onto products.best_price (no commit)"""
+    lowest = select(func.min(LatestPrice.price)).where(LatestPrice.product_id == Product.id).scalar_subquery()
+    # Keep updated_at for product edits, not price changes
+    stmt = update(Product).values(best_price=lowest, updated_at=Product.updated_at)
+    if product_ids is not None:
+        stmt = stmt.where(Product.id.in_(list(product_ids)))
+    db.execute(stmt.execution_options(synchronize_session=False))
+
+def rebuild_latest_prices(db: Session, product_ids: Optional[List[int]] = None) -> int:
+    """Recompute latest_prices from the full prices history and commit"""
+    condition = func.coalesce(Price.condition, UNKNOWN_CONDITION)
+    key = (Price.product_id, Price.retailer_id, condition)
+    ranked = select(
+        Price,
+        condition.label('condition_key'),
+        func.dense_rank().over(partition_by=key, order_by=Price.scraped_at.desc()).label('scrape_rank'),
+        func.row_number().over(partition_by=key + (Price.scraped_at,), order_by=(Price.price, Price.id)).label('price_rank'),
+        func.min(Price.price).over(partition_by=key).label('lowest_price')
+    )
+    if product_ids is not None:
+        ranked = ranked.where(Price.product_id.in_(product_ids))
+    ranked = ranked.subquery()
+
+    current = aliased(ranked)
+    previous = aliased(ranked)
+    source = select(
+        current.c.product_id,
+        current.c.retailer_id,
+        current.c.condition_key,
+        current.c.id,
+        current.c.price,
+        current.c.scraped_at,
+        previous.c.price,
+        current.c.lowest_price,
+        *(current.c[field] for field in LISTING_FIELDS)
+    ).select_from(current).outerjoin(previous, and_(
+        previous.c.product_id == current.c.product_id,
+        previous.c.retailer_id == current.c.retailer_id,
+        previous.c.condition_key == current.c.condition_key,
+        previous.c.scrape_rank == 2,
+        previous.c.price_rank == 1
+    )).where(current.c.scrape_rank == 1, current.c.price_rank == 1)
+
+    existing = db.query(LatestPrice)
+    if product_ids is not None:
+        existing = existing.filter(LatestPrice.product_id.in_(product_ids))
+    existing.delete(synchronize_session=False)
+
+    columns = ['product_id', 'retailer_id', 'condition', 'price_id', 'price', 'scraped_at',
+               'previous_price', 'lowest_price', *LISTING_FIELDS]
+    result = db.execute(LatestPrice.__table__.insert().from_select(columns, source))
+    refresh_best_prices(db, product_ids)
+    db.commit()
+    if product_ids is not None:
+        invalidate_products(product_ids)
+    else:
+        invalidate_all()
+    return result.rowcount
+
+def main():
+    if sys.argv[1:] != ['rebuild']:
+        print("Usage: python -m app.services.latest_prices rebuild")
+        sys.exit(1)
+
+    from app.database import SessionLocal
+    db = SessionLocal()
+    try:
+        print(f"✅ Rebuilt {rebuild_latest_prices(db)} latest price rows")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
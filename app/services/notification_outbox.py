@@ -0,0 +1,376 @@
+"""
+Notification Outbox
+Alert notifications are written to notification_outbox in the transaction
+that claims the alert, then delivered by a background dispatcher with
+retries, so ingest and API requests never wait on Telegram, SMTP or webhooks
+
+    python -m app.services.notification_outbox [--once]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import aiohttp
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, dialect_insert
+from app.models import NotificationOutbox
+from app.services.email_sender import NotificationService, close_smtp_pools
+from app.services.telegram_service import (
+    TELEGRAM_CHAT_ID, get_telegram_client, price_alert_message, telegram_configured
+)
+
+# Run the dispatcher inside the API process (disable when a separate one drains the outbox)
+NOTIFICATION_DISPATCHER_ENABLED = os.getenv("NOTIFICATION_DISPATCHER", "1") != "0"
+# Notifications claimed and sent concurrently per round trip
+NOTIFICATION_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", "50"))
+# Attempts (including lease expiries) before a notification is marked failed
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "8"))
+# Seconds a claimed batch has to be delivered before another dispatcher retries it
+NOTIFICATION_LEASE_SECONDS = int(os.getenv("NOTIFICATION_LEASE_SECONDS", "120"))
+# Seconds between polls while the outbox is empty
+NOTIFICATION_POLL_INTERVAL = float(os.getenv("NOTIFICATION_POLL_INTERVAL", "5"))
+# Retries back off exponentially from the base delay up to the cap
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+
+WEBHOOK_TIMEOUT_SECONDS = 10
+# Wait for the SMTP pool, queueing included; a timeout is retried like any failure
+EMAIL_TIMEOUT_SECONDS = float(os.getenv("NOTIFICATION_EMAIL_TIMEOUT_SECONDS", "120"))
+
+def idempotency_key(alert_id: int, triggered_at: datetime, channel: str) -> str:
+    """Key of one alert trigger on one channel; also sent as the webhook Idempotency-Key"""
+    return f"alert:{alert_id}:{triggered_at:%Y%m%dT%H%M%S%f}:{channel}"
+
+class Skipped(str):
+    """deliver() result for a channel the dispatcher isn't configured for:
+    recorded as status 'skipped' instead of retried"""
+
+def alert_notifications(row, triggered_at: datetime) -> List[Dict]:
+    """Outbox rows for a fired alert row (see alert_evaluation.fired_alerts_query):
+    the Telegram channel chat, plus the alert's email and webhook. Whether a
+    channel is configured is up to the dispatcher, not the enqueuing process"""
+    payload = {
+        'alert_id': row.alert_id,
+        'product_id': row.product_id,
+        'product_name': row.product_name,
+        'condition': row.condition,
+        'target_price': row.target_price,
+        'current_price': row.price,
+        'previous_price': row.previous_price,
+        'retailer_name': row.retailer_name or "Unknown",
+        'url': row.listing_url or row.source_url or "",
+    }
+    targets = [('telegram', None)]  # the dispatcher's TELEGRAM_CHAT_ID
+    if row.email:
+        targets.append(('email', row.email))
+    if row.webhook_url:
+        targets.append(('webhook', row.webhook_url))
+    return [
+        {'alert_id': row.alert_id, 'idempotency_key': idempotency_key(row.alert_id, triggered_at, channel),
+         'channel': channel, 'target': target, 'payload': payload, 'status': 'pending',
+         'next_attempt_at': triggered_at, 'attempts': 0, 'created_at': triggered_at}
+        for channel, target in targets
+    ]
+
+def enqueue_alert_notifications(db: Session, rows: Iterable, triggered_at: datetime) -> int:
+    """Queue notifications for claimed alerts in the caller's transaction (no commit)"""
+    notifications = [notification for row in rows for notification in alert_notifications(row, triggered_at)]
+    if notifications:
+        db.execute(
+            dialect_insert(db, NotificationOutbox).on_conflict_do_nothing(index_elements=['idempotency_key']),
+            notifications
+        )
+    return len(notifications)
+
+def _claimable(now: datetime):
+    """Pending notifications that are due, plus sends whose dispatcher's lease ran out"""
+    return and_(
+        NotificationOutbox.status.in_(('pending', 'sending')),
+        NotificationOutbox.next_attempt_at <= now
+    )
+
+def claim_notifications(db: Session, owner: str, limit: int = NOTIFICATION_BATCH_SIZE,
+                        lease_seconds: int = NOTIFICATION_LEASE_SECONDS) -> List[NotificationOutbox]:
+    """Lease up to `limit` due notifications for one dispatcher (commits).
+
+    Like claim_jobs: FOR UPDATE SKIP LOCKED on Postgres, and a guarded
+    UPDATE so concurrent dispatchers never receive the same row.
+    """
+    now = datetime.utcnow()
+
+    # Lease expiries count as attempts; stop retrying once they are used up
+    db.query(NotificationOutbox).filter(
+        NotificationOutbox.status == 'sending',
+        NotificationOutbox.next_attempt_at <= now,
+        NotificationOutbox.attempts >= NOTIFICATION_MAX_ATTEMPTS
+    ).update({
+        NotificationOutbox.status: 'failed',
+        NotificationOutbox.last_error: 'lease expired'
+    }, synchronize_session=False)
+
+    ids = [notification_id for (notification_id,) in db.query(NotificationOutbox.id).filter(
+        _claimable(now)
+    ).order_by(NotificationOutbox.next_attempt_at, NotificationOutbox.id).limit(limit).with_for_update(skip_locked=True).all()]
+
+    if not ids:
+        db.commit()
+        return []
+
+    leased_until = now + timedelta(seconds=lease_seconds)
+    db.query(NotificationOutbox).filter(
+        NotificationOutbox.id.in_(ids),
+        _claimable(now)
+    ).update({
+        NotificationOutbox.status: 'sending',
+        NotificationOutbox.lease_owner: owner,
+        NotificationOutbox.next_attempt_at: leased_until,
+        NotificationOutbox.attempts: NotificationOutbox.attempts + 1
+    }, synchronize_session=False)
+    db.commit()
+
+    return db.query(NotificationOutbox).filter(
+        NotificationOutbox.id.in_(ids),
+        NotificationOutbox.status == 'sending',
+        NotificationOutbox.lease_owner == owner,
+        NotificationOutbox.next_attempt_at == leased_until
+    ).order_by(NotificationOutbox.id).all()
+
+def retry_delay(attempts: int) -> float:
+    """Seconds before the next attempt after `attempts` failed ones"""
+    return min(RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), RETRY_MAX_SECONDS)
+
+def record_results(db: Session, owner: str, results: Dict[int, Optional[str]]):
+    """Mark delivered notifications sent and Skipped ones skipped; reschedule
+    failures, or fail them once out of attempts. `results` maps id -> error
+    (None when delivered)."""
+    now = datetime.utcnow()
+    notifications = db.query(NotificationOutbox).filter(
+        NotificationOutbox.id.in_(list(results)),
+        NotificationOutbox.status == 'sending',
+        NotificationOutbox.lease_owner == owner
+    ).all()
+    for notification in notifications:
+        error = results[notification.id]
+        notification.lease_owner = None
+        if error is None:
+            notification.status = 'sent'
+            notification.sent_at = now
+            notification.last_error = None
+        elif isinstance(error, Skipped):
+            notification.status = 'skipped'
+            notification.last_error = error
+        elif notification.attempts >= NOTIFICATION_MAX_ATTEMPTS:
+            notification.status = 'failed'
+            notification.last_error = error[:2000]
+        else:
+            notification.status = 'pending'
+            notification.next_attempt_at = now + timedelta(seconds=retry_delay(notification.attempts))
+            notification.last_error = error[:2000]
+    db.commit()
+
+class OutboxDispatcher:
+    """Drains the outbox in batches, delivering each batch concurrently.
+
+    Telegram goes through the pooled TelegramClient, email through the
+    pooled SMTP sender, webhooks through one aiohttp
+    session with the row's Idempotency-Key header. Any number of
+    dispatchers can run side by side.
+    """
+
+    def __init__(self, owner: Optional[str] = None, session_factory=SessionLocal,
+                 batch_size: int = NOTIFICATION_BATCH_SIZE, lease_seconds: int = NOTIFICATION_LEASE_SECONDS,
+                 poll_interval: float = NOTIFICATION_POLL_INTERVAL, telegram=None, notification=None):
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.telegram = telegram or get_telegram_client()
+        self.notification = notification or NotificationService()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._loop = None
+        self.sent = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def _claim(self) -> List[Dict]:
+        db = self.session_factory()
+        try:
+            return [
+                {'id': n.id, 'channel': n.channel, 'target': n.target, 'payload': n.payload,
+                 'idempotency_key': n.idempotency_key}
+                for n in claim_notifications(db, self.owner, self.batch_size, self.lease_seconds)
+            ]
+        finally:
+            db.close()
+
+    def _record(self, results: Dict[int, Optional[str]]):
+        db = self.session_factory()
+        try:
+            record_results(db, self.owner, results)
+        finally:
+            db.close()
+
+    async def deliver(self, notification: Dict) -> Optional[str]:
+        """Send one notification; returns the error, or None once delivered"""
+        payload = notification['payload']
+        try:
+            if notification['channel'] == 'telegram':
+                if not telegram_configured():
+                    return Skipped("Telegram not configured")
+                text = price_alert_message(
+                    payload['product_name'], payload['current_price'], payload['previous_price'],
+                    payload['retailer_name'], payload['url'], payload['target_price']
+                )
+                sent = await self.telegram.send_message(text, chat_id=notification['target'] or TELEGRAM_CHAT_ID)
+                return None if sent else "Telegram delivery failed"
+
+            if notification['channel'] == 'email':
+                if not self.notification.email_configured:
+                    return Skipped("Email not configured")
+                subject, body = self.notification.alert_email(
+                    payload['product_name'], payload['current_price'], payload['target_price'],
+                    payload['condition'], payload['url']
+                )
+                # Queued on the SMTP pool's persistent connections; no thread waits per email
+                try:
+                    sent = await asyncio.wait_for(asyncio.wrap_future(
+                        self.notification.submit_email(notification['target'], subject, body, True)
+                    ), EMAIL_TIMEOUT_SECONDS)
+                except asyncio.TimeoutError:
+                    return f"Email not sent within {EMAIL_TIMEOUT_SECONDS}s"
+                return None if sent else "Email delivery failed"
+
+            if notification['channel'] == 'webhook':
+                if self._session is None or self._session.closed:
+                    self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=WEBHOOK_TIMEOUT_SECONDS))
+                async with self._session.post(notification['target'], json={
+                    "product_id": payload['product_id'],
+                    "product_name": payload['product_name'],
+                    "current_price": payload['current_price'],
+                    "target_price": payload['target_price'],
+                    "condition": payload['condition']
+                }, headers={"Idempotency-Key": notification['idempotency_key']}) as response:
+                    return None if 200 <= response.status < 300 else f"Webhook returned HTTP {response.status}"
+
+            return f"Unknown channel {notification['channel']!r}"
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+
+    async def dispatch_once(self) -> int:
+        """Claim and deliver one batch; returns the number claimed"""
+        batch = await asyncio.to_thread(self._claim)
+        if not batch:
+            return 0
+        errors = await asyncio.gather(*(self.deliver(notification) for notification in batch))
+        await asyncio.to_thread(self._record, {n['id']: error for n, error in zip(batch, errors)})
+        skipped = sum(isinstance(error, Skipped) for error in errors)
+        failed = sum(error is not None for error in errors) - skipped
+        self.sent += len(batch) - failed - skipped
+        self.skipped += skipped
+        self.failed += failed
+        if failed:
+            print(f"⚠️ Outbox: {failed}/{len(batch)} notifications failed, will retry")
+        return len(batch)
+
+    async def drain(self) -> int:
+        """Deliver batches until nothing is due"""
+        total = 0
+        while True:
+            claimed = await self.dispatch_once()
+            total += claimed
+            if claimed < self.batch_size:
+                return total
+
+    async def run(self):
+        """Dispatch until cancelled, sleeping between polls while the outbox is empty"""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        print(f"✅ Notification dispatcher {self.owner} started")
+        try:
+            while True:
+                try:
+                    await self.drain()
+                except Exception as e:
+                    print(f"❌ Outbox dispatch error: {e}")
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+        finally:
+            self._loop = None
+            await self.close()
+
+    def wake(self):
+        """Deliver newly queued notifications now instead of at the next poll (thread-safe)"""
+        loop, event = self._loop, self._wake
+        if loop is not None and event is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(event.set)
+
+    def start(self):
+        """Run in the background on the current loop (FastAPI lifespan)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            print(f"🛑 Notification dispatcher {self.owner} stopped")
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def stats(self) -> Dict:
+        return {'sent': self.sent, 'skipped': self.skipped, 'failed': self.failed}
+
+_dispatcher: Optional[OutboxDispatcher] = None
+
+def get_outbox_dispatcher() -> OutboxDispatcher:
+    """Process-wide dispatcher"""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = OutboxDispatcher()
+    return _dispatcher
+
+def main():
+    parser = argparse.ArgumentParser(description="Deliver queued alert notifications")
+    parser.add_argument("--batch-size", type=int, default=NOTIFICATION_BATCH_SIZE)
+    parser.add_argument("--once", action="store_true", help="deliver everything due and exit")
+    args = parser.parse_args()
+
+    async def dispatch():
+        dispatcher = OutboxDispatcher(batch_size=args.batch_size)
+        try:
+            if args.once:
+                print(f"[{datetime.now()}] Delivered {await dispatcher.drain()} notifications")
+            else:
+                await dispatcher.run()
+        finally:
+            await dispatcher.close()
+            await dispatcher.telegram.close()
+            await asyncio.to_thread(close_smtp_pools)
+
+    try:
+        asyncio.run(dispatch())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
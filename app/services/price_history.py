@@ -0,0 +1,200 @@
+"""
+Price History
+Chart-ready price history: raw points, SQL time buckets over raw prices and
+daily rollups, and LTTB downsampling to cap the number of points
+"""
+
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import func, select, union_all
+from sqlalchemy.orm import Session
+
+from app.database import time_bucket
+from app.models import Price, PriceHistory
+from app.services.retention import RAW_HISTORY_DAYS, day_start, rollup_horizon
+
+# Upper bound on points per response; larger results are LTTB-downsampled
+MAX_HISTORY_POINTS = int(os.getenv("PRICE_HISTORY_MAX_POINTS", "2000"))
+
+BUCKET_SECONDS = {"hour": 3600, "day": 86400, "week": 7 * 86400}
+
+def resolution_for(days: int, buckets: int) -> str:
+    """Finest of hour/day/week that covers the window in at most `buckets` buckets"""
+    for unit, seconds in BUCKET_SECONDS.items():
+        if days * 86400 / seconds <= buckets:
+            return unit
+    return "week"
+
+def lttb(points: Sequence[Tuple[float, float]], threshold: int) -> List[int]:
+    """Indices of the points kept by Largest-Triangle-Three-Buckets, first and last included"""
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    every = (n - 2) / (threshold - 2)
+    kept = [0]
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        span = next_end - next_start
+        avg_x = sum(x for x, _ in points[next_start:next_end]) / span
+        avg_y = sum(y for _, y in points[next_start:next_end]) / span
+
+        ax, ay = points[a]
+        best, best_area = int(i * every) + 1, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        kept.append(best)
+        a = best
+    kept.append(n - 1)
+    return kept
+
+def series_budgets(lengths: Sequence[int], max_points: int) -> List[int]:
+    """Points per series summing to at most max_points: short series keep all
+    their points, the rest share what is left, leftovers going to the longest"""
+    budgets = [0] * len(lengths)
+    remaining = max_points
+    by_length = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    for rank, i in enumerate(by_length):
+        budgets[i] = min(lengths[i], remaining // (len(by_length) - rank))
+        remaining -= budgets[i]
+    for i in reversed(by_length):
+        extra = min(remaining, lengths[i] - budgets[i])
+        budgets[i] += extra
+        remaining -= extra
+    return budgets
+
+def downsample(history: List[Dict], max_points: int) -> List[Dict]:
+    """LTTB on each retailer's series, sharing max_points between them.
+
+    A series left fewer than 3 points keeps its first and last (or just its
+    latest) point; one left none is dropped, so the total never exceeds max_points.
+    """
+    series: Dict[int, List[Dict]] = defaultdict(list)
+    for point in history:
+        series[point["retailer_id"]].append(point)
+
+    kept = []
+    for points, budget in zip(series.values(), series_budgets([len(points) for points in series.values()], max_points)):
+        if budget >= len(points):
+            kept += points
+        elif budget >= 3:
+            xy = [(point["scraped_at"].timestamp(), point["price"]) for point in points]
+            kept += [points[i] for i in lttb(xy, budget)]
+        elif budget == 2:
+            kept += [points[0], points[-1]]
+        elif budget == 1:
+            kept.append(points[-1])
+    return sorted(kept, key=lambda point: (point["scraped_at"], point["retailer_id"]))
+
+def raw_history(db: Session, product_id: int, since: datetime) -> List[Dict]:
+    rows = db.query(Price.price, Price.retailer_id, Price.scraped_at).filter(
+        Price.product_id == product_id,
+        Price.scraped_at >= since
+    ).order_by(Price.scraped_at).all()
+    return [{"price": price, "retailer_id": retailer_id, "scraped_at": scraped_at} for price, retailer_id, scraped_at in rows]
+
+def bucketed_history(db: Session, product_id: int, since: datetime, unit: str) -> List[Dict]:
+    """last/min/avg/max per retailer and hour/day/week bucket, aggregated in SQL.
+
+    Day and week buckets read daily rollups before the product's rollup
+    horizon and raw prices after it, so they reach past raw retention; avg is
+    then the mean of the daily averages. Hour buckets read raw prices only.
+    """
+    horizon = rollup_horizon(db, product_id) if unit != "hour" else None
+    raw_since = max(since, horizon) if horizon else since
+
+    sources = [select(
+        Price.retailer_id,
+        Price.scraped_at.label("observed_at"),
+        Price.price,
+        Price.price.label("min_price"),
+        Price.price.label("avg_price"),
+        Price.price.label("max_price")
+    ).where(Price.product_id == product_id, Price.scraped_at >= raw_since)]
+    if horizon and horizon > since:
+        sources.append(select(
+            PriceHistory.retailer_id,
+            PriceHistory.recorded_at,
+            PriceHistory.price,
+            PriceHistory.min_price,
+            PriceHistory.avg_price,
+            PriceHistory.max_price
+        ).where(
+            PriceHistory.product_id == product_id,
+            PriceHistory.recorded_at >= day_start(since),
+            PriceHistory.recorded_at < horizon
+        ))
+    observations = union_all(*sources).subquery() if len(sources) > 1 else sources[0].subquery()
+
+    bucket = time_bucket(db, observations.c.observed_at, unit)
+    partition = (observations.c.retailer_id, bucket)
+    ranked = select(
+        observations.c.retailer_id,
+        bucket.label("bucket"),
+        observations.c.price,
+        func.row_number().over(partition_by=partition, order_by=observations.c.observed_at.desc()).label("bucket_rank"),
+        func.min(observations.c.min_price).over(partition_by=partition).label("min_price"),
+        func.avg(observations.c.avg_price).over(partition_by=partition).label("avg_price"),
+        func.max(observations.c.max_price).over(partition_by=partition).label("max_price"),
+        func.count().over(partition_by=partition).label("points")
+    ).subquery()
+
+    rows = db.execute(
+        select(ranked).where(ranked.c.bucket_rank == 1).order_by(ranked.c.bucket, ranked.c.retailer_id)
+    ).mappings().all()
+    return [
+        {
+            "price": row["price"],
+            "retailer_id": row["retailer_id"],
+            "scraped_at": row["bucket"],
+            "min_price": row["min_price"],
+            "avg_price": round(row["avg_price"], 2),
+            "max_price": row["max_price"],
+            "points": row["points"]
+        }
+        for row in rows
+    ]
+
+def price_history(
+    db: Session,
+    product_id: int,
+    days: int,
+    resolution: Optional[str] = None,
+    buckets: Optional[int] = None,
+    max_points: Optional[int] = None
+) -> Dict:
+    """History for the last `days`, at an explicit resolution, `buckets` buckets or the default.
+
+    By default windows up to RAW_HISTORY_DAYS are raw and longer ones daily.
+    Results above max_points (MAX_HISTORY_POINTS when unset) are downsampled.
+    """
+    since = datetime.utcnow() - timedelta(days=days)
+    if resolution is None:
+        resolution = resolution_for(days, buckets) if buckets else ("raw" if days <= RAW_HISTORY_DAYS else "day")
+
+    if resolution == "raw":
+        history = raw_history(db, product_id, since)
+    else:
+        history = bucketed_history(db, product_id, since, resolution)
+
+    limit = min(max_points or MAX_HISTORY_POINTS, MAX_HISTORY_POINTS)
+    downsampled = len(history) > limit
+    if downsampled:
+        history = downsample(history, limit)
+
+    return {
+        "product_id": product_id,
+        "days": days,
+        "resolution": resolution,
+        "downsampled": downsampled,
+        "data_points": len(history),
+        "history": history
+    }
@@ -0,0 +1,76 @@
+"""
+Product Identity Cache
+Bounded LRU of (name, category) -> product id for the scrape ingest path
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", "50000"))
+
+ProductKey = Tuple[str, str]
+
+class ProductKeyCache:
+    """Thread-safe LRU shared by every ScraperService in the process"""
+
+    def __init__(self, maxsize: int = PRODUCT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._ids: "OrderedDict[ProductKey, int]" = OrderedDict()
+        self._keys: Dict[int, ProductKey] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: ProductKey) -> Optional[int]:
+        with self._lock:
+            product_id = self._ids.get(key)
+            if product_id is None:
+                self.misses += 1
+                return None
+            self._ids.move_to_end(key)
+            self.hits += 1
+            return product_id
+
+    def put(self, key: ProductKey, product_id: int):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            old_id = self._ids.pop(key, None)
+            if old_id is not None:
+                self._keys.pop(old_id, None)
+            self._ids[key] = product_id
+            self._keys[product_id] = key
+            while len(self._ids) > self.maxsize:
+                _, evicted_id = self._ids.popitem(last=False)
+                self._keys.pop(evicted_id, None)
+
+    def invalidate(self, product_id: int):
+        """Forget a product after it is renamed, recategorized or deleted"""
+        with self._lock:
+            key = self._keys.pop(product_id, None)
+            if key is not None:
+                self._ids.pop(key, None)
+
+    def invalidate_keys(self, keys: Iterable[ProductKey]):
+        with self._lock:
+            for key in keys:
+                product_id = self._ids.pop(key, None)
+                if product_id is not None:
+                    self._keys.pop(product_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+            self._keys.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'size': len(self._ids), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+_product_cache = ProductKeyCache()
+
+def get_product_cache() -> ProductKeyCache:
+    """Process-wide product key cache"""
+    return _product_cache
@@ -0,0 +1,51 @@
+"""
+Product Search
+Ranked full-text search over name, brand, model and description: Postgres
+tsvector + GIN with pg_trgm fuzzy name matches, SQLite FTS5 for tests and
+local dev (indexes in app/models.py PRODUCT_SEARCH_DDL)
+"""
+
+import re
+from typing import List, Optional, Tuple
+from sqlalchemy import func, literal_column, or_, select, table
+from sqlalchemy.orm import Query, Session
+
+from app.models import Product
+
+SEARCH_CONFIG = "simple"
+
+# bm25 column weights for products_fts(name, brand, model, description)
+FTS5_WEIGHTS = (10.0, 4.0, 4.0, 1.0)
+
+def search_terms(text: str) -> List[str]:
+    """Lowercased word tokens; everything else (quotes, operators) is dropped"""
+    return re.findall(r"\w+", text.lower())
+
+def apply_search(db: Session, query: Query, text: str) -> Tuple[Query, Optional[object]]:
+    """Restrict query to products matching every term (as a prefix).
+
+    Returns the query and a relevance sort key, ascending (lower = better),
+    or None when text has no searchable terms.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return query, None
+
+    if db.get_bind().dialect.name == "postgresql":
+        search_vector = literal_column("products.search_vector")
+        tsquery = func.to_tsquery(SEARCH_CONFIG, " & ".join(f"{term}:*" for term in terms))
+        phrase = " ".join(terms)
+        query = query.filter(or_(
+            search_vector.op("@@")(tsquery),
+            Product.name.op("%")(phrase)  # trigram similarity catches typos
+        ))
+        return query, -(func.ts_rank_cd(search_vector, tsquery) + func.similarity(Product.name, phrase))
+
+    fts = literal_column("products_fts")
+    matches = select(
+        literal_column("rowid").label("product_id"),
+        func.bm25(fts, *FTS5_WEIGHTS).label("rank")
+    ).select_from(table("products_fts")).where(
+        fts.op("MATCH")(" ".join(f'"{term}"*' for term in terms))
+    ).subquery("search")
+    return query.join(matches, matches.c.product_id == Product.id), matches.c.rank
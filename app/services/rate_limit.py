@@ -0,0 +1,152 @@
+"""
+Rate Limiting
+Thread-safe token buckets with backoff and concurrency slots, shared by the
+scrapers' per-retailer limiters and the Telegram client
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, List, Optional, Tuple
+
+def _resolve(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+class TokenBucket:
+    """Thread-safe token bucket that backs off when the server pushes back"""
+
+    def __init__(self, requests_per_second: float, burst: int = 1, max_concurrency: int = 1):
+        self._lock = threading.Lock()
+        # Signalled when a concurrent request slot frees up or more are allowed
+        self._slot_free = threading.Condition(self._lock)
+        # Coroutines waiting for a slot: (their loop, a future to resolve)
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self.in_flight = 0
+        self.burst = max(1, int(burst))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.base_rate = self.rate = float(requests_per_second)
+        self.configure(requests_per_second, burst, max_concurrency)
+
+    def configure(self, requests_per_second: float, burst: int, max_concurrency: int):
+        """Apply (new) limits; a backoff in progress carries over, scaled to the new rate"""
+        if not requests_per_second > 0:
+            raise ValueError(f"requests_per_second must be positive, got {requests_per_second!r}")
+        with self._lock:
+            backoff = self.rate / self.base_rate
+            self._refill(time.monotonic())
+            self.base_rate = float(requests_per_second)
+            self.min_rate = self.base_rate / 16
+            self.rate = max(self.min_rate, self.base_rate * backoff)
+            self.burst = max(1, int(burst))
+            self.tokens = min(self.tokens, self.burst)
+            # Requests already holding a slot keep it; waiters see the new limit
+            self.max_concurrency = max(1, int(max_concurrency))
+            self._slot_free.notify_all()
+            self._wake_async_waiters()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token and return how many seconds to wait before using it.
+
+        Tokens may go negative, so concurrent callers queue up behind each
+        other instead of all waking at the same moment.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Wait until a request may be sent without blocking the event loop"""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the retailer's concurrent request slots"""
+        with self._slot_free:
+            while self.in_flight >= self.max_concurrency:
+                self._slot_free.wait()
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            self._release_slot()
+
+    @asynccontextmanager
+    async def aslot(self):
+        """slot() for coroutines: waits without blocking the event loop, sharing
+        the same count with threads using slot()"""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self.in_flight < self.max_concurrency:
+                    self.in_flight += 1
+                    break
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            await waiter
+        try:
+            yield
+        finally:
+            self._release_slot()
+
+    def _release_slot(self):
+        with self._slot_free:
+            self.in_flight -= 1
+            self._slot_free.notify()
+            self._wake_async_waiters()
+
+    def _wake_async_waiters(self):
+        """Let every waiting coroutine re-check for a free slot (lock held)"""
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_resolve, waiter)
+
+    def backoff(self, retry_after: Optional[float] = None):
+        """Halve the rate and pause all requests after a 429/503"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate / 2)
+            pause = retry_after if retry_after is not None else 1 / self.rate
+            self.blocked_until = max(self.blocked_until, now + pause)
+            self.tokens = min(self.tokens, 0.0)
+
+    def pause(self, seconds: float):
+        """Hold all requests for seconds without lowering the rate"""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def record_success(self):
+        """Recover a tenth of the configured rate per successful request"""
+        if self.rate < self.base_rate:
+            with self._lock:
+                self._refill(time.monotonic())
+                self.rate = min(self.base_rate, self.rate + self.base_rate / 10)
+
+    def stats(self) -> Dict:
+        return {
+            'requests_per_second': round(self.rate, 3),
+            'configured_requests_per_second': self.base_rate,
+            'burst': self.burst,
+            'max_concurrency': self.max_concurrency,
+            'backing_off': self.rate < self.base_rate
+        }
@@ -0,0 +1,253 @@
+"""
+Response Cache
+Cached GET responses with strong ETags for the polled product endpoints,
+invalidated by product and price writes
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode
+
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1") != "0"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2000"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "600"))
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL")
+# Queue workers ingest prices in their own processes; their invalidations
+# only reach the API through the shared backend
+SCRAPER_WORK_QUEUE = os.getenv("SCRAPER_WORK_QUEUE", "0") == "1"
+
+# Part of every key; bumping it drops everything (retailer edits, retention, rebuilds)
+ALL_TAG = "*"
+
+def product_tag(product_id: int) -> str:
+    return f"product:{product_id}"
+
+# GET paths served from the cache -> tags whose invalidation drops the response
+CACHED_ROUTES: List[Tuple["re.Pattern", Callable[["re.Match"], List[str]]]] = [
+    (re.compile(r"^/api/v1/products/categories/?$"), lambda match: []),
+    (re.compile(r"^/api/v1/products/(\d+)(?:/comparison)?/?$"), lambda match: [product_tag(int(match[1]))]),
+]
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    media_type: str
+    etag: str
+    expires_at: float
+
+    def encode(self) -> bytes:
+        return b"\n".join([self.etag.encode(), self.media_type.encode(), self.body])
+
+    @classmethod
+    def decode(cls, value: bytes, ttl: int) -> "CachedResponse":
+        etag, media_type, body = value.split(b"\n", 2)
+        return cls(body, media_type.decode(), etag.decode(), time.time() + ttl)
+
+def etag_for(body: bytes) -> str:
+    """Strong ETag: a digest of the exact response bytes"""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 specifies for it)"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+class MemoryBackend:
+    """Shared-backend stand-in held in this process (tests, single-worker deploys)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[str, Tuple[bytes, Optional[float]]] = {}
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        now = time.time()
+        with self._lock:
+            items = [self._values.get(key) for key in keys]
+        return [item[0] if item and (item[1] is None or item[1] > now) else None for item in items]
+
+    def set(self, key: str, value: bytes, ttl: int):
+        with self._lock:
+            self._values[key] = (value, time.time() + ttl)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            count = int(self._values.get(key, (b"0", None))[0]) + 1
+            self._values[key] = (str(count).encode(), None)
+            return count
+
+class RedisBackend:
+    """Redis shared by every API and scraper process"""
+
+    def __init__(self, url: str):
+        import redis  # optional; only needed when RESPONSE_CACHE_REDIS_URL is set
+        self._redis = redis.Redis.from_url(url)
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return self._redis.mget(keys)
+
+    def set(self, key: str, value: bytes, ttl: int):
+        self._redis.set(key, value, ex=ttl)
+
+    def incr(self, key: str) -> int:
+        return self._redis.incr(key)
+
+class ResponseCache:
+    """Thread-safe LRU of response bodies in front of an optional shared backend.
+
+    Keys embed the current generation of each invalidation tag, so
+    invalidating a tag bumps its generation and every older entry stops
+    matching; a response built while a write commits is stored under the
+    generation it read first and is never served after the bump.
+    """
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, ttl: int = RESPONSE_CACHE_TTL, shared=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def key(self, url: str, tags: List[str]) -> str:
+        tags = [ALL_TAG, *tags]
+        if self.shared is not None:
+            generations = [int(value or 0) for value in self.shared.get_many([f"gen:{tag}" for tag in tags])]
+        else:
+            with self._lock:
+                generations = [self._generations.get(tag, 0) for tag in tags]
+        return url + "#" + ",".join(f"{tag}@{generation}" for tag, generation in zip(tags, generations))
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self._entries.pop(key, None)
+        if self.shared is not None:
+            value = self.shared.get_many([key])[0]
+            if value is not None:
+                entry = CachedResponse.decode(value, self.ttl)
+                with self._lock:
+                    self._store(key, entry)
+                    self.hits += 1
+                return entry
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, body: bytes, media_type: str) -> CachedResponse:
+        entry = CachedResponse(body, media_type, etag_for(body), time.time() + self.ttl)
+        with self._lock:
+            self._store(key, entry)
+        if self.shared is not None:
+            self.shared.set(key, entry.encode(), self.ttl)
+        return entry
+
+    def _store(self, key: str, entry: CachedResponse):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, tags: Iterable[str]):
+        for tag in tags:
+            with self._lock:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            if self.shared is not None:
+                self.shared.incr(f"gen:{tag}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self.invalidate([ALL_TAG])
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'size': len(self._entries), 'maxsize': self.maxsize, 'hits': self.hits,
+                'misses': self.misses, 'not_modified': self.not_modified
+            }
+
+_response_cache = ResponseCache(shared=RedisBackend(RESPONSE_CACHE_REDIS_URL) if RESPONSE_CACHE_REDIS_URL else None)
+
+def response_cache_enabled(enabled: bool = RESPONSE_CACHE_ENABLED, work_queue: bool = SCRAPER_WORK_QUEUE,
+                           redis_url: Optional[str] = RESPONSE_CACHE_REDIS_URL) -> bool:
+    """Whether the API serves cached responses: never from an in-process
+    cache that queue workers' price writes can't invalidate"""
+    if enabled and work_queue and not redis_url:
+        print("⚠️ Response cache disabled: SCRAPER_WORK_QUEUE=1 ingests prices in worker processes "
+              "that can't invalidate an in-process cache; set RESPONSE_CACHE_REDIS_URL to enable it")
+        return False
+    return enabled
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide response cache"""
+    return _response_cache
+
+def invalidate_products(product_ids: Iterable[int]):
+    """Drop cached responses for products whose row or prices changed (after commit)"""
+    _response_cache.invalidate({product_tag(product_id) for product_id in product_ids})
+
+def invalidate_all():
+    """Drop every cached response"""
+    _response_cache.invalidate([ALL_TAG])
+
+def cached_route_tags(request: Request) -> Optional[List[str]]:
+    """Invalidation tags for a cacheable request, or None if it isn't cached"""
+    if request.method != "GET":
+        return None
+    for pattern, tags in CACHED_ROUTES:
+        match = pattern.match(request.url.path)
+        if match:
+            return tags(match)
+    return None
+
+class ResponseCacheMiddleware(BaseHTTPMiddleware):
+    """Serve CACHED_ROUTES from the response cache, with ETag and 304 Not Modified"""
+
+    async def dispatch(self, request: Request, call_next):
+        tags = cached_route_tags(request)
+        if tags is None:
+            return await call_next(request)
+
+        cache = get_response_cache()
+        # Shared-backend lookups are network calls; keep them off the event loop
+        call = run_in_threadpool if cache.shared is not None else _call
+        url = request.url.path + "?" + urlencode(sorted(request.query_params.multi_items()))
+        key = await call(cache.key, url, tags)
+        entry = await call(cache.get, key)
+        status = "HIT"
+        if entry is None:
+            response = await call_next(request)
+            if response.status_code != 200:
+                return response
+            body = b"".join([chunk async for chunk in response.body_iterator])
+            entry = await call(cache.put, key, body, response.headers.get("content-type", "application/json"))
+            status = "MISS"
+
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache", "X-Cache": status}
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            cache.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(entry.body, media_type=entry.media_type, headers=headers)
+
+async def _call(function, *args):
+    return function(*args)
@@ -0,0 +1,173 @@
+"""
+Price Retention
+Rolls raw prices into daily price_history buckets, prunes raw rows past the
+retention window and keeps monthly prices partitions ahead of ingest (Postgres)
+
+    python -m app.services.retention run
+"""
+
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from app.database import time_bucket
+from app.models import Price, PriceHistory
+from app.services.response_cache import invalidate_all
+
+PRICE_RETENTION_DAYS = int(os.getenv("PRICE_RETENTION_DAYS", "90"))
+RETENTION_RUN_AT = os.getenv("PRICE_RETENTION_RUN_AT", "03:30")  # daily, scheduler local time
+PARTITION_MONTHS_AHEAD = int(os.getenv("PRICE_PARTITION_MONTHS_AHEAD", "3"))
+# History windows up to this many days read raw prices, longer ones daily rollups
+RAW_HISTORY_DAYS = min(int(os.getenv("PRICE_HISTORY_RAW_DAYS", "30")), PRICE_RETENTION_DAYS)
+
+PARTITION_NAME = re.compile(r"^prices_y(\d{4})m(\d{2})$")
+
+def day_start(moment: datetime) -> datetime:
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def month_start(moment: datetime, months_ahead: int = 0) -> datetime:
+    month = moment.year * 12 + moment.month - 1 + months_ahead
+    return datetime(month // 12, month % 12 + 1, 1)
+
+def partition_name(month: datetime) -> str:
+    return f"prices_y{month.year}m{month.month:02d}"
+
+def rollup_horizon(db: Session, product_id: int) -> Optional[datetime]:
+    """End of a product's rolled-up range: the day after its newest price_history bucket"""
+    latest = db.query(func.max(PriceHistory.recorded_at)).filter(PriceHistory.product_id == product_id).scalar()
+    return latest + timedelta(days=1) if latest else None
+
+def rolled_up(db: Session):
+    """Whether a raw price's (product, retailer, day) already has its price_history bucket"""
+    return select(PriceHistory.id).where(
+        PriceHistory.product_id == Price.product_id,
+        PriceHistory.retailer_id == Price.retailer_id,
+        PriceHistory.recorded_at == time_bucket(db, Price.scraped_at, "day")
+    ).exists()
+
+def rollup_prices(db: Session, until: Optional[datetime] = None) -> int:
+    """Roll complete days of raw prices into price_history and commit.
+
+    One row per product, retailer and day: price is the day's last price,
+    avg/min/max cover all of that day's scrapes. Each bucket is written once,
+    whenever its day has no rollup yet, so late prices for a day nobody
+    rolled up are picked up on the next run.
+    """
+    until = day_start(until or datetime.utcnow())
+
+    day = time_bucket(db, Price.scraped_at, "day")
+    bucket = (Price.product_id, Price.retailer_id, day)
+    ranked = select(
+        Price.product_id,
+        Price.retailer_id,
+        Price.price,
+        day.label("day"),
+        func.row_number().over(partition_by=bucket, order_by=(Price.scraped_at.desc(), Price.id.desc())).label("day_rank"),
+        func.avg(Price.price).over(partition_by=bucket).label("avg_price"),
+        func.min(Price.price).over(partition_by=bucket).label("min_price"),
+        func.max(Price.price).over(partition_by=bucket).label("max_price")
+    ).where(Price.scraped_at < until, ~rolled_up(db)).subquery()
+
+    source = select(
+        ranked.c.product_id,
+        ranked.c.retailer_id,
+        ranked.c.price,
+        ranked.c.day,
+        ranked.c.avg_price,
+        ranked.c.min_price,
+        ranked.c.max_price
+    ).where(ranked.c.day_rank == 1)
+
+    columns = ["product_id", "retailer_id", "price", "recorded_at", "avg_price", "min_price", "max_price"]
+    result = db.execute(PriceHistory.__table__.insert().from_select(columns, source))
+    db.commit()
+    return result.rowcount
+
+def is_partitioned(db: Session) -> bool:
+    """Whether prices was converted to a partitioned table (alembic revision 0004)"""
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return bool(db.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'prices'::regclass"
+    )).scalar())
+
+def ensure_partitions(db: Session, months_ahead: int = PARTITION_MONTHS_AHEAD, now: Optional[datetime] = None) -> List[str]:
+    """Create monthly partitions from this month to months_ahead and commit"""
+    if not is_partitioned(db):
+        return []
+    now = now or datetime.utcnow()
+    names = []
+    for offset in range(months_ahead + 1):
+        start, end = month_start(now, offset), month_start(now, offset + 1)
+        names.append(partition_name(start))
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF prices "
+            f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+        ))
+    db.commit()
+    return names
+
+def drop_expired_partitions(db: Session, cutoff: datetime) -> List[str]:
+    """Drop monthly partitions that end on or before cutoff and commit"""
+    if not is_partitioned(db):
+        return []
+    partitions = db.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = 'prices'::regclass"
+    )).scalars().all()
+
+    dropped = []
+    for name in sorted(partitions):
+        match = PARTITION_NAME.match(name)
+        if match and month_start(datetime(int(match[1]), int(match[2]), 1), 1) <= cutoff:
+            db.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    db.commit()
+    return dropped
+
+def prune_prices(db: Session, now: Optional[datetime] = None) -> int:
+    """Delete raw prices older than the retention window whose day is rolled up"""
+    cutoff = day_start((now or datetime.utcnow()) - timedelta(days=PRICE_RETENTION_DAYS))
+
+    # A partition goes only if every price in it is rolled up
+    pending = db.query(func.min(Price.scraped_at)).filter(Price.scraped_at < cutoff, ~rolled_up(db)).scalar()
+    if pending:
+        print(f"⚠️ Keeping raw prices since {pending:%Y-%m-%d} that are not rolled up yet")
+    dropped = drop_expired_partitions(db, min(cutoff, day_start(pending)) if pending else cutoff)
+    if dropped:
+        print(f"🗑️ Dropped partitions: {', '.join(dropped)}")
+
+    deleted = db.query(Price).filter(Price.scraped_at < cutoff, rolled_up(db)).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def run_retention(db: Session, now: Optional[datetime] = None) -> Dict:
+    """Daily job: partitions ahead, rollups up to yesterday, then pruning"""
+    now = now or datetime.utcnow()
+    partitions = ensure_partitions(db, now=now)
+    rolled_up = rollup_prices(db, until=now)
+    deleted = prune_prices(db, now=now)
+    if deleted:
+        invalidate_all()  # product detail lists the raw prices
+    print(f"✅ Retention: {rolled_up} daily rollups, {deleted} raw prices pruned")
+    return {"partitions": partitions, "rolled_up": rolled_up, "deleted": deleted}
+
+def main():
+    if sys.argv[1:] != ["run"]:
+        print("Usage: python -m app.services.retention run")
+        sys.exit(1)
+
+    from app.database import SessionLocal
+    db = SessionLocal()
+    try:
+        run_retention(db)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Scrape Prioritization
+Per product/retailer next-due times from price volatility and alert proximity
+"""
+
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import dialect_insert
+from app.models import Price, PriceAlert, ScrapeSchedule
+
+# Bounds on how often a product is re-scraped at one retailer
+MIN_INTERVAL_MINUTES = float(os.getenv("SCRAPE_MIN_INTERVAL_MINUTES", "15"))
+MAX_INTERVAL_MINUTES = float(os.getenv("SCRAPE_MAX_INTERVAL_MINUTES", "1440"))
+# Interval while there are too few observations to judge volatility
+DEFAULT_INTERVAL_MINUTES = float(os.getenv("SCRAPE_DEFAULT_INTERVAL_MINUTES", "60"))
+
+# Prices looked at when measuring volatility
+VOLATILITY_WINDOW_DAYS = int(os.getenv("SCRAPE_VOLATILITY_WINDOW_DAYS", "14"))
+MIN_OBSERVATIONS = 3
+# Coefficient of variation that alone earns the minimum interval (5%)
+VOLATILITY_REFERENCE = 0.05
+
+# Any active alert counts this much; one whose target is within
+# ALERT_PROXIMITY_BAND of the current price counts up to 1 + this much
+ALERT_WEIGHT = 0.25
+ALERT_PROXIMITY_BAND = 0.10
+
+def priority_score(volatility: float, alert_proximity: Optional[float]) -> float:
+    """Combine volatility and alert closeness; 1.0 or more means scrape as often as allowed"""
+    score = volatility / VOLATILITY_REFERENCE
+    if alert_proximity is not None:
+        score += ALERT_WEIGHT + max(0.0, 1 - alert_proximity / ALERT_PROXIMITY_BAND)
+    return score
+
+def interval_for(score: float) -> float:
+    """Map a priority score to minutes between scrapes"""
+    ratio = MAX_INTERVAL_MINUTES / MIN_INTERVAL_MINUTES
+    return max(MIN_INTERVAL_MINUTES, MAX_INTERVAL_MINUTES / (1 + score * (ratio - 1)))
+
+def coefficient_of_variation(mean: Optional[float], mean_sq: Optional[float]) -> float:
+    """Standard deviation over mean, from the mean of prices and of their squares"""
+    if not mean:
+        return 0.0
+    return max(0.0, mean_sq - mean * mean) ** 0.5 / mean
+
+def target_proximity(price: Optional[float], targets: List[float]) -> Optional[float]:
+    """Relative distance from price to the nearest active alert target, None without alerts"""
+    targets = [target for target in targets if target]
+    if not targets:
+        return None
+    if price is None:
+        return 0.0
+    return min(abs(price - target) / target for target in targets)
+
+def schedule_interval(count: int, volatility: float, proximity: Optional[float]) -> float:
+    """Minutes between scrapes for a pair's observation count, volatility and alert proximity"""
+    if count < MIN_OBSERVATIONS:
+        interval = DEFAULT_INTERVAL_MINUTES
+        if proximity is not None:
+            interval = min(interval, interval_for(priority_score(0.0, proximity)))
+        return interval
+    return interval_for(priority_score(volatility, proximity))
+
+def reschedule_many(db: Session, retailer_id: int, product_ids: Iterable[int]) -> Dict[int, float]:
+    """Reschedule several products at one retailer and commit; returns their intervals.
+
+    Volatility, latest prices and alert targets are read for the whole batch
+    (three queries, however many products) and the schedules written with
+    one upsert.
+    """
+    product_ids = list(dict.fromkeys(product_ids))
+    if not product_ids:
+        return {}
+    now = datetime.utcnow()
+    at_retailer = (Price.product_id.in_(product_ids), Price.retailer_id == retailer_id)
+
+    stats = {
+        product_id: (count, coefficient_of_variation(mean, mean_sq))
+        for product_id, count, mean, mean_sq in db.query(
+            Price.product_id,
+            func.count(Price.id),
+            func.avg(Price.price),
+            func.avg(Price.price * Price.price)
+        ).filter(
+            *at_retailer,
+            Price.scraped_at >= now - timedelta(days=VOLATILITY_WINDOW_DAYS)
+        ).group_by(Price.product_id)
+    }
+
+    ranked = db.query(
+        Price.product_id,
+        Price.price,
+        func.row_number().over(
+            partition_by=Price.product_id,
+            order_by=(Price.scraped_at.desc(), Price.id.desc())
+        ).label('rank')
+    ).filter(*at_retailer).subquery()
+    latest = dict(db.query(ranked.c.product_id, ranked.c.price).filter(ranked.c.rank == 1).all())
+
+    targets: Dict[int, List[float]] = defaultdict(list)
+    for product_id, target in db.query(PriceAlert.product_id, PriceAlert.target_price).filter(
+        PriceAlert.product_id.in_(product_ids),
+        PriceAlert.is_active == True
+    ):
+        targets[product_id].append(target)
+
+    rows = []
+    for product_id in product_ids:
+        count, volatility = stats.get(product_id, (0, 0.0))
+        proximity = target_proximity(latest.get(product_id), targets[product_id])
+        interval = schedule_interval(count, volatility, proximity)
+        rows.append({
+            'product_id': product_id,
+            'retailer_id': retailer_id,
+            'volatility': volatility,
+            'alert_proximity': proximity,
+            'interval_minutes': interval,
+            'last_scraped_at': now,
+            'next_due_at': now + timedelta(minutes=interval)
+        })
+
+    stmt = dialect_insert(db, ScrapeSchedule)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=['product_id', 'retailer_id'],
+            set_={column: getattr(stmt.excluded, column) for column in rows[0] if column not in ('product_id', 'retailer_id')}
+        ).execution_options(render_nulls=True),
+        rows
+    )
+    db.commit()
+    return {row['product_id']: row['interval_minutes'] for row in rows}
+
+def make_due(db: Session, product_id: int):
+    """Scrape a product at every retailer on the next run (e.g. a new alert was set)"""
+    db.query(ScrapeSchedule).filter(
+        ScrapeSchedule.product_id == product_id
+    ).update({ScrapeSchedule.next_due_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
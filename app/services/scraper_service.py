@@ -2,81 +2,27 @@
 Scraper Service with Email Notifications
 """
 
-import os
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from typing import List
-
-from app.models import PriceAlert, Price, Product
-
-class NotificationService:
-    def __init__(self):
-        self.smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-        self.smtp_port = int(os.getenv("SMTP_PORT", "587"))
-        self.smtp_username = os.getenv("SMTP_USERNAME")
-        self.smtp_password = os.getenv("SMTP_PASSWORD")
-        self.from_email = os.getenv("FROM_EMAIL", "alerts@priceaggregator.com")
-
-    def send_email(self, to_email: str, subject: str, body: str, html: bool = False):
-        """Send email notification"""
-        if not self.smtp_username or not self.smtp_password:
-            print(f"⚠️ Email not configured. Would send to {to_email}:")
-            print(f"Subject: {subject}")
-            return False
-
-        try:
-            msg = MIMEMultipart()
-            msg['From'] = self.from_email
-            msg['To'] = to_email
-            msg['Subject'] = subject
-
-            content_type = 'html' if html else 'plain'
-            msg.attach(MIMEText(body, content_type))
-
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.smtp_username, self.smtp_password)
-            server.send_message(msg)
-            server.quit()
-
-            print(f"✅ Email sent to {to_email}")
-            return True
-        except Exception as e:
-            print(f"❌ Email failed: {e}")
-            return False
-
-    def send_alert_notification(self, alert: PriceAlert, price: Price, product: Product):
-        """Send price alert notification"""
-        if not alert.email:
-            return
-
-        subject = f"🚨 Price Alert: {product.name}"
-
-        body = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif;">
-            <h2>Price Alert Triggered!</h2>
-            <p><strong>Product:</strong> {product.name}</p>
-            <p><strong>Current Price:</strong> ${price.price}</p>
-            <p><strong>Your Target:</strong> ${alert.target_price} ({alert.condition})</p>
-            <p><a href="{price.listing_url}" style="background: #007bff; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">View Deal</a></p>
-        </body>
-        </html>
-        """
-
-        self.send_email(alert.email, subject, body, html=True)
-
-    def send_webhook(self, url: str, payload: dict):
-        """Send webhook notification"""
-        import requests
-        try:
-            response = requests.post(url, json=payload, timeout=10)
-            return response.status_code == 200
-        except Exception as e:
-            print(f"❌ Webhook failed: {e}")
-            return False
+from typing import Dict, Iterable, List, Tuple
+
+from app.database import dialect_insert
+from app.models import Price, Product
+from app.services.alert_evaluation import alert_rows_query, claim_alerts
+from app.services.alert_index import current_prices, get_alert_index
+from app.services.email_sender import NotificationService
+from app.services.latest_prices import price_row, upsert_latest_prices
+from app.services.notification_outbox import enqueue_alert_notifications, get_outbox_dispatcher
+from app.services.product_cache import get_product_cache
+from app.services.response_cache import invalidate_products
+
+# Every price row carries the full column set, so a batch is a single executemany
+PRICE_DEFAULTS = {
+    **{column.key: None for column in Price.__table__.columns if column.key != 'id'},
+    'currency': 'USD'
+}
 
 class ScraperService:
     def __init__(self, db: Session):
@@ -86,68 +32,142 @@ class ScraperService:
     def process_scraped_data(self, product_data: dict, prices: List[dict]):
         """Process scraped data and save to database"""
         # Find or create product
-        product = self.db.query(Product).filter(
-            Product.name == product_data['name'],
-            Product.category == product_data['category']
-        ).first()
-
-        if not product:
-            product = Product(**product_data)
-            self.db.add(product)
-            self.db.flush()
+        product_id = self._resolve_products([product_data])[0]
 
         # Add prices
-        for price_data in prices:
-            price = Price(product_id=product.id, **price_data)
-            self.db.add(price)
+        added = [Price(product_id=product_id, **price_data) for price_data in prices]
+        self.db.add_all(added)
+        self.db.flush()
+        rows = [price_row(price) for price in added]
+        upsert_latest_prices(self.db, rows)
 
         self.db.commit()
+        invalidate_products([product_id])
 
         # Check alerts
-        self.check_alerts_for_product(product.id)
+        self.check_alerts_for_prices(rows)
 
-        return product
+        return self.db.get(Product, product_id)
 
-    def check_alerts_for_product(self, product_id: int):
-        """Check and trigger alerts for a product"""
-        from datetime import datetime
+    def process_scraped_batch(self, items: List[Dict]) -> List[int]:
+        """Save many products' scraped prices in one transaction.
 
-        alerts = self.db.query(PriceAlert).filter(
-            PriceAlert.product_id == product_id,
-            PriceAlert.is_active == True
-        ).all()
+        Each item is {'product': product_data, 'prices': [price_data, ...]}.
+        Product keys are resolved with one query, new products are inserted
+        together, all prices go in as one executemany INSERT and alerts are
+        evaluated once for the whole batch. Returns product ids in item order.
+        """
+        if not items:
+            return []
 
-        latest_price = self.db.query(Price).filter(
-            Price.product_id == product_id
-        ).order_by(Price.scraped_at.desc()).first()
+        try:
+            product_ids = self._resolve_products([item['product'] for item in items])
+
+            now = datetime.utcnow()
+            rows = [
+                {**PRICE_DEFAULTS, 'product_id': product_id, 'scraped_at': now, **price_data}
+                for product_id, item in zip(product_ids, items)
+                for price_data in item['prices']
+            ]
+            if rows:
+                # render_nulls keeps the uniform rows in one statement instead of
+                # one batch per set of non-NULL columns
+                price_ids = self.db.execute(
+                    insert(Price).returning(Price.id, sort_by_parameter_order=True).execution_options(render_nulls=True),
+                    rows
+                ).scalars().all()
+                upsert_latest_prices(self.db, [{**row, 'id': price_id} for row, price_id in zip(rows, price_ids)])
+            self.db.commit()
+        except Exception:
+            # A cached id may point at a product deleted elsewhere
+            self.db.rollback()
+            get_product_cache().invalidate_keys((item['product']['name'], item['product']['category']) for item in items)
+            raise
+
+        invalidate_products(product_ids)
+        self.check_alerts_for_prices(rows)
+        return product_ids
+
+    def _resolve_products(self, products: List[dict]) -> List[int]:
+        """Find or create products by (name, category).
+
+        Keys come from the process-wide LRU first; misses are looked up with
+        one query, and anything still missing is inserted with ON CONFLICT DO
+        NOTHING against the unique (name, category) index, so concurrent
+        scrapers creating the same product converge on one row.
+        """
+        cache = get_product_cache()
+        found: Dict[Tuple[str, str], int] = {}
+        for data in products:
+            key = (data['name'], data['category'])
+            if key not in found:
+                product_id = cache.get(key)
+                if product_id is not None:
+                    found[key] = product_id
+
+        missing = {(data['name'], data['category']) for data in products} - found.keys()
+        if missing:
+            found.update(self._lookup_products(missing))
+
+        new_rows = {}
+        for data in products:
+            key = (data['name'], data['category'])
+            if key not in found and key not in new_rows:
+                new_rows[key] = data
+        if new_rows:
+            # executemany needs uniform rows: one statement per set of supplied columns
+            by_columns = defaultdict(list)
+            for data in new_rows.values():
+                by_columns[tuple(sorted(data))].append(data)
+            for rows in by_columns.values():
+                self.db.execute(
+                    dialect_insert(self.db, Product).on_conflict_do_nothing(index_elements=['name', 'category']),
+                    rows
+                )
+            found.update(self._lookup_products(new_rows.keys()))
+
+        for key, product_id in found.items():
+            cache.put(key, product_id)
+        return [found[(data['name'], data['category'])] for data in products]
+
+    def _lookup_products(self, keys: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+        """Product ids for (name, category) keys with one query"""
+        keys = set(keys)
+        return {
+            (name, category): product_id
+            for product_id, name, category in self.db.query(Product.id, Product.name, Product.category).filter(
+                Product.name.in_({name for name, _ in keys}),
+                Product.category.in_({category for _, category in keys})
+            )
+            if (name, category) in keys
+        }
+
+    def check_alerts_for_prices(self, rows: Iterable[Dict]):
+        """Fire alerts whose target the newly ingested price rows meet.
+
+        Targets are matched in the in-process alert index, so a batch that
+        meets no target costs no queries. Fired alerts are claimed and their
+        notifications queued in one transaction; the outbox dispatcher
+        delivers them, so ingest never waits on SMTP or webhooks.
+        """
+        prices = current_prices(rows)
+        if not prices:
+            return
 
-        if not latest_price:
+        index = get_alert_index()
+        index.ensure_loaded(self.db)
+        now = datetime.utcnow()
+        candidates = [
+            alert_id for product_id, price in prices.items()
+            for alert_id in index.match(product_id, price, now)
+        ]
+        if not candidates:
             return
 
-        product = self.db.query(Product).filter(Product.id == product_id).first()
-
-        for alert in alerts:
-            triggered = False
-
-            if alert.condition == "below" and latest_price.price <= alert.target_price:
-                triggered = True
-            elif alert.condition == "above" and latest_price.price >= alert.target_price:
-                triggered = True
-
-            if triggered:
-                alert.last_triggered = datetime.utcnow()
-                alert.trigger_count += 1
-                self.db.commit()
-
-                # Send notifications
-                if alert.email:
-                    self.notification.send_alert_notification(alert, latest_price, product)
-
-                if alert.webhook_url:
-                    self.notification.send_webhook(alert.webhook_url, {
-                        "product_id": product_id,
-                        "product_name": product.name,
-                        "current_price": latest_price.price,
-                        "target_price": alert.target_price,
-                        "condition": alert.condition
-                    })
+        fired = claim_alerts(self.db, candidates, now)
+        if fired:
+            enqueue_alert_notifications(self.db, self.db.execute(alert_rows_query(fired)).all(), now)
+        self.db.commit()
+        index.mark_triggered(candidates, now)
+        if fired:
+            get_outbox_dispatcher().wake()
@@ -3,17 +3,184 @@ Telegram Notification Service
 Sends price alerts to Telegram via bot API
 """
 
+import asyncio
 import os
 import aiohttp
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from datetime import datetime
 
+from app.services.rate_limit import TokenBucket
+
 # Get bot token from environment
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")  # Doug's chat ID
 
 TELEGRAM_API_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}"
 
+# Bot API limits: about 30 messages/s overall and 1 message/s per chat
+TELEGRAM_MAX_CONCURRENCY = int(os.getenv("TELEGRAM_MAX_CONCURRENCY", "8"))
+TELEGRAM_MESSAGES_PER_SECOND = float(os.getenv("TELEGRAM_MESSAGES_PER_SECOND", "30"))
+TELEGRAM_CHAT_MESSAGES_PER_SECOND = float(os.getenv("TELEGRAM_CHAT_MESSAGES_PER_SECOND", "1"))
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "3"))
+
+
+class TelegramClient:
+    """One pooled Bot API session for every notification, paced to Telegram's limits.
+
+    Sends run concurrently up to max_concurrency, each waiting on its chat's
+    token bucket and the global one (both paced evenly, no bursts). A 429
+    pauses that chat for the returned retry_after before retrying; 5xx and
+    network errors back off the chat's rate.
+    """
+
+    def __init__(self, api_url: str = TELEGRAM_API_URL, max_concurrency: int = TELEGRAM_MAX_CONCURRENCY,
+                 messages_per_second: float = TELEGRAM_MESSAGES_PER_SECOND,
+                 chat_messages_per_second: float = TELEGRAM_CHAT_MESSAGES_PER_SECOND,
+                 max_retries: int = TELEGRAM_MAX_RETRIES, timeout: float = 30):
+        self.api_url = api_url
+        self.max_concurrency = max_concurrency
+        self.chat_messages_per_second = chat_messages_per_second
+        self.max_retries = max_retries
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.global_bucket = TokenBucket(messages_per_second, 1, max_concurrency)
+        self._chat_buckets: Dict[str, TokenBucket] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    async def start(self):
+        """Open the pooled session on the running loop (FastAPI lifespan)"""
+        self._bind()
+
+    def _bind(self) -> Tuple[aiohttp.ClientSession, asyncio.Semaphore]:
+        """Session and semaphore of the loop the client is bound to.
+
+        A client belongs to one live event loop (the FastAPI lifespan's). After
+        close(), or once that loop is closed, the next caller's loop takes
+        over. Code running its own loop (asyncio.run) while the bound loop is
+        alive must use a separate TelegramClient and close() it.
+        """
+        loop = asyncio.get_running_loop()
+        if self._bound_elsewhere(loop):
+            raise RuntimeError("TelegramClient is bound to another event loop; use a separate client and close() it")
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency, ttl_dns_cache=300),
+                timeout=self.timeout
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._session, self._semaphore
+
+    def _bound_elsewhere(self, loop) -> bool:
+        return (self._loop is not None and self._loop is not loop and not self._loop.is_closed()
+                and self._session is not None and not self._session.closed)
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_messages_per_second, 1, 1)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def send_message(self, text: str, chat_id: Optional[str] = None, parse_mode: str = "Markdown",
+                           disable_web_page_preview: bool = False) -> bool:
+        """Send one message, retrying 429s after retry_after; True once delivered"""
+        chat_id = str(chat_id or TELEGRAM_CHAT_ID)
+        payload = {
+            "chat_id": chat_id,
+            "text": text,
+            "parse_mode": parse_mode,
+            "disable_web_page_preview": disable_web_page_preview
+        }
+        session, semaphore = self._bind()
+        chat_bucket = self._chat_bucket(chat_id)
+
+        for attempt in range(self.max_retries + 1):
+            await chat_bucket.acquire_async()
+            await self.global_bucket.acquire_async()
+            async with semaphore:
+                try:
+                    async with session.post(f"{self.api_url}/sendMessage", json=payload) as response:
+                        if response.status == 200:
+                            chat_bucket.record_success()
+                            self.sent += 1
+                            return True
+                        try:
+                            body = await response.json(content_type=None)
+                        except ValueError:
+                            body = {}
+                        status = response.status
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    body, status = {"description": str(e)}, None
+
+            if status == 429:
+                chat_bucket.pause(float((body.get("parameters") or {}).get("retry_after", 1)))
+            elif status is None or status >= 500:
+                chat_bucket.backoff()
+            else:
+                break
+            if attempt < self.max_retries:
+                self.retried += 1
+
+        print(f"❌ Telegram API error: {body.get('description', status)}")
+        self.failed += 1
+        return False
+
+    async def close(self):
+        """Close the session and its pooled connections, from the loop they belong to"""
+        if self._bound_elsewhere(asyncio.get_running_loop()):
+            raise RuntimeError("TelegramClient.close() must run on the loop the client is bound to")
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._semaphore = None
+        self._loop = None
+
+    def stats(self) -> Dict:
+        return {'sent': self.sent, 'failed': self.failed, 'retried': self.retried, 'chats': len(self._chat_buckets)}
+
+
+_telegram_client = TelegramClient()
+
+def get_telegram_client() -> TelegramClient:
+    """Process-wide Telegram client"""
+    return _telegram_client
+
+
+def telegram_configured() -> bool:
+    return bool(TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID)
+
+
+def price_alert_message(
+    product_name: str,
+    current_price: float,
+    previous_price: Optional[float],
+    retailer_name: str,
+    product_url: str,
+    target_price: Optional[float] = None
+) -> str:
+    """Markdown text of a price drop alert"""
+    # Calculate price drop
+    price_drop = ""
+    if previous_price and previous_price > current_price:
+        drop_pct = ((previous_price - current_price) / previous_price) * 100
+        price_drop = f"📉 Down {drop_pct:.1f}% from ${previous_price:.2f}\n"
+    
+    # Build message
+    message = f"🚨 *Price Drop Alert*\n\n"
+    message += f"*{product_name}*\n"
+    message += f"💰 Current: *${current_price:.2f}*\n"
+    message += price_drop
+    if target_price:
+        message += f"🎯 Target was: ${target_price:.2f}\n"
+    message += f"🏪 {retailer_name}\n\n"
+    message += f"[View Deal]({product_url})"
+    return message
+
 
 async def send_price_alert(
     product_name: str,
@@ -39,50 +206,15 @@ async def send_price_alert(
     Returns:
         bool: True if message was sent successfully
     """
-    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
+    if not telegram_configured():
         print("⚠️ Telegram not configured. Set TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID env vars.")
         return False
     
-    # Calculate price drop
-    price_drop = ""
-    if previous_price and previous_price > current_price:
-        drop_pct = ((previous_price - current_price) / previous_price) * 100
-        price_drop = f"📉 Down {drop_pct:.1f}% from ${previous_price:.2f}\n"
-    
-    # Build message
-    message = f"🚨 *Price Drop Alert*\n\n"
-    message += f"*{product_name}*\n"
-    message += f"💰 Current: *${current_price:.2f}*\n"
-    message += price_drop
-    if target_price:
-        message += f"🎯 Target was: ${target_price:.2f}\n"
-    message += f"🏪 {retailer_name}\n\n"
-    message += f"[View Deal]({product_url})"
-    
-    payload = {
-        "chat_id": TELEGRAM_CHAT_ID,
-        "text": message,
-        "parse_mode": "Markdown",
-        "disable_web_page_preview": False
-    }
-    
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{TELEGRAM_API_URL}/sendMessage",
-                json=payload,
-                timeout=aiohttp.ClientTimeout(total=30)
-            ) as response:
-                if response.status == 200:
-                    print(f"✅ Telegram alert sent for {product_name}")
-                    return True
-                else:
-                    error = await response.text()
-                    print(f"❌ Telegram API error: {error}")
-                    return False
-    except Exception as e:
-        print(f"❌ Failed to send Telegram alert: {e}")
-        return False
+    message = price_alert_message(product_name, current_price, previous_price, retailer_name, product_url, target_price)
+    sent = await get_telegram_client().send_message(message, disable_web_page_preview=False)
+    if sent:
+        print(f"✅ Telegram alert sent for {product_name}")
+    return sent
 
 
 async def send_restocker_alert(
@@ -105,24 +237,7 @@ async def send_restocker_alert(
     message += f"🏪 {retailer_name}\n\n"
     message += f"[Buy Now]({product_url})"
     
-    payload = {
-        "chat_id": TELEGRAM_CHAT_ID,
-        "text": message,
-        "parse_mode": "Markdown",
-        "disable_web_page_preview": False
-    }
-    
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{TELEGRAM_API_URL}/sendMessage",
-                json=payload,
-                timeout=aiohttp.ClientTimeout(total=30)
-            ) as response:
-                return response.status == 200
-    except Exception as e:
-        print(f"❌ Failed to send restock alert: {e}")
-        return False
+    return await get_telegram_client().send_message(message, disable_web_page_preview=False)
 
 
 async def send_daily_summary(products_tracked: int, alerts_sent: int, avg_price_changes: float) -> bool:
@@ -138,21 +253,4 @@ async def send_daily_summary(products_tracked: int, alerts_sent: int, avg_price_
     message += f"Avg price change: {avg_price_changes:.1f}%\n"
     message += f"\n_Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M')}_"
     
-    payload = {
-        "chat_id": TELEGRAM_CHAT_ID,
-        "text": message,
-        "parse_mode": "Markdown",
-        "disable_web_page_preview": True
-    }
-    
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{TELEGRAM_API_URL}/sendMessage",
-                json=payload,
-                timeout=aiohttp.ClientTimeout(total=30)
-            ) as response:
-                return response.status == 200
-    except Exception as e:
-        print(f"❌ Failed to send summary: {e}")
-        return False
+    return await get_telegram_client().send_message(message, disable_web_page_preview=True)
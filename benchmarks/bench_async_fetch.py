@@ -0,0 +1,69 @@
+"""
+Benchmark: sequential vs async scrape sweep
+
+Runs eBayScraper against a local stub server and reports products per
+minute for the old sequential loop, for scrape_products_async parsing on
+the event loop, and for the same pipeline parsing on a process pool.
+
+    python -m benchmarks.bench_async_fetch --products 40 --latency 0.2 --items 200
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+from benchmarks.stub_server import StubServer
+from scrapers.rate_limiter import get_rate_limiter
+from scrapers.runner import scrape_products_async
+from scrapers.tier1_2_scrapers import eBayScraper
+
+def run_sequential(scraper, products) -> float:
+    start = time.perf_counter()
+    for product in products:
+        scraper.search(product.name, category=product.category)
+    return time.perf_counter() - start
+
+def run_async(scraper, products, executor=None) -> float:
+    start = time.perf_counter()
+    asyncio.run(scrape_products_async(scraper, products, executor))
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--products', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.2, help='stub server latency (s)')
+    parser.add_argument('--rps', type=float, default=1000.0, help='retailer requests per second')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--items', type=int, default=20, help='listings per stub page')
+    parser.add_argument('--parse-workers', type=int, default=4)
+    args = parser.parse_args()
+
+    products = [SimpleNamespace(name=f"MacBook Pro {i}", category='mac') for i in range(args.products)]
+
+    get_rate_limiter(1, {
+        'requests_per_second': args.rps,
+        'burst': args.concurrency,
+        'max_concurrency': args.concurrency
+    })
+
+    with StubServer(latency=args.latency, items=args.items) as server, \
+            ProcessPoolExecutor(args.parse_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        scraper = eBayScraper(1, server.base_url)
+        scraper.http_cache = None
+
+        sequential = run_sequential(scraper, products)
+        concurrent = run_async(scraper, products)
+        pool.submit(int).result()  # start workers outside the timing
+        pooled = run_async(scraper, products, pool)
+
+    print(f"Products: {args.products}, latency: {args.latency}s, rate: {args.rps} req/s")
+    print(f"{'Sequential':<16}{sequential:7.2f}s  {args.products / sequential * 60:9.0f} products/min")
+    print(f"{'Async x' + str(args.concurrency):<16}{concurrent:7.2f}s  {args.products / concurrent * 60:9.0f} products/min")
+    print(f"{'+ parse pool x' + str(args.parse_workers):<16}{pooled:7.2f}s  {args.products / pooled * 60:9.0f} products/min")
+    print(f"{'Speedup':<16}{sequential / min(concurrent, pooled):7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark: alert email delivery
+
+Sends the same alert emails to a local aiosmtpd sink two ways: the old path
+(connect, EHLO, login and QUIT around every message, one after another)
+and the pooled SMTPPool (persistent authenticated connections, queued
+messages sent in batches). The sink delays every command by --latency to
+stand in for the network; EHLO costs four round trips, covering the
+STARTTLS, second EHLO and AUTH exchanges of a real provider.
+
+    pip install aiosmtpd
+    python -m benchmarks.bench_email --messages 200 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import smtplib
+import socket
+import time
+from email.message import EmailMessage
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+from app.services.email_sender import SMTPPool
+
+class SlowSink:
+    """Accepts everything after `latency` seconds per command"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.accepted = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.latency * 4)
+        session.host_name = hostname
+        return responses
+
+    async def handle_MAIL(self, server, session, envelope, address, mail_options):
+        await asyncio.sleep(self.latency)
+        envelope.mail_from = address
+        return "250 OK"
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        await asyncio.sleep(self.latency)
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.latency)
+        self.accepted += 1
+        return "250 Message accepted for delivery"
+
+    @staticmethod
+    def authenticate(server, session, envelope, mechanism, auth_data):
+        return AuthResult(success=True)
+
+def make_messages(count: int):
+    messages = []
+    for i in range(count):
+        message = EmailMessage()
+        message['From'] = "alerts@priceaggregator.com"
+        message['To'] = f"user{i}@example.com"
+        message['Subject'] = f"🚨 Price Alert: Product {i}"
+        message.set_content(f"<p>Product {i} is now ${999 + i:.2f}</p>", subtype='html')
+        messages.append(message)
+    return messages
+
+def send_unpooled(host: str, port: int, messages) -> int:
+    delivered = 0
+    for message in messages:
+        server = smtplib.SMTP(host, port)
+        server.login("bench", "secret")
+        server.send_message(message)
+        server.quit()
+        delivered += 1
+    return delivered
+
+def send_pooled(pool: SMTPPool, messages) -> int:
+    try:
+        return sum(pool.send_many(messages))
+    finally:
+        pool.close()
+
+def run(send, sink: SlowSink):
+    sink.accepted = 0
+    start = time.perf_counter()
+    delivered = send()
+    return time.perf_counter() - start, delivered
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.02, help='sink delay per SMTP command (s)')
+    parser.add_argument('--connections', type=int, default=4)
+    args = parser.parse_args()
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    sink = SlowSink(args.latency)
+    controller = Controller(sink, hostname="127.0.0.1", port=port,
+                            authenticator=SlowSink.authenticate, auth_require_tls=False)
+    controller.start()
+    messages = make_messages(args.messages)
+    try:
+        rows = [
+            ("Per-message", run(lambda: send_unpooled("127.0.0.1", port, messages), sink)),
+            (f"Pooled x{args.connections}", run(lambda: send_pooled(SMTPPool(
+                "127.0.0.1", port, "bench", "secret", starttls=False, size=args.connections
+            ), messages), sink)),
+        ]
+    finally:
+        controller.stop()
+
+    print(f"Messages: {args.messages}, {args.latency * 1000:.0f} ms per SMTP command")
+    for name, (elapsed, delivered) in rows:
+        print(f"{name:<14}{elapsed:7.2f}s  {delivered / elapsed:7.1f} msg/s  {delivered:>5} delivered")
+    (old, old_delivered), (new, new_delivered) = rows[0][1], rows[1][1]
+    print(f"{'Speedup':<14}{(new_delivered / new) / (old_delivered / old):7.1f}x delivered msg/s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark: price ingestion rows per second
+
+Writes the same scraped prices through the per-product path
+(process_scraped_data: lookup, one add per price, commit, alert check) and
+the batch path (process_scraped_batch), each into a fresh database.
+Defaults to a temporary SQLite file; pass --database-url for Postgres.
+
+    python -m benchmarks.bench_ingest --products 2000 --prices 3 --batch-size 500
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import Product, Retailer, PriceAlert
+from app.services.scraper_service import ScraperService
+
+def make_items(products: int, prices: int):
+    rng = random.Random(42)
+    return [
+        {
+            'product': {'name': f"Product {i}", 'category': 'mac'},
+            'prices': [
+                {'retailer_id': 1, 'price': round(rng.uniform(500, 2500), 2), 'condition': 'used',
+                 'listing_url': f"https://example.com/itm/{i}-{j}", 'listing_title': f"Product {i} listing {j}"}
+                for j in range(prices)
+            ]
+        }
+        for i in range(products)
+    ]
+
+def setup(url: str, products: int):
+    """Fresh schema with the catalog and a sprinkling of (untriggered) alerts"""
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    db.add(Retailer(id=1, name="Bench", base_url="https://example.com"))
+    db.add_all([Product(id=i + 1, name=f"Product {i}", category='mac') for i in range(products)])
+    db.add_all([PriceAlert(product_id=i + 1, target_price=1, condition='below') for i in range(0, products, 20)])
+    db.commit()
+    return engine, db
+
+def run(url: str, items, batch_size: int) -> float:
+    engine, db = setup(url, len(items))
+    service = ScraperService(db)
+    start = time.perf_counter()
+    if batch_size:
+        for i in range(0, len(items), batch_size):
+            service.process_scraped_batch(items[i:i + batch_size])
+    else:
+        for item in items:
+            service.process_scraped_data(item['product'], item['prices'])
+    elapsed = time.perf_counter() - start
+    db.close()
+    engine.dispose()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--prices', type=int, default=3, help='prices per product')
+    parser.add_argument('--batch-size', type=int, default=500, help='products per batch')
+    parser.add_argument('--database-url', default=None, help='defaults to a temporary SQLite file')
+    args = parser.parse_args()
+
+    items = make_items(args.products, args.prices)
+    rows = args.products * args.prices
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.sqlite3')}"
+        per_product = run(url, items, 0)
+        batched = run(url, items, args.batch_size)
+
+    print(f"Rows: {rows} ({args.products} products x {args.prices} prices)")
+    print(f"{'Per product':<16}{per_product:7.2f}s  {rows / per_product:9.0f} rows/s")
+    print(f"{'Batch x' + str(args.batch_size):<16}{batched:7.2f}s  {rows / batched:9.0f} rows/s")
+    print(f"{'Speedup':<16}{per_product / batched:7.1f}x")
+
+if __name__ == '__main__':
+    main()
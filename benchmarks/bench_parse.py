@@ -0,0 +1,105 @@
+"""
+Benchmark: eBay search page parsing
+
+Parses the saved eBay fixture, inflated to a realistic page size, with the
+old path (full html.parser BeautifulSoup tree + CSS selectors) and the new
+one (lxml tree, result nodes picked by search_items_xpath, compiled XPath
+extraction). Reports CPU time per parse and peak RSS growth, each measured
+in a fresh process so lxml's C allocations are counted too.
+
+    python -m benchmarks.bench_parse --items 200 --noise 300
+"""
+
+import argparse
+import multiprocessing
+import os
+import re
+import resource
+import time
+
+from bs4 import BeautifulSoup
+
+from scrapers.tier1_2_scrapers import eBayScraper
+
+FIXTURE = os.path.join(os.path.dirname(__file__), '..', 'tests', 'fixtures', 'ebay_search.html')
+
+def inflate(markup: str, items: int, noise: int) -> bytes:
+    """Repeat the listing cards and pad the page with non-listing markup"""
+    cards = re.findall(r'<li class="s-item .*?</li>\s*(?=<li class="s-item|</ul>)', markup, re.S)
+    listings = ''.join(cards[i % len(cards)] for i in range(items))
+    filler = ''.join(
+        f'<div class="x-refine__group"><a href="?f={i}">Filter {i}</a><span>({i * 7})</span>'
+        f'<script>window.t{i}={{"k":{i},"v":"{"x" * 40}"}};</script></div>'
+        for i in range(noise)
+    )
+    markup = re.sub(r'(<ul class="srp-results[^>]*>).*?(</ul>)', lambda m: m.group(1) + listings + m.group(2),
+                    markup, count=1, flags=re.S)
+    return markup.replace('<aside class="srp-rail__left">', '<aside class="srp-rail__left">' + filler).encode()
+
+def legacy_parse(scraper, markup: bytes):
+    """The pre-lxml fetch + eBay extraction path"""
+    soup = BeautifulSoup(markup, 'html.parser')
+    results = []
+    for item in soup.select('.s-item') or soup.select('[data-view="mi:1686|iid:1"]'):
+        title_elem = item.select_one('.s-item__title, .s-item__title--has-tags')
+        if not title_elem or 'Shop on eBay' in title_elem.get_text():
+            continue
+        price_elem = item.select_one('.s-item__price')
+        link_elem = item.select_one('.s-item__link')
+        subtitle = item.select_one('.s-item__subtitle')
+        shipping = item.select_one('.s-item__shipping')
+        seller = item.select_one('.s-item__seller-info-text')
+        results.append({
+            'name': title_elem.get_text(strip=True),
+            'price': scraper.parse_price(price_elem.get_text(strip=True) if price_elem else '$0.00'),
+            'url': link_elem['href'] if link_elem else None,
+            'condition': subtitle.get_text(strip=True).lower() if subtitle else '',
+            'shipping': scraper.parse_price(shipping.get_text()) if shipping else 0,
+            'seller': seller.get_text(strip=True) if seller else 'Unknown'
+        })
+    return results
+
+def lxml_parse(scraper, markup: bytes):
+    return scraper.parse_search_results(scraper.select_search_items(markup))
+
+PARSERS = {'html.parser + select': legacy_parse, 'lxml + xpath': lxml_parse}
+
+def _peak_rss(name: str, markup: bytes, queue):
+    scraper = eBayScraper(1)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results = PARSERS[name](scraper, markup)
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put(((after - before) / 1024, len(results)))
+
+def measure(name: str, markup: bytes, rounds: int):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_peak_rss, args=(name, markup, queue))
+    process.start()
+    peak_mib, count = queue.get()
+    process.join()
+
+    scraper = eBayScraper(1)
+    start = time.process_time()
+    for _ in range(rounds):
+        PARSERS[name](scraper, markup)
+    elapsed = (time.process_time() - start) / rounds
+    print(f"{name:<22}{elapsed * 1000:8.1f} ms  {peak_mib:7.1f} MiB peak RSS growth  {count} results")
+    return elapsed, max(peak_mib, 0.1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--items', type=int, default=200, help='listing cards on the page')
+    parser.add_argument('--noise', type=int, default=300, help='non-listing blocks on the page')
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    with open(FIXTURE, encoding='utf-8') as f:
+        markup = inflate(f.read(), args.items, args.noise)
+
+    print(f"Page size: {len(markup) / 1024:.0f} KiB, {args.items} listings")
+    old_time, old_peak = measure('html.parser + select', markup, args.rounds)
+    new_time, new_peak = measure('lxml + xpath', markup, args.rounds)
+    print(f"CPU speedup: {old_time / new_time:.1f}x, peak memory reduction: {old_peak / new_peak:.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: product search latency
+
+Fills a fresh database with a synthetic catalog, then times ranked
+full-text search (app.services.product_search) against the old
+ILIKE '%term%' scan for the same queries, first page of 20 each.
+Defaults to a temporary SQLite file (FTS5); pass --database-url for
+Postgres (tsvector + GIN, pg_trgm).
+
+    python -m benchmarks.bench_search --products 200000 --repeat 20
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert, or_
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import Product
+from app.services.product_search import apply_search
+
+SYLLABLES = ["ka", "ro", "mi", "to", "sha", "ne", "lu", "vi", "da", "po", "ze", "qui"]
+BRANDS = ["Apple", "Pokemon", "Roland", "Fender", "Korg", "Sony"]
+
+def vocabulary(rng: random.Random, size: int = 5000):
+    """Made-up words; drawn with Zipf weights so a few are common and most are rare"""
+    words = sorted({"".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(size * 2)})[:size]
+    rng.shuffle(words)
+    return words, [1 / (rank + 1) for rank in range(len(words))]
+
+def queries(words):
+    """Common, mid and rare single words, a prefix, and a two-word query"""
+    return [words[5], words[100], words[2000], words[300][:4], f"{words[20]} {words[200]}"]
+
+def setup(url: str, products: int, batch: int = 10000):
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    rng = random.Random(42)
+    words, weights = vocabulary(rng)
+    with engine.begin() as conn:
+        for start in range(0, products, batch):
+            conn.execute(insert(Product), [
+                {
+                    'name': " ".join(rng.choices(words, weights, k=3)).title() + f" {i}",
+                    'category': 'other',
+                    'brand': rng.choice(BRANDS),
+                    'model': f"M{rng.randint(1, 999)}",
+                    'description': " ".join(rng.choices(words, weights, k=12))
+                }
+                for i in range(start, min(start + batch, products))
+            ])
+        if engine.dialect.name == 'postgresql':
+            conn.exec_driver_sql("ANALYZE products")
+    return engine, queries(words)
+
+def ranked(db, text: str):
+    query, relevance = apply_search(db, db.query(Product.id), text)
+    return query.order_by(relevance, Product.id).limit(20).all()
+
+def ilike(db, text: str):
+    return db.query(Product.id).filter(or_(
+        Product.name.ilike(f"%{text}%"),
+        Product.description.ilike(f"%{text}%")
+    )).order_by(Product.id).limit(20).all()
+
+def timed(db, search, text: str, repeat: int) -> float:
+    """Median milliseconds for one query"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        search(db, text)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--products', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=20, help='runs of each query')
+    parser.add_argument('--database-url', default=None, help='defaults to a temporary SQLite file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.sqlite3')}"
+        engine, texts = setup(url, args.products)
+        db = sessionmaker(bind=engine)()
+        print(f"Products: {args.products} ({engine.dialect.name}), median ms of {args.repeat} runs")
+        print(f"{'Query':<24}{'Matches':>9}{'ILIKE':>10}{'Full-text':>11}")
+        for text in texts:
+            query, _ = apply_search(db, db.query(Product.id), text)
+            matches = query.count()
+            scan = timed(db, ilike, text, args.repeat)
+            fts = timed(db, ranked, text, args.repeat)
+            print(f"{text:<24}{matches:>9}{scan:>10.2f}{fts:>11.2f}")
+        db.close()
+        engine.dispose()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark: Telegram alert delivery
+
+Sends the same messages to a local mock Bot API two ways: the old path
+(a new ClientSession per message, awaited one after another, no retries)
+and the pooled TelegramClient (one session, concurrent sends paced by
+per-chat and global token buckets, 429s retried after retry_after).
+
+    python -m benchmarks.bench_telegram --messages 200 --chats 50 --latency 0.1
+"""
+
+import argparse
+import asyncio
+import time
+
+import aiohttp
+
+from app.services.telegram_service import TelegramClient
+from benchmarks.mock_telegram import MockBotApi
+
+def make_messages(messages: int, chats: int):
+    return [(str(1000 + i % chats), f"🚨 *Price Drop Alert*\n\n*Product {i}*\n💰 Current: *${999 + i:.2f}*")
+            for i in range(messages)]
+
+async def send_unpooled(api_url: str, messages) -> int:
+    delivered = 0
+    for chat_id, text in messages:
+        async with aiohttp.ClientSession() as session:
+            async with session.post(f"{api_url}/sendMessage", json={"chat_id": chat_id, "text": text}) as response:
+                delivered += response.status == 200
+    return delivered
+
+async def send_pooled(client: TelegramClient, messages) -> int:
+    try:
+        results = await asyncio.gather(*(client.send_message(text, chat_id=chat_id) for chat_id, text in messages))
+    finally:
+        await client.close()
+    return sum(results)
+
+def run(send, mock: MockBotApi):
+    mock.accepted = mock.rejected = 0
+    start = time.perf_counter()
+    delivered = asyncio.run(send)
+    return time.perf_counter() - start, delivered, mock.rejected
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--chats', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.1, help='mock Bot API latency (s)')
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages, args.chats)
+    with MockBotApi(latency=args.latency) as mock:
+        rows = [
+            ("Per-message", run(send_unpooled(mock.api_url, messages), mock)),
+            ("Pooled x" + str(args.concurrency), run(send_pooled(
+                TelegramClient(api_url=mock.api_url, max_concurrency=args.concurrency), messages
+            ), mock)),
+        ]
+
+    print(f"Messages: {args.messages} to {args.chats} chats, {args.latency * 1000:.0f} ms API latency")
+    for name, (elapsed, delivered, rejected) in rows:
+        print(f"{name:<14}{elapsed:7.2f}s  {delivered / elapsed:7.1f} msg/s  {delivered:>4} delivered  {rejected:>3} x 429")
+    (old, old_delivered, _), (new, new_delivered, _) = rows[0][1], rows[1][1]
+    print(f"{'Speedup':<14}{(new_delivered / new) / (old_delivered / old):7.1f}x delivered msg/s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Local mock Telegram Bot API for benchmarks and tests
+Answers sendMessage with a fixed latency and enforces per-chat and global
+message limits with 429 + retry_after, like the real API's flood control
+"""
+
+import asyncio
+import threading
+import time
+from typing import Dict, Tuple
+from aiohttp import web
+
+class MockBotApi:
+    """Run a mock Bot API server on a background thread"""
+
+    def __init__(self, latency: float = 0.05, chat_rate: float = 1.0, chat_burst: int = 3,
+                 global_rate: float = 30.0, retry_after: float = 1.0):
+        self.latency = latency
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.global_rate = global_rate
+        self.retry_after = retry_after
+        self.reject_next = 0  # force this many 429s, whatever the rate
+        self.accepted = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.messages: Dict[str, int] = {}
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # chat (or '*') -> (tokens, updated)
+        self.port = None
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def _take(self, key: str, rate: float, burst: float) -> bool:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        allowed = tokens >= 1
+        self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+        return allowed
+
+    async def _send_message(self, request):
+        payload = await request.json()
+        chat_id = str(payload.get('chat_id'))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            if self.reject_next > 0 or not self._take(chat_id, self.chat_rate, self.chat_burst) \
+                    or not self._take('*', self.global_rate, self.global_rate):
+                self.reject_next = max(0, self.reject_next - 1)
+                self.rejected += 1
+                return web.json_response({
+                    'ok': False, 'error_code': 429,
+                    'description': f"Too Many Requests: retry after {self.retry_after}",
+                    'parameters': {'retry_after': self.retry_after}
+                }, status=429)
+            self.accepted += 1
+            self.messages[chat_id] = self.messages.get(chat_id, 0) + 1
+            return web.json_response({'ok': True, 'result': {'message_id': self.accepted, 'chat': {'id': chat_id}}})
+        finally:
+            self.in_flight -= 1
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_post('/{bot}/sendMessage', self._send_message)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._start())
+        self._ready.set()
+        self._loop.run_forever()
+
+    @property
+    def api_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/botTEST"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
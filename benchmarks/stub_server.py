@@ -0,0 +1,75 @@
+"""
+Local stub retailer server for benchmarks
+Serves eBay-style search pages with a fixed artificial latency
+"""
+
+import asyncio
+import threading
+from aiohttp import web
+
+def ebay_search_page(query: str, items: int = 20) -> str:
+    """Render an eBay-like search results page"""
+    cards = []
+    for i in range(items):
+        cards.append(f"""
+        <li class="s-item">
+          <div class="s-item__info">
+            <a class="s-item__link" href="https://www.ebay.com/itm/{1000 + i}">
+              <h3 class="s-item__title">{query} listing {i}</h3>
+            </a>
+            <div class="s-item__subtitle">Pre-Owned</div>
+            <span class="s-item__price">${999 + i}.00</span>
+            <span class="s-item__shipping">+$15.00 shipping</span>
+            <span class="s-item__seller-info-text">seller{i} (1,234) 99.5%</span>
+          </div>
+        </li>""")
+    return f"<html><body><ul class=\"srp-results\">{''.join(cards)}</ul></body></html>"
+
+class StubServer:
+    """Run an aiohttp stub server on a background thread"""
+
+    def __init__(self, latency: float = 0.05, items: int = 20):
+        self.latency = latency
+        self.items = items
+        self.port = None
+        self.requests = 0
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    async def _search(self, request):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        page = ebay_search_page(request.query.get('_nkw', 'item'), self.items)
+        return web.Response(text=page, content_type='text/html')
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_get('/sch/i.html', self._search)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._start())
+        self._ready.set()
+        self._loop.run_forever()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
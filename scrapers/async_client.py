@@ -0,0 +1,63 @@
+"""
+Async HTTP Client
+Pooled aiohttp session shared by scrapers, capped per host
+"""
+
+from typing import Dict, Mapping, NamedTuple, Optional
+import aiohttp
+from multidict import CIMultiDict
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+class HttpResponse(NamedTuple):
+    """Raw response returned by the async client"""
+    status: int
+    headers: Mapping[str, str]  # case-insensitive
+    body: bytes
+
+class AsyncHttpClient:
+    """One keep-alive connection pool for every request in a scrape run"""
+
+    def __init__(self, limit_per_host: int = 4, limit: int = 100, timeout: float = 30,
+                 headers: Optional[Dict[str, str]] = None):
+        self.limit_per_host = limit_per_host
+        self.limit = limit
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.headers = headers or DEFAULT_HEADERS
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Create the session lazily so it binds to the running event loop"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=self.timeout
+            )
+        return self._session
+
+    async def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> HttpResponse:
+        """GET a URL and read the full body"""
+        session = self._get_session()
+        async with session.get(url, headers=headers) as response:
+            body = await response.read()
+            return HttpResponse(response.status, CIMultiDict(response.headers), body)
+
+    async def close(self):
+        """Close the session and its pooled connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
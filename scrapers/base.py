@@ -3,15 +3,56 @@ Base Scraper Class
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
+from typing import List, Dict, NamedTuple, Optional
 import requests
 from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
+import asyncio
 import time
 import random
 
+from scrapers.async_client import AsyncHttpClient
+from scrapers.http_cache import get_http_cache
+from scrapers.rate_limiter import THROTTLE_STATUSES, get_rate_limiter, parse_retry_after
+
+# lxml is several times faster than html.parser
+HTML_PARSER = 'lxml'
+
+def has_class(name: str) -> str:
+    """XPath predicate equivalent to the CSS selector `.name`"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+def descendant_xpath(*classes: str, tags: tuple = ()) -> etree.XPath:
+    """Compiled XPath for the CSS selector list `.a, .b, tag` below a node"""
+    tests = [has_class(name) for name in classes] + [f'self::{tag}' for tag in tags]
+    return etree.XPath(f".//*[{' or '.join(tests)}]")
+
+def first_node(node, xpath: etree.XPath):
+    """First match of a compiled XPath below node, like select_one"""
+    found = xpath(node)
+    return found[0] if found else None
+
+def node_text(node) -> str:
+    """Stripped text of an lxml node, like get_text(strip=True)"""
+    if node is None:
+        return ''
+    return ''.join(text.strip() for text in node.itertext())
+
+class FetchedPage(NamedTuple):
+    """Raw page body; on a 304 it comes from the HTTP cache with any parsed results"""
+    url: str
+    body: bytes
+    not_modified: bool = False
+    results_key: Optional[str] = None
+    results: Optional[List[Dict]] = None
+
 class BaseScraper(ABC):
     """Abstract base class for all scrapers"""
 
+    # XPath to the result nodes of a search page; parse_search_results only sees these
+    search_items_xpath: Optional[str] = None
+
     def __init__(self, retailer_id: int, base_url: str):
         self.retailer_id = retailer_id
         self.base_url = base_url
@@ -19,6 +60,11 @@ class BaseScraper(ABC):
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
+        # Shared pool set by the runner; created on demand otherwise
+        self.async_client: Optional[AsyncHttpClient] = None
+        # Shared with every other scraper hitting this retailer
+        self.rate_limiter = get_rate_limiter(retailer_id)
+        self.http_cache = get_http_cache()
 
     @abstractmethod
     def search(self, query: str, **kwargs) -> List[Dict]:
@@ -35,22 +81,159 @@ class BaseScraper(ABC):
         """Extract numeric price from text"""
         pass
 
-    def fetch(self, url: str, retries: int = 3) -> Optional[BeautifulSoup]:
-        """Fetch and parse URL with retry logic"""
+    def fetch_page(self, url: str, retries: int = 3) -> Optional[FetchedPage]:
+        """Fetch raw page bytes, revalidating cached copies with a conditional GET"""
+        cached = self.http_cache.lookup(url) if self.http_cache else None
+        headers = self.http_cache.conditional_headers(cached) if cached else {}
+
         for attempt in range(retries):
             try:
-                response = self.session.get(url, timeout=30)
+                with self.rate_limiter.slot():
+                    self.rate_limiter.acquire()
+                    response = self.session.get(url, headers=headers, timeout=30)
+
+                if response.status_code in THROTTLE_STATUSES:
+                    # The limiter's pause replaces the usual retry sleep
+                    self.rate_limiter.backoff(parse_retry_after(response.headers.get('Retry-After')))
+                    print(f"Attempt {attempt + 1} throttled: {response.status_code} for url: {url}")
+                    continue
+
+                if response.status_code == 304 and cached:
+                    self.rate_limiter.record_success()
+                    return self._not_modified(cached, response.headers)
+
                 response.raise_for_status()
-                return BeautifulSoup(response.content, 'html.parser')
+                self.rate_limiter.record_success()
+                return self._downloaded(url, response.headers, response.content)
             except Exception as e:
                 print(f"Attempt {attempt + 1} failed: {e}")
                 if attempt < retries - 1:
                     time.sleep(random.uniform(1, 3))
         return None
 
-    def rate_limit(self, min_delay: float = 1.0, max_delay: float = 3.0):
-        """Rate limiting to be nice to servers"""
-        time.sleep(random.uniform(min_delay, max_delay))
+    async def afetch_page(self, url: str, retries: int = 3) -> Optional[FetchedPage]:
+        """Async fetch_page through the pooled client"""
+        if self.async_client is None:
+            self.async_client = AsyncHttpClient(limit_per_host=self.rate_limiter.max_concurrency)
+
+        cached = self.http_cache.lookup(url) if self.http_cache else None
+        headers = self.http_cache.conditional_headers(cached) if cached else {}
+
+        for attempt in range(retries):
+            try:
+                async with self.rate_limiter.aslot():
+                    await self.rate_limiter.acquire_async()
+                    response = await self.async_client.get(url, headers=headers)
+
+                if response.status in THROTTLE_STATUSES:
+                    self.rate_limiter.backoff(parse_retry_after(response.headers.get('Retry-After')))
+                    print(f"Attempt {attempt + 1} throttled: {response.status} for url: {url}")
+                    continue
+
+                if response.status == 304 and cached:
+                    self.rate_limiter.record_success()
+                    return self._not_modified(cached, response.headers)
+
+                if response.status >= 400:
+                    raise requests.HTTPError(f"{response.status} Error for url: {url}")
+                self.rate_limiter.record_success()
+                return self._downloaded(url, response.headers, response.body)
+            except Exception as e:
+                print(f"Attempt {attempt + 1} failed: {e}")
+                if attempt < retries - 1:
+                    await asyncio.sleep(random.uniform(1, 3))
+        return None
+
+    def _not_modified(self, cached, headers) -> FetchedPage:
+        """Serve a 304 from the cache"""
+        self.http_cache.revalidated(cached.url, headers)
+        self.http_cache.record_hit(self.retailer_id, len(cached.body))
+        return FetchedPage(cached.url, cached.body, True, cached.results_key, cached.results)
+
+    def _downloaded(self, url: str, headers, body: bytes) -> FetchedPage:
+        """Record a full download in the cache"""
+        if self.http_cache:
+            self.http_cache.store(url, self.retailer_id, headers, body)
+            self.http_cache.record_miss(self.retailer_id, len(body))
+        return FetchedPage(url, body)
+
+    def fetch(self, url: str, retries: int = 3) -> Optional[BeautifulSoup]:
+        """Fetch and parse URL with retry logic"""
+        page = self.fetch_page(url, retries)
+        return self.make_soup(page.body) if page else None
+
+    async def afetch(self, url: str, retries: int = 3) -> Optional[BeautifulSoup]:
+        """Async fetch and parse URL through the pooled client"""
+        page = await self.afetch_page(url, retries)
+        return self.make_soup(page.body) if page else None
+
+    def make_soup(self, markup: bytes) -> BeautifulSoup:
+        """Parse a full page for BeautifulSoup-based extraction"""
+        return BeautifulSoup(markup, HTML_PARSER)
+
+    def select_search_items(self, markup: bytes) -> List:
+        """Build an lxml tree and return only the search result nodes"""
+        if not markup.strip():
+            return []
+        return lxml.html.document_fromstring(markup).xpath(self.search_items_xpath)
+
+    def cached_results(self, page: FetchedPage, **kwargs) -> Optional[List[Dict]]:
+        """Results parsed earlier from this exact page, if it came back 304"""
+        if page.not_modified and page.results is not None and page.results_key == repr(sorted(kwargs.items())):
+            self.http_cache.record_parse_skipped(self.retailer_id)
+            return page.results
+        return None
+
+    def remember_results(self, page: FetchedPage, results: List[Dict], **kwargs):
+        """Store parsed results alongside the cached page"""
+        if self.http_cache:
+            self.http_cache.store_results(page.url, repr(sorted(kwargs.items())), results)
+
+    def results_from_page(self, page: Optional[FetchedPage], **kwargs) -> List[Dict]:
+        """Parse a search page, reusing cached results when it was not modified"""
+        if not page:
+            return []
+
+        results = self.cached_results(page, **kwargs)
+        if results is None:
+            results = self.parse_search_results(self.select_search_items(page.body), **kwargs)
+            self.remember_results(page, results, **kwargs)
+        return results
+
+    def search_page(self, search_url: str, **kwargs) -> List[Dict]:
+        """Fetch and parse a search results page"""
+        return self.results_from_page(self.fetch_page(search_url), **kwargs)
+
+    def build_search_url(self, query: str, **kwargs) -> str:
+        """Build the search results URL (override to enable asearch)"""
+        raise NotImplementedError
+
+    def parse_product_details(self, markup: bytes) -> Dict:
+        """Extract details from a fetched listing page (override to parse details off the event loop)"""
+        raise NotImplementedError
+
+    @classmethod
+    def parses_product_details(cls) -> bool:
+        """Whether details can be parsed from raw page bytes (parse_product_details is overridden)"""
+        return cls.parse_product_details is not BaseScraper.parse_product_details
+
+    def parse_search_results(self, items: List, **kwargs) -> List[Dict]:
+        """Extract results from the lxml nodes matched by search_items_xpath (override to enable asearch)"""
+        raise NotImplementedError
+
+    async def asearch(self, query: str, **kwargs) -> List[Dict]:
+        """Async search; scrapers without URL/parse hooks run search() in a thread"""
+        try:
+            search_url = self.build_search_url(query, **kwargs)
+        except NotImplementedError:
+            return await asyncio.to_thread(self.search, query, **kwargs)
+
+        return self.results_from_page(await self.afetch_page(search_url), **kwargs)
+
+    async def aclose(self):
+        """Release the async connection pool"""
+        if self.async_client is not None:
+            await self.async_client.close()
 
 class GenericScraper(BaseScraper):
     """Generic scraper for standard e-commerce sites"""
@@ -91,9 +274,12 @@ class GenericScraper(BaseScraper):
         if not product_url.startswith('http'):
             product_url = self.base_url + product_url
 
-        soup = self.fetch(product_url)
-        if not soup:
-            return {}
+        page = self.fetch_page(product_url)
+        return self.parse_product_details(page.body) if page else {}
+
+    def parse_product_details(self, markup: bytes) -> Dict:
+        """Generic title, description and image extraction"""
+        soup = self.make_soup(markup)
 
         return {
             'title': soup.select_one('h1').get_text(strip=True) if soup.select_one('h1') else '',
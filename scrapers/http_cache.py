@@ -0,0 +1,194 @@
+"""
+Conditional-GET HTTP Cache
+SQLite-backed store of validators, bodies and parsed results for scraper fetches
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+HTTP_CACHE_PATH = os.getenv("SCRAPER_HTTP_CACHE_PATH", ".cache/scraper_http_cache.sqlite3")
+HTTP_CACHE_MAX_BYTES = int(os.getenv("SCRAPER_HTTP_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+HTTP_CACHE_ENABLED = os.getenv("SCRAPER_HTTP_CACHE", "1") != "0"
+
+class CacheEntry(NamedTuple):
+    """A cached response and, if already parsed, its extracted results"""
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body: bytes
+    results_key: Optional[str]
+    results: Optional[List[Dict]]
+
+class HttpCache:
+    """Persistent response cache with size-based LRU eviction"""
+
+    def __init__(self, path: str = HTTP_CACHE_PATH, max_bytes: int = HTTP_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._total_bytes = 0
+        self._stats: Dict[int, Dict[str, int]] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the store on first use"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if self.path != ':memory:' and directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS http_cache (
+                    url TEXT PRIMARY KEY,
+                    retailer_id INTEGER,
+                    etag TEXT,
+                    last_modified TEXT,
+                    body BLOB,
+                    results_key TEXT,
+                    results TEXT,
+                    size INTEGER NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_http_cache_accessed_at ON http_cache (accessed_at)")
+            self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        """Return the cached entry for a URL, if any"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT url, etag, last_modified, body, results_key, results FROM http_cache WHERE url = ?",
+                (url,)
+            ).fetchone()
+        if not row:
+            return None
+        results = json.loads(row[5]) if row[5] is not None else None
+        return CacheEntry(row[0], row[1], row[2], row[3], row[4], results)
+
+    @staticmethod
+    def conditional_headers(entry: Optional[CacheEntry]) -> Dict[str, str]:
+        """Validators to send with a revalidation request"""
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def store(self, url: str, retailer_id: int, headers: Dict[str, str], body: bytes):
+        """Cache a 200 response that carries validators"""
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+
+        size = len(body) + len(url)
+        with self._lock:
+            conn = self._connect()
+            old = conn.execute("SELECT size FROM http_cache WHERE url = ?", (url,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO http_cache "
+                "(url, retailer_id, etag, last_modified, body, results_key, results, size, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, NULL, NULL, ?, ?)",
+                (url, retailer_id, etag, last_modified, body, size, time.time())
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._evict(conn)
+            conn.commit()
+
+    def revalidated(self, url: str, headers: Dict[str, str]):
+        """Mark an entry fresh after a 304, picking up any new validators"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE http_cache SET accessed_at = ?, "
+                "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) WHERE url = ?",
+                (time.time(), headers.get('ETag'), headers.get('Last-Modified'), url)
+            )
+            conn.commit()
+
+    def store_results(self, url: str, results_key: str, results: List[Dict]):
+        """Attach parsed results so a later 304 can skip parsing"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE http_cache SET results_key = ?, results = ? WHERE url = ?",
+                (results_key, json.dumps(results), url)
+            )
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Drop least recently used entries until under max_bytes"""
+        while self._total_bytes > self.max_bytes:
+            rows = conn.execute(
+                "SELECT url, size FROM http_cache ORDER BY accessed_at, rowid LIMIT 100"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            for url, size in rows:
+                conn.execute("DELETE FROM http_cache WHERE url = ?", (url,))
+                self._total_bytes -= size
+                if self._total_bytes <= self.max_bytes:
+                    break
+
+    def _counter(self, retailer_id: int) -> Dict[str, int]:
+        return self._stats.setdefault(retailer_id, {
+            'hits': 0,
+            'misses': 0,
+            'bytes_downloaded': 0,
+            'bytes_saved': 0,
+            'parses_skipped': 0
+        })
+
+    def record_hit(self, retailer_id: int, bytes_saved: int):
+        with self._lock:
+            counter = self._counter(retailer_id)
+            counter['hits'] += 1
+            counter['bytes_saved'] += bytes_saved
+
+    def record_miss(self, retailer_id: int, bytes_downloaded: int):
+        with self._lock:
+            counter = self._counter(retailer_id)
+            counter['misses'] += 1
+            counter['bytes_downloaded'] += bytes_downloaded
+
+    def record_parse_skipped(self, retailer_id: int):
+        with self._lock:
+            self._counter(retailer_id)['parses_skipped'] += 1
+
+    def stats(self) -> Dict:
+        """Hit/miss counters per retailer plus store size"""
+        with self._lock:
+            return {
+                'size_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'retailers': {retailer_id: dict(counter) for retailer_id, counter in self._stats.items()}
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+_http_cache: Optional[HttpCache] = None
+_http_cache_lock = threading.Lock()
+
+def get_http_cache() -> Optional[HttpCache]:
+    """Process-wide cache, or None when SCRAPER_HTTP_CACHE=0"""
+    global _http_cache
+    if not HTTP_CACHE_ENABLED:
+        return None
+    with _http_cache_lock:
+        if _http_cache is None:
+            _http_cache = HttpCache()
+        return _http_cache
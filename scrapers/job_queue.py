@@ -0,0 +1,161 @@
+"""
+Scrape Job Queue
+Leased product/retailer jobs in the scrape_jobs table, shared by many workers
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Iterable, List
+from sqlalchemy import and_, exists, func, insert, or_
+from sqlalchemy.orm import Session
+
+from app.models import Product, ScrapeJob, ScrapeSchedule
+
+# Seconds a claim is valid without a heartbeat
+LEASE_SECONDS = int(os.getenv("SCRAPE_JOB_LEASE_SECONDS", "120"))
+# Jobs claimed per round trip
+JOB_BATCH_SIZE = int(os.getenv("SCRAPE_JOB_BATCH_SIZE", "20"))
+# Attempts (including lease expiries) before a job is marked failed
+MAX_ATTEMPTS = int(os.getenv("SCRAPE_JOB_MAX_ATTEMPTS", "3"))
+RETRY_DELAY_SECONDS = 60
+
+OPEN_STATUSES = ('pending', 'leased')
+
+def _claimable(now: datetime):
+    """Pending jobs that are ready, plus leases whose worker stopped heartbeating"""
+    return or_(
+        and_(ScrapeJob.status == 'pending', ScrapeJob.run_after <= now),
+        and_(ScrapeJob.status == 'leased', ScrapeJob.leased_until < now)
+    )
+
+def enqueue_due_jobs(db: Session, retailer_id: int, limit: int = 1000) -> int:
+    """Queue a job for every due product at a retailer that has no open job"""
+    now = datetime.utcnow()
+    open_job = exists().where(
+        ScrapeJob.product_id == Product.id,
+        ScrapeJob.retailer_id == retailer_id,
+        ScrapeJob.status.in_(OPEN_STATUSES)
+    )
+    product_ids = [product_id for (product_id,) in db.query(Product.id).outerjoin(ScrapeSchedule, and_(
+        ScrapeSchedule.product_id == Product.id,
+        ScrapeSchedule.retailer_id == retailer_id
+    )).filter(
+        Product.is_active == True,
+        or_(ScrapeSchedule.id == None, ScrapeSchedule.next_due_at <= now),
+        ~open_job
+    ).order_by(Product.id).limit(limit).all()]
+
+    if product_ids:
+        db.execute(insert(ScrapeJob), [
+            {'product_id': product_id, 'retailer_id': retailer_id, 'status': 'pending',
+             'run_after': now, 'attempts': 0, 'created_at': now}
+            for product_id in product_ids
+        ])
+    db.commit()
+    return len(product_ids)
+
+def claim_jobs(db: Session, worker_id: str, limit: int = JOB_BATCH_SIZE,
+               lease_seconds: int = LEASE_SECONDS) -> List[ScrapeJob]:
+    """Lease up to `limit` jobs for a worker.
+
+    On Postgres the candidate rows are locked with FOR UPDATE SKIP LOCKED,
+    so concurrent workers never wait on or receive the same job. The
+    guarded UPDATE keeps claims exclusive on databases without row locks.
+    """
+    now = datetime.utcnow()
+
+    # Expired leases that used up their attempts are not retried again
+    db.query(ScrapeJob).filter(
+        ScrapeJob.status == 'leased',
+        ScrapeJob.leased_until < now,
+        ScrapeJob.attempts >= MAX_ATTEMPTS
+    ).update({
+        ScrapeJob.status: 'failed',
+        ScrapeJob.last_error: 'lease expired',
+        ScrapeJob.finished_at: now
+    }, synchronize_session=False)
+
+    job_ids = [job_id for (job_id,) in db.query(ScrapeJob.id).filter(
+        _claimable(now)
+    ).order_by(ScrapeJob.run_after, ScrapeJob.id).limit(limit).with_for_update(skip_locked=True).all()]
+
+    if not job_ids:
+        db.commit()
+        return []
+
+    leased_until = now + timedelta(seconds=lease_seconds)
+    db.query(ScrapeJob).filter(
+        ScrapeJob.id.in_(job_ids),
+        _claimable(now)
+    ).update({
+        ScrapeJob.status: 'leased',
+        ScrapeJob.lease_owner: worker_id,
+        ScrapeJob.leased_until: leased_until,
+        ScrapeJob.heartbeat_at: now,
+        ScrapeJob.attempts: ScrapeJob.attempts + 1
+    }, synchronize_session=False)
+    db.commit()
+
+    return db.query(ScrapeJob).filter(
+        ScrapeJob.id.in_(job_ids),
+        ScrapeJob.status == 'leased',
+        ScrapeJob.lease_owner == worker_id,
+        ScrapeJob.leased_until == leased_until
+    ).order_by(ScrapeJob.id).all()
+
+def heartbeat(db: Session, worker_id: str, job_ids: Iterable[int], lease_seconds: int = LEASE_SECONDS) -> int:
+    """Extend a worker's leases; returns how many it still holds"""
+    job_ids = list(job_ids)
+    if not job_ids:
+        return 0
+    now = datetime.utcnow()
+    held = db.query(ScrapeJob).filter(
+        ScrapeJob.id.in_(job_ids),
+        ScrapeJob.status == 'leased',
+        ScrapeJob.lease_owner == worker_id
+    ).update({
+        ScrapeJob.leased_until: now + timedelta(seconds=lease_seconds),
+        ScrapeJob.heartbeat_at: now
+    }, synchronize_session=False)
+    db.commit()
+    return held
+
+def complete_jobs(db: Session, worker_id: str, job_ids: Iterable[int]) -> int:
+    """Mark a worker's jobs done"""
+    job_ids = list(job_ids)
+    if not job_ids:
+        return 0
+    done = db.query(ScrapeJob).filter(
+        ScrapeJob.id.in_(job_ids),
+        ScrapeJob.status == 'leased',
+        ScrapeJob.lease_owner == worker_id
+    ).update({
+        ScrapeJob.status: 'done',
+        ScrapeJob.finished_at: datetime.utcnow(),
+        ScrapeJob.leased_until: None
+    }, synchronize_session=False)
+    db.commit()
+    return done
+
+def fail_jobs(db: Session, worker_id: str, job_ids: Iterable[int], error: str):
+    """Release a worker's jobs for a delayed retry, or fail them once out of attempts"""
+    now = datetime.utcnow()
+    jobs = db.query(ScrapeJob).filter(
+        ScrapeJob.id.in_(list(job_ids)),
+        ScrapeJob.status == 'leased',
+        ScrapeJob.lease_owner == worker_id
+    ).all()
+    for job in jobs:
+        job.last_error = error[:2000]
+        job.leased_until = None
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = 'failed'
+            job.finished_at = now
+        else:
+            job.status = 'pending'
+            job.run_after = now + timedelta(seconds=RETRY_DELAY_SECONDS * 2 ** (job.attempts - 1))
+    db.commit()
+
+def queue_stats(db: Session) -> dict:
+    """Job counts by status"""
+    return dict(db.query(ScrapeJob.status, func.count(ScrapeJob.id)).group_by(ScrapeJob.status).all())
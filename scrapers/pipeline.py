@@ -0,0 +1,205 @@
+"""
+Scrape Pipeline
+Async fetchers download raw search and listing pages; a process pool of
+workers parses them
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from scrapers.async_client import AsyncHttpClient
+
+# Parser processes (0 parses on the event loop instead)
+PARSE_WORKERS = int(os.getenv("SCRAPER_PARSE_WORKERS", str(os.cpu_count() or 1)))
+# Max items waiting between each pair of stages
+PIPELINE_QUEUE_SIZE = int(os.getenv("SCRAPER_PIPELINE_QUEUE_SIZE", "32"))
+
+_DONE = object()
+
+# One scraper per class/retailer, reused by each worker process
+_worker_scrapers: Dict[Tuple, object] = {}
+
+def _worker_scraper(scraper_class, retailer_id: int, base_url: str):
+    key = (scraper_class, retailer_id, base_url)
+    scraper = _worker_scrapers.get(key)
+    if scraper is None:
+        scraper = _worker_scrapers[key] = scraper_class(retailer_id, base_url)
+    return scraper
+
+def parse_search_page(scraper_class, retailer_id: int, base_url: str, body: bytes, kwargs: Dict) -> List[Dict]:
+    """Parser worker: turn raw search page bytes into result dicts"""
+    scraper = _worker_scraper(scraper_class, retailer_id, base_url)
+    return scraper.parse_search_results(scraper.select_search_items(body), **kwargs)
+
+def parse_product_page(scraper_class, retailer_id: int, base_url: str, body: bytes) -> Dict:
+    """Parser worker: turn raw listing page bytes into a details dict"""
+    return _worker_scraper(scraper_class, retailer_id, base_url).parse_product_details(body)
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+def get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    """Shared parser process pool, or None when SCRAPER_PARSE_WORKERS=0"""
+    global _parse_pool
+    if PARSE_WORKERS <= 0:
+        return None
+    if _parse_pool is None:
+        # spawn: workers must not inherit the scheduler thread or open DB/cache handles
+        _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return _parse_pool
+
+def shutdown_parse_pool():
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=True, cancel_futures=True)
+        _parse_pool = None
+
+class ScrapePipeline:
+    """Fetch pages for many products (or listing URLs) and parse them off the event loop.
+
+    items -> fetchers (max_concurrency) -> pages queue -> parse dispatchers
+    (one or two per worker) -> results queue -> caller. Every queue is bounded,
+    so a slow stage back-pressures the ones before it and memory stays flat.
+    stream() parses search pages, stream_details() listing pages.
+    """
+
+    def __init__(self, scraper, executor: Optional[Executor] = None, queue_size: int = PIPELINE_QUEUE_SIZE):
+        self.scraper = scraper
+        self.executor = executor
+        self.queue_size = queue_size
+        self.fetchers = scraper.rate_limiter.max_concurrency
+        # Two dispatchers per worker keep the pool fed while results travel back
+        self.parsers = max(1, PARSE_WORKERS) * 2 if executor else 1
+
+    async def _fetch(self, todo: asyncio.Queue, pages: asyncio.Queue, done: asyncio.Queue, fetch):
+        while (item := await todo.get()) is not _DONE:
+            page, result = await fetch(item)
+            if result is not None:
+                await done.put((item, result))
+            else:
+                await pages.put((item, page))
+
+    async def _parse(self, pages: asyncio.Queue, done: asyncio.Queue, parse):
+        while (entry := await pages.get()) is not _DONE:
+            item, page = entry
+            await done.put((item, await parse(item, page)))
+
+    async def _fetch_search(self, product):
+        """(page, None) to parse, or (None, results) when the scraper searched by itself"""
+        scraper = self.scraper
+        kwargs = {'category': product.category}
+        try:
+            search_url = scraper.build_search_url(product.name, **kwargs)
+        except NotImplementedError:
+            # No URL/parse hooks: run the scraper's own search in a thread
+            try:
+                return None, await asyncio.to_thread(scraper.search, product.name, **kwargs)
+            except Exception as e:
+                print(f"Error scraping {product.name}: {e}")
+                return None, []
+
+        try:
+            page = await scraper.afetch_page(search_url)
+        except Exception as e:
+            print(f"Error fetching {product.name}: {e}")
+            page = None
+        return (page, None) if page else (None, [])
+
+    async def _parse_search(self, product, page) -> List[Dict]:
+        scraper = self.scraper
+        kwargs = {'category': product.category}
+        try:
+            results = scraper.cached_results(page, **kwargs)
+            if results is None:
+                if self.executor:
+                    results = await asyncio.get_running_loop().run_in_executor(
+                        self.executor, parse_search_page,
+                        type(scraper), scraper.retailer_id, scraper.base_url, page.body, kwargs
+                    )
+                else:
+                    results = scraper.parse_search_results(scraper.select_search_items(page.body), **kwargs)
+                scraper.remember_results(page, results, **kwargs)
+            return results
+        except Exception as e:
+            print(f"Error parsing {product.name}: {e}")
+            return []
+
+    async def _fetch_details(self, url: str):
+        """(page, None) to parse, or (None, details) when the scraper fetched them by itself"""
+        scraper = self.scraper
+        try:
+            if not scraper.parses_product_details():
+                # No parse hook: run the scraper's own fetch and extraction in a thread
+                return None, await asyncio.to_thread(scraper.get_product_details, url)
+            page = await scraper.afetch_page(url)
+        except Exception as e:
+            print(f"Error fetching {url}: {e}")
+            page = None
+        return (page, None) if page else (None, {})
+
+    async def _parse_details(self, url: str, page) -> Dict:
+        scraper = self.scraper
+        try:
+            if self.executor:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self.executor, parse_product_page,
+                    type(scraper), scraper.retailer_id, scraper.base_url, page.body
+                )
+            return scraper.parse_product_details(page.body)
+        except Exception as e:
+            print(f"Error parsing {url}: {e}")
+            return {}
+
+    def stream(self, products: Iterable) -> AsyncIterator[Tuple[object, List[Dict]]]:
+        """Yield (product, results) pairs as each product's search page is parsed"""
+        return self._run(products, self._fetch_search, self._parse_search)
+
+    def stream_details(self, urls: Iterable[str]) -> AsyncIterator[Tuple[str, Dict]]:
+        """Yield (url, details) pairs as each listing page is parsed"""
+        return self._run(urls, self._fetch_details, self._parse_details)
+
+    async def _run(self, items: Iterable, fetch, parse) -> AsyncIterator[Tuple]:
+        todo = asyncio.Queue(maxsize=self.queue_size)
+        pages = asyncio.Queue(maxsize=self.queue_size)
+        done = asyncio.Queue(maxsize=self.queue_size)
+
+        async def feed():
+            error = None
+            try:
+                for item in items:
+                    await todo.put(item)
+            except Exception as e:
+                error = e  # still stop the fetchers, then fail the stream
+            # Not on cancellation: the fetchers that would take the sentinels are cancelled too
+            for _ in range(self.fetchers):
+                await todo.put(_DONE)
+            if error is not None:
+                raise error
+
+        async def fetch_stage():
+            await asyncio.gather(*(self._fetch(todo, pages, done, fetch) for _ in range(self.fetchers)))
+            for _ in range(self.parsers):
+                await pages.put(_DONE)
+
+        async def parse_stage():
+            await asyncio.gather(*(self._parse(pages, done, parse) for _ in range(self.parsers)))
+            await done.put(_DONE)
+
+        owns_client = self.scraper.async_client is None
+        if owns_client:
+            self.scraper.async_client = AsyncHttpClient(limit_per_host=self.fetchers)
+
+        tasks = [asyncio.create_task(coro) for coro in (feed(), fetch_stage(), parse_stage())]
+        try:
+            while (item := await done.get()) is not _DONE:
+                yield item
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if owns_client:
+                await self.scraper.aclose()
+                self.scraper.async_client = None
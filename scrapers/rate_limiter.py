@@ -0,0 +1,66 @@
+"""
+Per-Retailer Rate Limiting
+Token buckets shared by every scraper instance and thread hitting a retailer
+"""
+
+import os
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from app.services.rate_limit import TokenBucket
+
+# Defaults for retailers without limits in Retailer.config
+DEFAULT_REQUESTS_PER_SECOND = float(os.getenv("SCRAPER_REQUESTS_PER_SECOND", "0.5"))
+DEFAULT_BURST = int(os.getenv("SCRAPER_BURST", "2"))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("SCRAPER_CONCURRENCY_PER_HOST", "4"))
+
+# Responses that mean "slow down"
+THROTTLE_STATUSES = (429, 503)
+
+_limiters: Dict[int, TokenBucket] = {}
+_registry_lock = threading.Lock()
+
+def get_rate_limiter(retailer_id: int, config: Optional[Dict] = None) -> TokenBucket:
+    """Return the process-wide limiter for a retailer.
+
+    Passing the retailer's config (re)applies `requests_per_second`,
+    `burst` and `max_concurrency`; otherwise defaults are used on creation.
+    """
+    with _registry_lock:
+        limiter = _limiters.get(retailer_id)
+        if config is None and limiter is not None:
+            return limiter
+
+        config = config or {}
+        requests_per_second = config.get('requests_per_second', DEFAULT_REQUESTS_PER_SECOND)
+        burst = config.get('burst', DEFAULT_BURST)
+        max_concurrency = config.get('max_concurrency', DEFAULT_MAX_CONCURRENCY)
+
+        if limiter is None:
+            limiter = TokenBucket(requests_per_second, burst, max_concurrency)
+            _limiters[retailer_id] = limiter
+        elif (limiter.base_rate, limiter.burst, limiter.max_concurrency) != (requests_per_second, burst, max_concurrency):
+            limiter.configure(requests_per_second, burst, max_concurrency)
+        return limiter
+
+def get_all_limiter_stats() -> Dict[int, Dict]:
+    """Current limiter state per retailer"""
+    with _registry_lock:
+        return {retailer_id: limiter.stats() for retailer_id, limiter in _limiters.items()}
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
@@ -1,25 +1,93 @@
 """
 Scraper Runner and Scheduler
+
+    python -m scrapers.runner
 """
 
+import os
 import schedule
+import asyncio
 import time
 import threading
-from typing import List, Dict
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
 from datetime import datetime
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
 
 from app.database import SessionLocal
-from app.models import Product, Retailer, Price
+from app.models import Product, Retailer, ScrapeCheckpoint, ScrapeSchedule
 from app.services.scraper_service import ScraperService
+from app.services.scrape_priority import MIN_INTERVAL_MINUTES, reschedule_many
+from app.services.retention import RETENTION_RUN_AT, run_retention
+from scrapers.pipeline import ScrapePipeline, get_parse_pool, shutdown_parse_pool
+from scrapers.http_cache import get_http_cache
+from scrapers.job_queue import enqueue_due_jobs
+from scrapers.rate_limiter import get_rate_limiter, get_all_limiter_stats
+
+# Products loaded per keyset page during a sweep
+SWEEP_BATCH_SIZE = int(os.getenv("SCRAPER_SWEEP_BATCH_SIZE", "100"))
+# Wall-clock seconds one scheduled run may spend before checkpointing
+SWEEP_TIME_BUDGET = float(os.getenv("SCRAPER_SWEEP_TIME_BUDGET", "900"))
+# Hand scraping to scrapers.worker processes through the scrape_jobs table
+USE_WORK_QUEUE = os.getenv("SCRAPER_WORK_QUEUE", "0") == "1"
+# Products whose prices are written per transaction
+INGEST_BATCH_SIZE = int(os.getenv("SCRAPER_INGEST_BATCH_SIZE", "50"))
+
+def iter_product_batches(db: Session, after_id: int = 0, batch_size: int = SWEEP_BATCH_SIZE,
+                         due_at_retailer: Optional[int] = None) -> Iterator[List[Product]]:
+    """Yield active products in id order, one keyset page at a time.
+
+    With due_at_retailer, only products never scraped there or whose
+    scrape_schedules row is due are returned.
+    """
+    now = datetime.utcnow()
+    while True:
+        query = db.query(Product).filter(
+            Product.is_active == True,
+            Product.id > after_id
+        )
+        if due_at_retailer is not None:
+            query = query.outerjoin(ScrapeSchedule, and_(
+                ScrapeSchedule.product_id == Product.id,
+                ScrapeSchedule.retailer_id == due_at_retailer
+            )).filter(or_(ScrapeSchedule.id == None, ScrapeSchedule.next_due_at <= now))
+        batch = query.order_by(Product.id).limit(batch_size).all()
+        if not batch:
+            return
+        # Detach so ingest commits (run in a worker thread) never expire and reload them
+        for product in batch:
+            db.expunge(product)
+        yield batch
+        after_id = batch[-1].id
+
+def get_checkpoint(db: Session, retailer_id: int) -> ScrapeCheckpoint:
+    """Load (or create) a retailer's sweep checkpoint"""
+    checkpoint = db.query(ScrapeCheckpoint).filter(ScrapeCheckpoint.retailer_id == retailer_id).first()
+    if not checkpoint:
+        checkpoint = ScrapeCheckpoint(retailer_id=retailer_id, last_product_id=0, completed_sweeps=0)
+        db.add(checkpoint)
+        db.commit()
+    return checkpoint
+
+async def scrape_products_async(scraper, products: List[Product], executor=None) -> List[Tuple[Product, List[Dict]]]:
+    """Search a retailer for many products concurrently over one pooled session.
+
+    Pacing comes from the retailer's shared token bucket: at most
+    `max_concurrency` searches are in flight and requests start no faster
+    than its configured rate. Pages are parsed on `executor` when given.
+    """
+    return [item async for item in ScrapePipeline(scraper, executor).stream(products)]
 
 class ScraperRunner:
     """Manages and runs scrapers on schedule"""
 
-    def __init__(self):
+    def __init__(self, use_async: bool = True, prioritize: bool = True):
         self.jobs = []
         self.running = False
         self.thread = None
+        self.use_async = use_async
+        # Only scrape products whose volatility-based schedule is due
+        self.prioritize = prioritize
 
     def register_scraper(self, scraper_class, retailer_id: int, interval_minutes: int = 60):
         """Register a scraper to run on schedule"""
@@ -30,44 +98,12 @@ class ScraperRunner:
                 if not retailer or not retailer.is_active:
                     return
 
+                get_rate_limiter(retailer_id, retailer.config or {})
                 scraper = scraper_class(retailer_id, retailer.base_url)
                 service = ScraperService(db)
 
                 print(f"[{datetime.now()}] Running {retailer.name} scraper...")
-
-                # Get products to scrape
-                products = db.query(Product).filter(Product.is_active == True).all()
-
-                for product in products[:10]:  # Limit to prevent overload
-                    try:
-                        results = scraper.search(product.name, category=product.category)
-
-                        prices = []
-                        for result in results[:3]:  # Top 3 results
-                            prices.append({
-                                'retailer_id': retailer_id,
-                                'price': result['price'],
-                                'condition': result.get('condition', 'unknown'),
-                                'listing_url': result.get('url'),
-                                'listing_title': result['name'][:500]
-                            })
-
-                        if prices:
-                            service.process_scraped_data(
-                                {
-                                    'name': product.name,
-                                    'category': product.category,
-                                    'description': product.description,
-                                    'image_url': product.image_url
-                                },
-                                prices
-                            )
-
-                        scraper.rate_limit(2, 5)  # Be nice to servers
-
-                    except Exception as e:
-                        print(f"Error scraping {product.name}: {e}")
-
+                self.sweep(db, scraper, service, retailer_id)
                 print(f"[{datetime.now()}] Completed {retailer.name} scraper")
 
             finally:
@@ -80,6 +116,163 @@ class ScraperRunner:
             'scraper': scraper_class.__name__
         })
 
+    def register_producer(self, retailer_id: int, interval_minutes: int = 1):
+        """Queue due products as scrape_jobs for workers instead of scraping here"""
+        def job():
+            db = SessionLocal()
+            try:
+                queued = enqueue_due_jobs(db, retailer_id)
+                if queued:
+                    print(f"[{datetime.now()}] Queued {queued} scrape jobs for retailer {retailer_id}")
+            finally:
+                db.close()
+
+        schedule.every(interval_minutes).minutes.do(job)
+        self.jobs.append({
+            'retailer_id': retailer_id,
+            'interval': interval_minutes,
+            'scraper': 'queue'
+        })
+
+    def register_retention(self, at: str = RETENTION_RUN_AT):
+        """Roll up and prune old prices once a day"""
+        def job():
+            db = SessionLocal()
+            try:
+                run_retention(db)
+            finally:
+                db.close()
+
+        schedule.every().day.at(at).do(job)
+        self.jobs.append({
+            'retailer_id': None,
+            'interval': 24 * 60,
+            'scraper': 'retention'
+        })
+
+    def sweep(self, db: Session, scraper, service: ScraperService, retailer_id: int,
+              time_budget: float = SWEEP_TIME_BUDGET, batch_size: int = SWEEP_BATCH_SIZE) -> Dict:
+        """Scrape the catalog from the retailer's checkpoint until the time budget runs out.
+
+        Products are read in keyset pages (id > last_product_id) so memory is
+        bounded by batch_size. The checkpoint is committed after every batch;
+        reaching the end of the catalog resets it so the next run starts over.
+        When prioritizing, products that are not yet due are skipped and each
+        scraped product gets a new next-due time.
+        """
+        checkpoint = get_checkpoint(db, retailer_id)
+        start_id = checkpoint.last_product_id or 0
+        deadline = time.monotonic() + time_budget
+        scraped = 0
+
+        if not start_id:
+            checkpoint.sweep_started_at = datetime.utcnow()
+
+        due_at_retailer = retailer_id if self.prioritize else None
+        for batch in iter_product_batches(db, start_id, batch_size, due_at_retailer):
+            # Stop feeding once the budget is spent; products already fed still finish
+            fed = []
+
+            def until_deadline():
+                for product in batch:
+                    if time.monotonic() >= deadline:
+                        return
+                    fed.append(product)
+                    yield product
+
+            self.scrape_products(scraper, service, retailer_id, until_deadline())
+            if not fed:
+                break
+            scraped += len(fed)
+            if self.prioritize:
+                reschedule_many(db, retailer_id, [product.id for product in fed])
+            checkpoint.last_product_id = fed[-1].id
+            db.commit()
+            if len(fed) < len(batch):
+                break
+        else:
+            # Catalog exhausted: the next run starts a new sweep
+            if scraped or start_id:
+                checkpoint.last_product_id = 0
+                checkpoint.completed_sweeps = (checkpoint.completed_sweeps or 0) + 1
+                db.commit()
+
+        return {
+            'retailer_id': retailer_id,
+            'scraped': scraped,
+            'last_product_id': checkpoint.last_product_id,
+            'completed_sweeps': checkpoint.completed_sweeps
+        }
+
+    def scrape_products(self, scraper, service: ScraperService, retailer_id: int, products: Iterable[Product],
+                        raise_errors: bool = False):
+        """Search a retailer for each product and save the results.
+
+        Failed saves are logged and skipped, or re-raised with raise_errors
+        so queue workers can retry the jobs.
+        """
+        if self.use_async:
+            asyncio.run(self._sweep(scraper, service, retailer_id, products, raise_errors))
+            return
+        pending = []
+        for product in products:
+            try:
+                pending.append((product, scraper.search(product.name, category=product.category)))
+            except Exception as e:
+                print(f"Error scraping {product.name}: {e}")
+            if len(pending) >= INGEST_BATCH_SIZE:
+                self._store_results(service, retailer_id, pending, raise_errors)
+                pending = []
+        self._store_results(service, retailer_id, pending, raise_errors)
+
+    async def _sweep(self, scraper, service: ScraperService, retailer_id: int, products: Iterable[Product],
+                     raise_errors: bool = False):
+        """Run the fetch/parse pipeline and save results in batches as they arrive"""
+        pipeline = ScrapePipeline(scraper, get_parse_pool())
+        pending = []
+        async for item in pipeline.stream(products):
+            pending.append(item)
+            if len(pending) >= INGEST_BATCH_SIZE:
+                # Fetchers and parsers keep going while the batch is written
+                await asyncio.to_thread(self._store_results, service, retailer_id, pending, raise_errors)
+                pending = []
+        await asyncio.to_thread(self._store_results, service, retailer_id, pending, raise_errors)
+
+    @staticmethod
+    def _store_results(service: ScraperService, retailer_id: int, items: List[Tuple[Product, List[Dict]]],
+                       raise_errors: bool = False):
+        """Save the top search results for a batch of products"""
+        batch = []
+        for product, results in items:
+            prices = []
+            for result in results[:3]:  # Top 3 results
+                prices.append({
+                    'retailer_id': retailer_id,
+                    'price': result['price'],
+                    'condition': result.get('condition', 'unknown'),
+                    'listing_url': result.get('url'),
+                    'listing_title': result['name'][:500]
+                })
+            if prices:
+                batch.append({
+                    'product': {
+                        'name': product.name,
+                        'category': product.category,
+                        'description': product.description,
+                        'image_url': product.image_url
+                    },
+                    'prices': prices
+                })
+
+        if batch:
+            try:
+                service.process_scraped_batch(batch)
+            except Exception as e:
+                service.db.rollback()
+                print(f"Error saving {len(batch)} products: {e}")
+                if raise_errors:
+                    raise
+
     def start(self):
         """Start the scheduler in background thread"""
         if self.running:
@@ -102,38 +295,64 @@ class ScraperRunner:
         if self.thread:
             self.thread.join(timeout=5)
         schedule.clear()
+        shutdown_parse_pool()
         print("🛑 Scraper scheduler stopped")
 
+    @staticmethod
+    def get_checkpoints() -> Dict[int, Dict]:
+        """Sweep position per retailer"""
+        db = SessionLocal()
+        try:
+            return {
+                checkpoint.retailer_id: {
+                    'last_product_id': checkpoint.last_product_id,
+                    'completed_sweeps': checkpoint.completed_sweeps,
+                    'sweep_started_at': str(checkpoint.sweep_started_at)
+                }
+                for checkpoint in db.query(ScrapeCheckpoint).all()
+            }
+        except Exception:
+            return {}
+        finally:
+            db.close()
+
     def get_status(self) -> Dict:
         """Get scheduler status"""
         return {
             'running': self.running,
             'jobs': self.jobs,
+            'rate_limits': get_all_limiter_stats(),
+            'http_cache': get_http_cache().stats() if get_http_cache() else None,
+            'checkpoints': self.get_checkpoints(),
             'next_run': str(schedule.next_run()) if schedule.next_run() else None
         }
 
+def scraper_class_for(scraper_type: str):
+    """Scraper class for a retailer's scraper_type, or None"""
+    from scrapers.tier1_2_scrapers import eBayScraper, ReverbScraper, PriceChartingScraper
+
+    scraper_map = {
+        'ebay': eBayScraper,
+        'reverb': ReverbScraper,
+        'pricecharting': PriceChartingScraper
+    }
+    return scraper_map.get(scraper_type)
+
 # Manual scraper execution
 def run_scraper_now(retailer_id: int, product_query: str = None):
     """Run a scraper immediately (for testing)"""
     db = SessionLocal()
     try:
-        from scrapers.tier1_2_scrapers import eBayScraper, ReverbScraper, PriceChartingScraper
-
         retailer = db.query(Retailer).filter(Retailer.id == retailer_id).first()
         if not retailer:
             return {"error": "Retailer not found"}
 
         # Select scraper based on type
-        scraper_map = {
-            'ebay': eBayScraper,
-            'reverb': ReverbScraper,
-            'pricecharting': PriceChartingScraper
-        }
-
-        scraper_class = scraper_map.get(retailer.scraper_type)
+        scraper_class = scraper_class_for(retailer.scraper_type)
         if not scraper_class:
             return {"error": f"Unknown scraper type: {retailer.scraper_type}"}
 
+        get_rate_limiter(retailer_id, retailer.config or {})
         scraper = scraper_class(retailer_id, retailer.base_url)
 
         # Search
@@ -151,8 +370,12 @@ def run_scraper_now(retailer_id: int, product_query: str = None):
         db.close()
 
 # Initialize and start
-def init_scheduler():
-    """Initialize scheduler with configured retailers"""
+def init_scheduler(use_work_queue: bool = USE_WORK_QUEUE):
+    """Initialize scheduler with configured retailers.
+
+    With use_work_queue, the scheduler only enqueues scrape_jobs and
+    `python -m scrapers.worker` processes do the scraping.
+    """
     runner = ScraperRunner()
 
     db = SessionLocal()
@@ -160,19 +383,31 @@ def init_scheduler():
         retailers = db.query(Retailer).filter(Retailer.is_active == True).all()
 
         for retailer in retailers:
-            from scrapers.tier1_2_scrapers import eBayScraper, ReverbScraper, PriceChartingScraper
+            scraper_class = scraper_class_for(retailer.scraper_type)
+            if scraper_class and use_work_queue:
+                runner.register_producer(retailer.id)
+            elif scraper_class:
+                # Runs only pick up due products, so poll at the shortest interval
+                runner.register_scraper(scraper_class, retailer.id, interval_minutes=max(1, int(MIN_INTERVAL_MINUTES)))
 
-            scraper_map = {
-                'ebay': eBayScraper,
-                'reverb': ReverbScraper,
-                'pricecharting': PriceChartingScraper
-            }
-
-            scraper_class = scraper_map.get(retailer.scraper_type)
-            if scraper_class:
-                runner.register_scraper(scraper_class, retailer.id, interval_minutes=60)
+        runner.register_retention()
 
     finally:
         db.close()
 
     return runner
+
+def main():
+    """Run the scheduler in the foreground until interrupted"""
+    runner = init_scheduler()
+    runner.start()
+    try:
+        while runner.running:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        runner.stop()
+
+if __name__ == "__main__":
+    main()
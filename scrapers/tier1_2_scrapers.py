@@ -4,22 +4,35 @@ Supports: eBay, PriceCharting, Reverb
 """
 
 from typing import List, Dict, Optional
-from scrapers.base import BaseScraper
+from scrapers.base import BaseScraper, has_class, descendant_xpath, first_node, node_text
+from lxml import etree
 import re
 from urllib.parse import quote_plus
 
 class eBayScraper(BaseScraper):
     """eBay scraper with Tier 1-2 field extraction"""
 
+    search_items_xpath = f'//*[{has_class("s-item")}] | //*[@data-view="mi:1686|iid:1"]'
+    _title_xpath = descendant_xpath('s-item__title', 's-item__title--has-tags')
+    _price_xpath = descendant_xpath('s-item__price')
+    _link_xpath = descendant_xpath('s-item__link')
+    _subtitle_xpath = descendant_xpath('s-item__subtitle')
+    _shipping_xpath = descendant_xpath('s-item__shipping')
+    _seller_xpath = descendant_xpath('s-item__seller-info-text')
+
     def __init__(self, retailer_id: int, base_url: str = "https://www.ebay.com"):
         super().__init__(retailer_id, base_url)
-        self.api_url = "https://www.ebay.com/sch/i.html"
+        self.api_url = f"{self.base_url}/sch/i.html"
 
     def search(self, query: str, **kwargs) -> List[Dict]:
         """
         Search eBay with filters
         kwargs: category, condition, min_price, max_price
         """
+        return self.search_page(self.build_search_url(query, **kwargs), **kwargs)
+
+    def build_search_url(self, query: str, **kwargs) -> str:
+        """Build eBay search URL from query and filters"""
         params = {
             '_nkw': query,
             '_sacat': kwargs.get('category', '0')
@@ -39,34 +52,31 @@ class eBayScraper(BaseScraper):
             params['_udlo'] = min_price
             params['_udhi'] = max_price
 
-        search_url = f"{self.api_url}?{'&'.join([f'{k}={quote_plus(str(v))}' for k, v in params.items()])}"
-        soup = self.fetch(search_url)
-
-        if not soup:
-            return []
+        return f"{self.api_url}?{'&'.join([f'{k}={quote_plus(str(v))}' for k, v in params.items()])}"
 
+    def parse_search_results(self, items, **kwargs) -> List[Dict]:
+        """Extract listings from eBay search result nodes"""
         results = []
-        items = soup.select('.s-item') or soup.select('[data-view="mi:1686|iid:1"]')
 
         for item in items:
             try:
                 # Skip the "Shop on eBay" placeholder
-                title_elem = item.select_one('.s-item__title, .s-item__title--has-tags')
-                if not title_elem or 'Shop on eBay' in title_elem.get_text():
+                title_elem = first_node(item, self._title_xpath)
+                if title_elem is None or 'Shop on eBay' in title_elem.text_content():
                     continue
 
-                price_elem = item.select_one('.s-item__price')
-                link_elem = item.select_one('.s-item__link')
-                subtitle = item.select_one('.s-item__subtitle')
-                shipping = item.select_one('.s-item__shipping')
-                seller = item.select_one('.s-item__seller-info-text')
+                price_elem = first_node(item, self._price_xpath)
+                link_elem = first_node(item, self._link_xpath)
+                subtitle = first_node(item, self._subtitle_xpath)
+                shipping = first_node(item, self._shipping_xpath)
+                seller = first_node(item, self._seller_xpath)
 
-                title = title_elem.get_text(strip=True)
-                price_text = price_elem.get_text(strip=True) if price_elem else '$0.00'
+                title = node_text(title_elem)
+                price_text = node_text(price_elem) if price_elem is not None else '$0.00'
 
                 # Determine condition from subtitle or title
                 item_condition = 'unknown'
-                subtitle_text = subtitle.get_text(strip=True).lower() if subtitle else ''
+                subtitle_text = node_text(subtitle).lower()
                 if 'new' in subtitle_text or 'brand new' in title.lower():
                     item_condition = 'new'
                 elif 'used' in subtitle_text or 'pre-owned' in subtitle_text:
@@ -77,10 +87,10 @@ class eBayScraper(BaseScraper):
                 results.append({
                     'name': title,
                     'price': self.parse_price(price_text),
-                    'url': link_elem['href'] if link_elem else None,
+                    'url': link_elem.get('href') if link_elem is not None else None,
                     'condition': item_condition,
-                    'shipping': self.parse_price(shipping.get_text()) if shipping else 0,
-                    'seller': seller.get_text(strip=True) if seller else 'Unknown',
+                    'shipping': self.parse_price(shipping.text_content()) if shipping is not None else 0,
+                    'seller': node_text(seller) if seller is not None else 'Unknown',
                     'category': kwargs.get('product_category', 'other')
                 })
 
@@ -92,9 +102,12 @@ class eBayScraper(BaseScraper):
 
     def get_product_details(self, product_url: str) -> Dict:
         """Extract detailed product info from eBay listing"""
-        soup = self.fetch(product_url)
-        if not soup:
-            return {}
+        page = self.fetch_page(product_url)
+        return self.parse_product_details(page.body) if page else {}
+
+    def parse_product_details(self, markup: bytes) -> Dict:
+        """Extract specs, images and condition from eBay listing markup"""
+        soup = self.make_soup(markup)
 
         # Extract specifications table
         specs = {}
@@ -247,11 +260,21 @@ class eBayScraper(BaseScraper):
 class ReverbScraper(BaseScraper):
     """Reverb.com scraper for audio/music gear"""
 
+    search_items_xpath = f'//*[{has_class("grid-card")}] | //*[@data-testid="listing-card"]'
+    _title_xpath = descendant_xpath('grid-card__title', tags=('h2', 'h3'))
+    _price_xpath = descendant_xpath('grid-card__price', 'price')
+    _condition_xpath = descendant_xpath('condition-label', 'condition')
+    _link_xpath = etree.XPath('.//a[@href]')
+
     def __init__(self, retailer_id: int, base_url: str = "https://reverb.com"):
         super().__init__(retailer_id, base_url)
 
     def search(self, query: str, **kwargs) -> List[Dict]:
         """Search Reverb for music gear"""
+        return self.search_page(self.build_search_url(query, **kwargs), **kwargs)
+
+    def build_search_url(self, query: str, **kwargs) -> str:
+        """Build Reverb marketplace search URL"""
         search_url = f"{self.base_url}/marketplace?query={quote_plus(query)}"
 
         # Add category filter
@@ -259,26 +282,25 @@ class ReverbScraper(BaseScraper):
         if category:
             search_url += f"&category={category}"
 
-        soup = self.fetch(search_url)
-        if not soup:
-            return []
+        return search_url
 
+    def parse_search_results(self, items, **kwargs) -> List[Dict]:
+        """Extract listing cards from Reverb search result nodes"""
         results = []
-        items = soup.select('.grid-card', ) or soup.select('[data-testid="listing-card"]')
 
         for item in items:
             try:
-                title = item.select_one('.grid-card__title, h2, h3')
-                price = item.select_one('.grid-card__price, .price')
-                condition = item.select_one('.condition-label, .condition')
-                link = item.select_one('a[href]')
+                title = first_node(item, self._title_xpath)
+                price = first_node(item, self._price_xpath)
+                condition = first_node(item, self._condition_xpath)
+                link = first_node(item, self._link_xpath)
 
-                if title and price:
+                if title is not None and price is not None:
                     results.append({
-                        'name': title.get_text(strip=True),
-                        'price': self.parse_price(price.get_text()),
-                        'url': self.base_url + link['href'] if link and link['href'].startswith('/') else link.get('href'),
-                        'condition': condition.get_text(strip=True).lower() if condition else 'used',
+                        'name': node_text(title),
+                        'price': self.parse_price(price.text_content()),
+                        'url': self.base_url + link.get('href') if link is not None and link.get('href').startswith('/') else link.get('href'),
+                        'condition': node_text(condition).lower() if condition is not None else 'used',
                         'category': 'audio'
                     })
             except Exception as e:
@@ -288,9 +310,12 @@ class ReverbScraper(BaseScraper):
 
     def get_product_details(self, product_url: str) -> Dict:
         """Get product details from Reverb"""
-        soup = self.fetch(product_url)
-        if not soup:
-            return {}
+        page = self.fetch_page(product_url)
+        return self.parse_product_details(page.body) if page else {}
+
+    def parse_product_details(self, markup: bytes) -> Dict:
+        """Extract brand, model and description from Reverb listing markup"""
+        soup = self.make_soup(markup)
 
         # Extract brand and model
         brand = soup.select_one('.brand, [data-testid="brand"]')
@@ -341,31 +366,37 @@ class ReverbScraper(BaseScraper):
 class PriceChartingScraper(BaseScraper):
     """PriceCharting scraper for games/collectibles"""
 
+    search_items_xpath = f'//*[{has_class("search-result")}]'
+    _title_xpath = descendant_xpath('title', tags=('h3',))
+    _price_xpath = descendant_xpath('price')
+    _console_xpath = descendant_xpath('console', 'category')
+
     def __init__(self, retailer_id: int, base_url: str = "https://www.pricecharting.com"):
         super().__init__(retailer_id, base_url)
 
     def search(self, query: str, **kwargs) -> List[Dict]:
         """Search PriceCharting"""
-        search_url = f"{self.base_url}/search?q={quote_plus(query)}"
-        soup = self.fetch(search_url)
+        return self.search_page(self.build_search_url(query, **kwargs), **kwargs)
 
-        if not soup:
-            return []
+    def build_search_url(self, query: str, **kwargs) -> str:
+        """Build PriceCharting search URL"""
+        return f"{self.base_url}/search?q={quote_plus(query)}"
 
+    def parse_search_results(self, items, **kwargs) -> List[Dict]:
+        """Extract results from PriceCharting search result nodes"""
         results = []
-        items = soup.select('.search-result')
 
         for item in items:
             try:
-                title = item.select_one('.title, h3')
-                price = item.select_one('.price')
-                console = item.select_one('.console, .category')
+                title = first_node(item, self._title_xpath)
+                price = first_node(item, self._price_xpath)
+                console = first_node(item, self._console_xpath)
 
-                if title:
+                if title is not None:
                     results.append({
-                        'name': title.get_text(strip=True),
-                        'price': self.parse_price(price.get_text()) if price else 0,
-                        'set_name': console.get_text(strip=True) if console else None,
+                        'name': node_text(title),
+                        'price': self.parse_price(price.text_content()) if price is not None else 0,
+                        'set_name': node_text(console) if console is not None else None,
                         'category': kwargs.get('category', 'collectibles')
                     })
             except Exception as e:
@@ -375,9 +406,12 @@ class PriceChartingScraper(BaseScraper):
 
     def get_product_details(self, product_url: str) -> Dict:
         """Get details"""
-        soup = self.fetch(product_url)
-        if not soup:
-            return {}
+        page = self.fetch_page(product_url)
+        return self.parse_product_details(page.body) if page else {}
+
+    def parse_product_details(self, markup: bytes) -> Dict:
+        """Extract name and set from PriceCharting markup"""
+        soup = self.make_soup(markup)
 
         return {
             'name': soup.select_one('h1').get_text(strip=True) if soup.select_one('h1') else '',
@@ -0,0 +1,153 @@
+"""
+Scrape Worker
+Claims scrape_jobs leases and scrapes them; run any number of these side by side
+
+    python -m scrapers.worker [--batch-size 20] [--lease-seconds 120] [--once]
+"""
+
+import argparse
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.database import SessionLocal
+from app.models import Product, Retailer, ScrapeJob
+from app.services.scraper_service import ScraperService
+from app.services.scrape_priority import reschedule_many
+from scrapers.job_queue import (
+    JOB_BATCH_SIZE, LEASE_SECONDS, claim_jobs, complete_jobs, fail_jobs, heartbeat
+)
+from scrapers.rate_limiter import get_rate_limiter
+from scrapers.runner import ScraperRunner, scraper_class_for
+
+# Seconds to sleep when the queue is empty
+POLL_INTERVAL = float(os.getenv("SCRAPE_WORKER_POLL_INTERVAL", "5"))
+
+class ScrapeWorker:
+    """Leases batches of jobs, scrapes them per retailer and reports back"""
+
+    def __init__(self, worker_id: Optional[str] = None, session_factory=SessionLocal,
+                 batch_size: int = JOB_BATCH_SIZE, lease_seconds: int = LEASE_SECONDS,
+                 use_async: bool = True, scraper_classes: Optional[Dict] = None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.runner = ScraperRunner(use_async=use_async)
+        self.scraper_classes = scraper_classes or {}
+        self.running = False
+
+    def _scraper_class(self, scraper_type: str):
+        return self.scraper_classes.get(scraper_type) or scraper_class_for(scraper_type)
+
+    @contextmanager
+    def _heartbeat(self, job_ids: List[int]):
+        """Keep leases alive from a side thread while jobs are processed"""
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.lease_seconds / 3):
+                db = self.session_factory()
+                try:
+                    heartbeat(db, self.worker_id, job_ids, self.lease_seconds)
+                except Exception as e:
+                    print(f"⚠️ Heartbeat failed: {e}")
+                finally:
+                    db.close()
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def _process_retailer(self, db, retailer_id: int, jobs: List[ScrapeJob]):
+        """Scrape one retailer's share of a claimed batch"""
+        job_ids = [job.id for job in jobs]
+        retailer = db.query(Retailer).filter(Retailer.id == retailer_id).first()
+        scraper_class = self._scraper_class(retailer.scraper_type) if retailer else None
+        if not retailer or not retailer.is_active or not scraper_class:
+            fail_jobs(db, self.worker_id, job_ids, "retailer inactive or has no scraper")
+            return
+
+        product_ids = [job.product_id for job in jobs]
+        products = db.query(Product).filter(Product.id.in_(product_ids)).order_by(Product.id).all()
+        for product in products:
+            db.expunge(product)
+
+        try:
+            get_rate_limiter(retailer_id, retailer.config or {})
+            scraper = scraper_class(retailer_id, retailer.base_url)
+            # Ingest errors propagate so the jobs are retried, not marked done
+            self.runner.scrape_products(scraper, ScraperService(db), retailer_id, products, raise_errors=True)
+            reschedule_many(db, retailer_id, [product.id for product in products])
+        except Exception as e:
+            db.rollback()
+            print(f"❌ Scrape jobs for {retailer.name} failed: {e}")
+            fail_jobs(db, self.worker_id, job_ids, str(e))
+            return
+
+        complete_jobs(db, self.worker_id, job_ids)
+
+    def run_once(self) -> int:
+        """Claim and process one batch; returns the number of jobs claimed"""
+        db = self.session_factory()
+        try:
+            jobs = claim_jobs(db, self.worker_id, self.batch_size, self.lease_seconds)
+            if not jobs:
+                return 0
+
+            by_retailer = defaultdict(list)
+            for job in jobs:
+                by_retailer[job.retailer_id].append(job)
+
+            with self._heartbeat([job.id for job in jobs]):
+                for retailer_id, retailer_jobs in by_retailer.items():
+                    self._process_retailer(db, retailer_id, retailer_jobs)
+            return len(jobs)
+        finally:
+            db.close()
+
+    def run(self, poll_interval: float = POLL_INTERVAL):
+        """Process jobs until stopped, sleeping while the queue is empty"""
+        self.running = True
+        print(f"✅ Scrape worker {self.worker_id} started")
+        while self.running:
+            try:
+                claimed = self.run_once()
+            except Exception as e:
+                print(f"❌ Worker error: {e}")
+                claimed = 0
+            if not claimed:
+                time.sleep(poll_interval)
+        print(f"🛑 Scrape worker {self.worker_id} stopped")
+
+    def stop(self):
+        self.running = False
+
+def main():
+    parser = argparse.ArgumentParser(description="Process scrape jobs from the shared queue")
+    parser.add_argument("--batch-size", type=int, default=JOB_BATCH_SIZE)
+    parser.add_argument("--lease-seconds", type=int, default=LEASE_SECONDS)
+    parser.add_argument("--once", action="store_true", help="process one batch and exit")
+    args = parser.parse_args()
+
+    worker = ScrapeWorker(batch_size=args.batch_size, lease_seconds=args.lease_seconds)
+    if args.once:
+        print(f"[{datetime.now()}] Processed {worker.run_once()} jobs")
+    else:
+        try:
+            worker.run()
+        except KeyboardInterrupt:
+            worker.stop()
+
+if __name__ == "__main__":
+    main()
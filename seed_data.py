@@ -6,6 +6,7 @@ Creates sample products with Tier 1-2 fields
 from sqlalchemy.orm import Session
 from app.database import SessionLocal, engine
 from app.models import Base, Product, Retailer, Price
+from app.services.latest_prices import rebuild_latest_prices
 from datetime import datetime
 
 def seed_retailers(db: Session):
@@ -15,7 +16,7 @@ def seed_retailers(db: Session):
             "name": "eBay",
             "base_url": "https://www.ebay.com",
             "scraper_type": "ebay",
-            "config": {"rate_limit": 2.0}
+            "config": {"requests_per_second": 0.5, "burst": 2, "max_concurrency": 2}
         },
         {
             "name": "Reverb",
@@ -234,6 +235,7 @@ def seed_sample_prices(db: Session):
                     count += 1
 
     db.commit()
+    rebuild_latest_prices(db)
     print(f"✅ Seeded {count} sample prices")
 
 def main():
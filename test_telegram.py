@@ -10,7 +10,7 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-from app.services.telegram_service import send_price_alert, send_restocker_alert, send_daily_summary
+from app.services.telegram_service import get_telegram_client, send_price_alert, send_restocker_alert, send_daily_summary
 
 
 async def test_alerts():
@@ -59,5 +59,12 @@ async def test_alerts():
     print("\n🎉 All tests completed!")
 
 
+async def main():
+    try:
+        await test_alerts()
+    finally:
+        await get_telegram_client().close()
+
+
 if __name__ == "__main__":
-    asyncio.run(test_alerts())
+    asyncio.run(main())
@@ -2,14 +2,23 @@
 Pytest configuration and fixtures
 """
 
+import os
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
+# Keep the scraper HTTP cache out of the working tree
+os.environ.setdefault("SCRAPER_HTTP_CACHE_PATH", ":memory:")
+# Tests drive the outbox dispatcher themselves
+os.environ.setdefault("NOTIFICATION_DISPATCHER", "0")
+
 from app.database import Base, get_db
 from app.main import app
+from app.services.alert_index import get_alert_index
+from app.services.product_cache import get_product_cache
+from app.services.response_cache import get_response_cache
 
 # Create test database
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -25,6 +34,9 @@ TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engin
 def db():
     """Create a fresh database session for each test"""
     Base.metadata.create_all(bind=engine)
+    get_product_cache().clear()  # ids are reused across fresh databases
+    get_response_cache().clear()
+    get_alert_index().clear()
     db = TestingSessionLocal()
     try:
         yield db
@@ -45,3 +57,15 @@ def client(db):
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
+
+@pytest.fixture(scope="function")
+def count_queries(db):
+    """Count SELECT statements issued on the test connection"""
+    statements = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_execute)
+    yield lambda: sum(1 for statement in statements if statement.lstrip().upper().startswith("SELECT"))
+    event.remove(engine, "before_cursor_execute", before_execute)
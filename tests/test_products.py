@@ -5,6 +5,7 @@ Tests for product endpoints
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from app.models import Product
 
 client = TestClient(app)
 
@@ -62,3 +63,226 @@ def test_get_nonexistent_product():
     """Test getting a product that doesn't exist"""
     response = client.get("/api/v1/products/99999")
     assert response.status_code == 404
+
+def _seed_catalog(db, products: int, prices_per_product: int):
+    """Products with prices spread over several retailers, all from one scrape"""
+    from datetime import datetime
+    from app.models import Product, Price, Retailer
+    from app.services.latest_prices import rebuild_latest_prices
+
+    scraped_at = datetime.utcnow()
+
+    retailers = [Retailer(name=f"Retailer {i}", base_url=f"https://r{i}.example.com") for i in range(3)]
+    db.add_all(retailers)
+    db.flush()
+    for i in range(products):
+        product = Product(name=f"MacBook {i}", category="mac")
+        db.add(product)
+        db.flush()
+        db.add_all([
+            Price(product_id=product.id, retailer_id=retailers[j % 3].id, price=1000 + j, scraped_at=scraped_at)
+            for j in range(prices_per_product)
+        ])
+    db.commit()
+    rebuild_latest_prices(db)
+
+@pytest.mark.parametrize("size", [2, 8])
+def test_product_reads_use_constant_queries(client, db, count_queries, size):
+    """Test product detail, search and comparison avoid per-price queries"""
+    # Each read: products, prices joined to retailers, grouped price stats
+    _seed_catalog(db, products=size, prices_per_product=size)
+
+    before = count_queries()
+    response = client.get("/api/v1/products/1")
+    assert response.status_code == 200
+    assert len(response.json()["prices"]) == size
+    assert response.json()["prices"][0]["retailer_name"] == "Retailer 0"
+    assert count_queries() - before <= 3
+
+    before = count_queries()
+    response = client.post("/api/v1/products/search", json={"category": "mac"})
+    assert response.status_code == 200
+    assert {len(product["prices"]) for product in response.json()} == {size}
+    assert count_queries() - before <= 3
+
+    before = count_queries()
+    response = client.get("/api/v1/products/1/comparison")
+    assert response.status_code == 200
+    assert response.json()["best_price"]["price"] == 1000
+    assert count_queries() - before <= 2
+
+def test_price_stats_aggregated_in_sql(client, db):
+    """Test price_stats match the product's price rows"""
+    _seed_catalog(db, products=3, prices_per_product=4)
+
+    stats = client.get("/api/v1/products/2").json()["price_stats"]
+    assert stats == {"count": 4, "avg": 1001.5, "min": 1000, "max": 1003}
+
+    results = client.post("/api/v1/products/search", json={"category": "mac"}).json()
+    assert all(product["price_stats"] == stats for product in results)
+
+    db.add(Product(name="No prices", category="mac"))
+    db.commit()
+    empty = client.get("/api/v1/products/4").json()["price_stats"]
+    assert empty == {"count": 0, "avg": 0, "min": 0, "max": 0}
+
+def test_search_price_range_pages_distinct_products(client, db, count_queries):
+    """Test min/max price filter current listings without repeating products"""
+    _seed_catalog(db, products=5, prices_per_product=8)
+
+    before = count_queries()
+    response = client.post("/api/v1/products/search?limit=3", json={"category": "mac", "min_price": 1000})
+    assert count_queries() - before <= 3
+    ids = [product["id"] for product in response.json()]
+    assert len(ids) == len(set(ids)) == 3
+    assert response.headers["X-Next-Cursor"]
+
+    # Current listings are 1000-1002 (one per retailer); older prices don't count
+    results = client.post("/api/v1/products/search", json={"min_price": 1001.5, "max_price": 1005}).json()
+    assert len(results) == 5 and len(results[0]["prices"]) == 8
+    assert client.post("/api/v1/products/search", json={"min_price": 1003}).json() == []
+    assert client.post("/api/v1/products/search", json={"max_price": 999}).json() == []
+
+def test_product_reads_cached_with_etag(client, db, count_queries):
+    """Test polled reads are served from cache, revalidate to 304 and drop on ingest"""
+    from app.services.scraper_service import ScraperService
+
+    _seed_catalog(db, products=2, prices_per_product=2)
+
+    first = client.get("/api/v1/products/1")
+    assert first.headers["X-Cache"] == "MISS"
+    etag = first.headers["ETag"]
+
+    before = count_queries()
+    cached = client.get("/api/v1/products/1")
+    not_modified = client.get("/api/v1/products/1", headers={"If-None-Match": etag})
+    assert count_queries() == before
+    assert (cached.headers["X-Cache"], cached.headers["ETag"], cached.json()) == ("HIT", etag, first.json())
+    assert not_modified.status_code == 304 and not_modified.content == b""
+
+    comparison = client.get("/api/v1/products/1/comparison")
+    other = client.get("/api/v1/products/2/comparison").headers["ETag"]
+
+    # A scrape landing for product 1 drops its responses only
+    ScraperService(db).process_scraped_batch([
+        {'product': {'name': "MacBook 0", 'category': "mac"}, 'prices': [{'retailer_id': 1, 'price': 900}]}
+    ])
+    fresh = client.get("/api/v1/products/1", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200 and fresh.headers["X-Cache"] == "MISS"
+    assert fresh.headers["ETag"] != etag and len(fresh.json()["prices"]) == 3
+    assert client.get("/api/v1/products/1/comparison").json()["best_price"]["price"] == 900 != comparison.json()["best_price"]["price"]
+    assert client.get("/api/v1/products/2/comparison").headers["X-Cache"] == "HIT"
+    assert client.get("/api/v1/products/2/comparison", headers={"If-None-Match": other}).status_code == 304
+
+    client.put("/api/v1/products/2", json={"name": "Renamed"})
+    assert client.get("/api/v1/products/2").json()["name"] == "Renamed"
+    assert client.get("/api/v1/products/999").status_code == 404
+    assert client.get("/api/v1/products/999").headers.get("X-Cache") is None
+
+def test_add_price_updates_comparison(client, db):
+    """Test manual prices flow into latest_prices and the comparison view"""
+    _seed_catalog(db, products=1, prices_per_product=3)
+
+    price = {"product_id": 1, "retailer_id": 2, "price": 950, "condition": "used"}
+    assert client.post("/api/v1/products/1/prices", json=price).status_code == 200
+
+    comparison = client.get("/api/v1/products/1/comparison").json()
+    assert [(p["retailer_name"], p["price"]) for p in comparison["prices"]] == [
+        ("Retailer 1", 950), ("Retailer 0", 1000), ("Retailer 1", 1001), ("Retailer 2", 1002)
+    ]
+    assert comparison["price_range"] == {"min": 950, "max": 1002}
+
+def _page_through(client, method, url, sort, limit=7, params=None, **kwargs):
+    """All products via keyset pages, following X-Next-Cursor"""
+    seen, cursor = [], None
+    while True:
+        params = {**(params or {}), "limit": limit, **({"sort": sort} if sort else {}), **({"cursor": cursor} if cursor else {})}
+        response = getattr(client, method)(url, params=params, **kwargs)
+        assert response.status_code == 200
+        seen += [product["id"] for product in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return seen
+
+@pytest.mark.parametrize("sort", ["name", "created_at", "best_price"])
+def test_keyset_pagination(client, db, sort):
+    """Test cursor pages cover every product once, in sort order, NULL keys last"""
+    from datetime import datetime, timedelta
+    from app.models import Price, Retailer
+    from app.services.latest_prices import rebuild_latest_prices
+
+    db.add(Retailer(id=1, name="Retailer", base_url="https://example.com"))
+    start = datetime(2026, 1, 1)
+    # Duplicate names, timestamps and prices so ties fall back to id
+    db.add_all([
+        Product(name=f"Product {i % 10}", category=("mac", "audio", "pokemon")[i % 3], created_at=start + timedelta(hours=i % 5))
+        for i in range(30)
+    ])
+    db.flush()
+    db.add_all([Price(product_id=i, retailer_id=1, price=100 + i % 4) for i in range(1, 31) if i % 6])
+    db.commit()
+    rebuild_latest_prices(db)
+
+    products = db.query(Product).all()
+    key = {
+        "name": lambda p: (p.name, p.id),
+        "created_at": lambda p: (p.created_at, p.id),
+        "best_price": lambda p: (p.best_price is None, p.best_price or 0, p.id),
+    }[sort]
+    expected = [p.id for p in sorted(products, key=key)]
+    assert sum(p.best_price is None for p in products) == 5
+
+    assert _page_through(client, "get", "/api/v1/products/", sort) == expected
+    assert _page_through(client, "post", "/api/v1/products/search", sort, json={"category": "mac"}) == [
+        i for i in expected if db.get(Product, i).category == "mac"
+    ]
+
+    # Legacy offset pages follow the same order
+    offset_page = lambda skip: [p["id"] for p in client.get("/api/v1/products/", params={"skip": skip, "limit": 10, "sort": sort}).json()]
+    assert offset_page(10) + offset_page(20) == expected[10:]
+
+def test_invalid_cursor_rejected(client, db):
+    """Test malformed cursors and cursors from another sort are rejected"""
+    from app.pagination import encode_cursor
+
+    assert client.get("/api/v1/products/", params={"cursor": "not-a-cursor"}).status_code == 400
+    cursor = encode_cursor("name", "MacBook", 3)
+    assert client.get("/api/v1/products/", params={"cursor": cursor, "sort": "name"}).status_code == 200
+    assert client.get("/api/v1/products/", params={"cursor": cursor, "sort": "best_price"}).status_code == 400
+
+def test_full_text_search_ranked(client, db):
+    """Test search matches word prefixes across fields, best field first"""
+    db.add_all([
+        Product(name="Laptop sleeve", category="other", description="Fits a MacBook Pro 14"),
+        Product(name="MacBook Pro 14", category="mac", description="M3 Pro laptop"),
+        Product(name="USB-C hub", category="electronics", brand="Anker", model="MacBook dock"),
+        Product(name="MacBook Air 13", category="mac"),
+        Product(name="Café racer", category="other"),
+    ])
+    db.commit()
+
+    names = lambda response: [p["name"] for p in response.json()]
+    response = client.get("/api/v1/products/", params={"search": "macbook"})
+    # Name matches, then brand/model, then description
+    assert names(response)[2:] == ["USB-C hub", "Laptop sleeve"]
+    assert set(names(response)[:2]) == {"MacBook Pro 14", "MacBook Air 13"}
+
+    assert names(client.get("/api/v1/products/", params={"search": "macb pro"}))[0] == "MacBook Pro 14"
+    assert names(client.get("/api/v1/products/", params={"search": "cafe"})) == ["Café racer"]
+    # Quotes and FTS operators are treated as plain text
+    assert names(client.get("/api/v1/products/", params={"search": "\"pro\" -* ("})) == ["MacBook Pro 14", "Laptop sleeve"]
+
+    searched = client.post("/api/v1/products/search", json={"query": "macbook", "category": "mac"})
+    assert set(names(searched)) == {"MacBook Pro 14", "MacBook Air 13"}
+
+    # Relevance order pages with cursors too
+    search = {"search": "macbook"}
+    ranked = _page_through(client, "get", "/api/v1/products/", None, limit=10, params=search)
+    assert len(ranked) == 4
+    assert _page_through(client, "get", "/api/v1/products/", None, limit=1, params=search) == ranked
+
+    # Renamed products are re-indexed
+    product = db.query(Product).filter(Product.name == "Café racer").one()
+    assert client.put(f"/api/v1/products/{product.id}", json={"name": "Scrambler"}).status_code == 200
+    assert names(client.get("/api/v1/products/", params={"search": "scram"})) == ["Scrambler"]
+    assert names(client.get("/api/v1/products/", params={"search": "cafe"})) == []
@@ -0,0 +1,82 @@
+"""
+Query plan tests for the prices time-series indexes
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, text
+from app.models import Product, Price, PriceHistory, Retailer
+
+PRODUCTS = 200
+ROWS_PER_PRODUCT = 100
+
+@pytest.fixture
+def seeded(db):
+    """20k prices and history rows spread over 200 products and 100 days"""
+    start = datetime(2026, 1, 1)
+    db.add(Retailer(id=1, name="Retailer", base_url="https://example.com"))
+    db.execute(insert(Product), [{"id": i, "name": f"Product {i}", "category": "mac"} for i in range(1, PRODUCTS + 1)])
+    db.execute(insert(Price), [
+        {"product_id": p, "retailer_id": 1, "price": 100 + n, "scraped_at": start + timedelta(days=n, minutes=p)}
+        for p in range(1, PRODUCTS + 1) for n in range(ROWS_PER_PRODUCT)
+    ])
+    db.execute(insert(PriceHistory), [
+        {"product_id": p, "retailer_id": 1, "price": 100 + n, "recorded_at": start + timedelta(days=n, minutes=p)}
+        for p in range(1, PRODUCTS + 1) for n in range(ROWS_PER_PRODUCT)
+    ])
+    db.commit()
+    db.execute(text("ANALYZE"))
+    return start + timedelta(days=ROWS_PER_PRODUCT)
+
+def _plan(db, query) -> str:
+    """SQLite EXPLAIN QUERY PLAN details for an ORM query, one step per line"""
+    sql = query.statement.compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True})
+    return "\n".join(row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+def test_product_history_uses_composite_index(db, seeded):
+    """Test per-product reads seek on (product_id, scraped_at) without sorting"""
+    # get_price_history
+    plan = _plan(db, db.query(Price).filter(
+        Price.product_id == 7,
+        Price.scraped_at >= seeded - timedelta(days=30)
+    ).order_by(Price.scraped_at))
+    assert "ix_prices_product_scraped_at" in plan
+    assert "TEMP B-TREE" not in plan
+
+    # check_restock_alerts: newest price before a cutoff
+    plan = _plan(db, db.query(Price).filter(
+        Price.product_id == 7,
+        Price.scraped_at < seeded - timedelta(hours=24)
+    ).order_by(Price.scraped_at.desc()).limit(1))
+    assert "ix_prices_product_scraped_at" in plan
+    assert "TEMP B-TREE" not in plan
+
+    plan = _plan(db, db.query(PriceHistory).filter(
+        PriceHistory.product_id == 7,
+        PriceHistory.recorded_at >= seeded - timedelta(days=30)
+    ).order_by(PriceHistory.recorded_at.desc()))
+    assert "ix_price_history_product_recorded_at" in plan
+    assert "TEMP B-TREE" not in plan
+
+def test_time_range_scans_use_timestamp_index(db, seeded):
+    """Test daily-summary style range scans avoid a full table scan"""
+    plan = _plan(db, db.query(func.count(Price.id)).filter(Price.scraped_at >= seeded - timedelta(hours=24)))
+    assert plan.startswith("SEARCH prices USING") and "ix_prices_scraped_at" in plan
+
+    plan = _plan(db, db.query(PriceHistory).filter(PriceHistory.recorded_at >= seeded - timedelta(hours=24)))
+    assert plan.startswith("SEARCH price_history USING") and "ix_price_history_recorded_at" in plan
+
+@pytest.mark.parametrize("sort", ["name", "created_at", "best_price"])
+def test_keyset_pages_seek_on_sort_index(db, seeded, sort):
+    """Test a deep keyset page is an index seek with no sort step"""
+    from app.pagination import SORT_COLUMNS, _segments, decode_cursor, encode_cursor
+
+    last = db.get(Product, PRODUCTS - 10)
+    last.best_price = 150.0
+    db.commit()
+    cursor = encode_cursor(sort, getattr(last, SORT_COLUMNS[sort].key), last.id)
+    first_segment = _segments(db.query(Product), SORT_COLUMNS[sort], decode_cursor(cursor, sort))[0].limit(20)
+    plan = _plan(db, first_segment)
+    # SQLite may pick the plain name index: it ends in rowid, so it orders ties by id too
+    assert plan.startswith("SEARCH products USING") and f"ix_products_{sort}" in plan
+    assert "TEMP B-TREE" not in plan
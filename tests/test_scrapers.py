@@ -35,3 +35,547 @@ def test_ebay_parse_price():
     assert scraper.parse_price("$1,234.56") == 1234.56
     assert scraper.parse_price("$100.00 to $150.00") == 100.00
     assert scraper.parse_price("Current bid: $50.00") == 50.0
+
+def test_ebay_asearch_runs_concurrently():
+    """Test async eBay search over a pooled session"""
+    import asyncio
+    from aiohttp import web
+    from types import SimpleNamespace
+    from scrapers.rate_limiter import get_rate_limiter
+    from scrapers.runner import scrape_products_async
+
+    page = """
+    <ul><li class="s-item">
+      <a class="s-item__link" href="https://www.ebay.com/itm/1"><h3 class="s-item__title">MacBook Air M2</h3></a>
+      <div class="s-item__subtitle">Brand New</div>
+      <span class="s-item__price">$899.00</span>
+    </li></ul>
+    """
+    in_flight = {'now': 0, 'max': 0}
+
+    async def handler(request):
+        in_flight['now'] += 1
+        in_flight['max'] = max(in_flight['max'], in_flight['now'])
+        await asyncio.sleep(0.05)
+        in_flight['now'] -= 1
+        return web.Response(text=page, content_type='text/html')
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/sch/i.html', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            get_rate_limiter(901, {'requests_per_second': 1000, 'burst': 10, 'max_concurrency': 3})
+            scraper = eBayScraper(901, f"http://127.0.0.1:{port}")
+            products = [SimpleNamespace(name=f"MacBook {i}", category='mac') for i in range(6)]
+            return await scrape_products_async(scraper, products)
+        finally:
+            await runner.cleanup()
+
+    scraped = asyncio.run(run())
+
+    assert len(scraped) == 6
+    for product, results in scraped:
+        assert results[0]['name'] == 'MacBook Air M2'
+        assert results[0]['price'] == 899.0
+        assert results[0]['condition'] == 'new'
+    assert 1 < in_flight['max'] <= 3
+
+def test_token_bucket_paces_after_burst():
+    """Test token bucket allows a burst then spaces requests at the configured rate"""
+    from scrapers.rate_limiter import TokenBucket
+
+    bucket = TokenBucket(requests_per_second=10, burst=3, max_concurrency=1)
+    waits = [bucket.reserve() for _ in range(5)]
+
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert 0.05 < waits[3] <= 0.1
+    assert 0.15 < waits[4] <= 0.2
+
+def test_token_bucket_backoff_honors_retry_after():
+    """Test 429/503 backoff halves the rate and pauses for Retry-After"""
+    from scrapers.rate_limiter import TokenBucket, parse_retry_after
+
+    bucket = TokenBucket(requests_per_second=4, burst=4, max_concurrency=1)
+    bucket.backoff(parse_retry_after("2"))
+
+    assert bucket.rate == 2
+    assert 1.9 < bucket.reserve() <= 2.0
+
+    for _ in range(20):
+        bucket.record_success()
+    assert bucket.rate == 4
+
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+
+def test_token_bucket_reconfigure_keeps_backoff_and_slots():
+    """Test new limits keep a backoff in progress and resize slots in place"""
+    import threading
+    from scrapers.rate_limiter import TokenBucket
+
+    bucket = TokenBucket(requests_per_second=4, burst=4, max_concurrency=1)
+    bucket.backoff(0)
+    bucket.configure(8, 4, 2)
+    assert (bucket.base_rate, bucket.rate) == (8, 4)
+
+    # A held slot still counts against the new limit; raising it admits the waiter
+    entered, release = threading.Event(), threading.Event()
+
+    def hold():
+        with bucket.slot():
+            entered.set()
+            release.wait()
+
+    with bucket.slot():
+        bucket.configure(8, 4, 1)
+        waiter = threading.Thread(target=hold)
+        waiter.start()
+        assert not entered.wait(0.1)
+        bucket.configure(8, 4, 2)
+        assert entered.wait(1)
+        assert bucket.in_flight == 2
+        release.set()
+        waiter.join()
+    assert bucket.in_flight == 0
+
+    with pytest.raises(ValueError):
+        bucket.configure(0, 4, 1)
+    assert bucket.reserve() >= 0
+
+def test_token_bucket_async_slots_share_the_limit():
+    """Test coroutines wait for slots on the loop and share the count with threads"""
+    import asyncio
+    import threading
+    from scrapers.rate_limiter import TokenBucket
+
+    bucket = TokenBucket(requests_per_second=1000, burst=10, max_concurrency=2)
+    in_flight = {'now': 0, 'max': 0}
+
+    async def request():
+        async with bucket.aslot():
+            in_flight['now'] += 1
+            in_flight['max'] = max(in_flight['max'], in_flight['now'])
+            await asyncio.sleep(0.01)
+            in_flight['now'] -= 1
+
+    async def run():
+        await asyncio.gather(*(request() for _ in range(8)))
+
+    asyncio.run(run())
+    assert in_flight['max'] == 2 and bucket.in_flight == 0
+
+    # A thread holding the only slot keeps coroutines waiting, without blocking the loop
+    bucket.configure(1000, 10, 1)
+    held, release = threading.Event(), threading.Event()
+
+    def hold():
+        with bucket.slot():
+            held.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    assert held.wait(1)
+
+    async def blocked():
+        waiting = asyncio.create_task(request())
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        release.set()
+        await asyncio.wait_for(waiting, 1)
+
+    asyncio.run(blocked())
+    holder.join()
+    assert bucket.in_flight == 0
+
+def test_retailers_share_one_limiter():
+    """Test scrapers for the same retailer share a limiter configured from Retailer.config"""
+    from scrapers.rate_limiter import get_rate_limiter
+
+    limiter = get_rate_limiter(902, {'requests_per_second': 5, 'burst': 2, 'max_concurrency': 3})
+    first = eBayScraper(902)
+    second = eBayScraper(902)
+
+    assert first.rate_limiter is second.rate_limiter is limiter
+    assert limiter.max_concurrency == 3
+
+def test_http_cache_lru_eviction():
+    """Test the HTTP cache evicts least recently used entries by size"""
+    from scrapers.http_cache import HttpCache
+
+    cache = HttpCache(':memory:', max_bytes=320)
+    for i in range(3):
+        cache.store(f"https://example.com/{i}", 1, {'ETag': f'"v{i}"'}, b'x' * 80)
+    cache.revalidated("https://example.com/0", {})
+    cache.store("https://example.com/3", 1, {'ETag': '"v3"'}, b'x' * 80)
+
+    assert cache.lookup("https://example.com/0") is not None
+    assert cache.lookup("https://example.com/1") is None
+    assert cache.stats()['size_bytes'] <= 320
+    assert cache.conditional_headers(cache.lookup("https://example.com/3")) == {'If-None-Match': '"v3"'}
+
+def test_conditional_get_skips_download_and_parse():
+    """Test a 304 reuses the cached body and parsed results"""
+    import asyncio
+    from aiohttp import web
+    from scrapers.http_cache import HttpCache
+
+    page = """<li class="s-item"><h3 class="s-item__title">iPad Pro</h3><span class="s-item__price">$799.00</span></li>"""
+    seen = []
+
+    async def handler(request):
+        seen.append(request.headers.get('If-None-Match'))
+        if request.headers.get('If-None-Match') == '"abc"':
+            return web.Response(status=304, headers={'ETag': '"abc"'})
+        return web.Response(text=page, content_type='text/html', headers={'ETag': '"abc"'})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/sch/i.html', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            scraper = eBayScraper(903, f"http://127.0.0.1:{port}")
+            scraper.http_cache = HttpCache(':memory:')
+            first = await scraper.asearch("iPad Pro")
+            second = await scraper.asearch("iPad Pro")
+            await scraper.aclose()
+            return scraper.http_cache.stats()['retailers'][903], first, second
+        finally:
+            await runner.cleanup()
+
+    stats, first, second = asyncio.run(run())
+
+    assert seen == [None, '"abc"']
+    assert first == second
+    assert first[0]['price'] == 799.0
+    assert stats['hits'] == 1 and stats['misses'] == 1
+    assert stats['parses_skipped'] == 1
+
+def test_ebay_parse_from_fixture():
+    """Test eBay search extraction on the saved fixture via lxml"""
+    import os
+    from scrapers.base import FetchedPage
+
+    path = os.path.join(os.path.dirname(__file__), 'fixtures', 'ebay_search.html')
+    with open(path, 'rb') as f:
+        markup = f.read()
+
+    scraper = eBayScraper(1)
+    scraper.http_cache = None
+    assert len(scraper.select_search_items(markup)) == 4
+
+    results = scraper.results_from_page(FetchedPage('https://www.ebay.com/sch/i.html', markup))
+
+    assert [r['price'] for r in results] == [1399.0, 1949.99, 2499.0]
+    assert [r['condition'] for r in results] == ['new', 'used', 'refurbished']
+    assert results[0]['name'] == 'Apple MacBook Pro 14" M3 8GB 512GB Space Gray 2023'
+    assert results[0]['url'] == 'https://www.ebay.com/itm/314159265358'
+    assert results[1]['shipping'] == 24.5
+    assert results[2]['seller'] == 'certified_macs (1,096) 99.1%'
+
+def test_pipeline_parses_on_process_pool():
+    """Test fetched pages are parsed by process pool workers with bounded queues"""
+    import asyncio
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from aiohttp import web
+    from types import SimpleNamespace
+    from scrapers.pipeline import ScrapePipeline
+    from scrapers.rate_limiter import get_rate_limiter
+
+    async def handler(request):
+        name = request.query['_nkw']
+        page = f"""<li class="s-item"><h3 class="s-item__title">{name}</h3><span class="s-item__price">$10.00</span></li>"""
+        return web.Response(text=page, content_type='text/html')
+
+    async def listing(request):
+        item = request.match_info['item']
+        page = f"""<h1>Listing {item}</h1><table class="itemAttr"><tr><td>Condition:</td><td>used</td></tr></table>"""
+        return web.Response(text=page, content_type='text/html')
+
+    async def run(pool):
+        app = web.Application()
+        app.router.add_get('/sch/i.html', handler)
+        app.router.add_get('/itm/{item}', listing)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            get_rate_limiter(904, {'requests_per_second': 1000, 'burst': 10, 'max_concurrency': 3})
+            scraper = eBayScraper(904, f"http://127.0.0.1:{port}")
+            scraper.http_cache = None
+            products = (SimpleNamespace(name=f"Card {i}", category='pokemon') for i in range(12))
+            pipeline = ScrapePipeline(scraper, pool, queue_size=2)
+            scraped = [(p.name, results) async for p, results in pipeline.stream(products)]
+            urls = [f"http://127.0.0.1:{port}/itm/{i}" for i in range(6)]
+            return scraped, [details async for _, details in pipeline.stream_details(urls)]
+        finally:
+            await runner.cleanup()
+
+    with ProcessPoolExecutor(2, mp_context=multiprocessing.get_context('spawn')) as pool:
+        scraped, details = asyncio.run(run(pool))
+
+    assert len(scraped) == 12
+    assert all(results[0]['name'] == name for name, results in scraped)
+    # Listing pages are parsed by the same workers
+    assert sorted(d['name'] for d in details) == [f"Listing {i}" for i in range(6)]
+    assert all(d['condition'] == 'used' for d in details)
+
+def test_pipeline_stops_cleanly_when_consumer_stops_early():
+    """Test closing stream() early cancels every stage instead of hanging on full queues"""
+    import asyncio
+    from types import SimpleNamespace
+    from scrapers.pipeline import ScrapePipeline
+
+    class ThreadScraper:
+        rate_limiter = SimpleNamespace(max_concurrency=2)
+        async_client = object()  # not owned by the pipeline
+
+        def build_search_url(self, query, **kwargs):
+            raise NotImplementedError
+
+        def search(self, query, **kwargs):
+            return [{'name': query, 'price': 1.0}]
+
+    async def run():
+        products = (SimpleNamespace(name=f"Card {i}", category='pokemon') for i in range(50))
+        stream = ScrapePipeline(ThreadScraper(), queue_size=2).stream(products)
+        first = await stream.__anext__()
+        await asyncio.sleep(0.05)  # let every queue fill up behind the idle consumer
+        await asyncio.wait_for(stream.aclose(), 5)
+        return first
+
+    product, results = asyncio.run(run())
+    assert results == [{'name': product.name, 'price': 1.0}]
+
+class _RecordingScraper:
+    """Stand-in scraper that records searches and advances a fake clock"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.searched = []
+
+    def search(self, query, **kwargs):
+        self.searched.append(query)
+        self.clock['now'] += 1
+        return [{'name': f"{query} listing", 'price': 100.0, 'url': None}]
+
+def test_sweep_resumes_from_checkpoint(db, monkeypatch):
+    """Test keyset sweep covers the whole catalog across time-boxed runs"""
+    from app.models import Product, Retailer, Price, ScrapeCheckpoint
+    from app.services.scraper_service import ScraperService
+    from scrapers import runner as runner_module
+
+    db.add(Retailer(id=1, name="Sweep Test", base_url="https://example.com"))
+    for i in range(7):
+        db.add(Product(name=f"Product {i}", category="mac"))
+    db.add(Product(name="Retired", category="mac", is_active=False))
+    db.commit()
+
+    clock = {'now': 0.0}
+    monkeypatch.setattr(runner_module.time, 'monotonic', lambda: clock['now'])
+    scraper = _RecordingScraper(clock)
+    runner = runner_module.ScraperRunner(use_async=False, prioritize=False)
+    service = ScraperService(db)
+
+    # Each search costs one fake second: 3 products per run
+    first = runner.sweep(db, scraper, service, 1, time_budget=3, batch_size=2)
+    assert scraper.searched == ["Product 0", "Product 1", "Product 2"]
+    assert first['scraped'] == 3
+
+    second = runner.sweep(db, scraper, service, 1, time_budget=3, batch_size=2)
+    assert scraper.searched[3:] == ["Product 3", "Product 4", "Product 5"]
+    assert second['last_product_id'] == 6
+
+    third = runner.sweep(db, scraper, service, 1, time_budget=3, batch_size=2)
+    assert scraper.searched[6:] == ["Product 6"]
+    assert third['last_product_id'] == 0
+    assert third['completed_sweeps'] == 1
+
+    # Next run wraps around to the start of the catalog
+    runner.sweep(db, scraper, service, 1, time_budget=1, batch_size=2)
+    assert scraper.searched[-1] == "Product 0"
+    assert "Retired" not in scraper.searched
+    assert db.query(Price).count() == 8
+    assert db.query(ScrapeCheckpoint).count() == 1
+
+def test_priority_schedule_favors_volatile_and_alerted(db, count_queries):
+    """Test next-due intervals follow volatility and alert proximity"""
+    from datetime import datetime, timedelta
+    from app.models import Product, Retailer, Price, PriceAlert, ScrapeSchedule
+    from app.services import scrape_priority
+
+    db.add(Retailer(id=1, name="Priority Test", base_url="https://example.com"))
+    stable = Product(name="Stable", category="mac")
+    volatile = Product(name="Volatile", category="mac")
+    alerted = Product(name="Alerted", category="mac")
+    db.add_all([stable, volatile, alerted])
+    db.flush()
+
+    now = datetime.utcnow()
+    series = {
+        stable.id: [1000, 1000, 1001, 1000],
+        volatile.id: [1000, 850, 1100, 900],
+        alerted.id: [500, 500, 501, 500]
+    }
+    for product_id, prices in series.items():
+        for hours, price in enumerate(prices):
+            db.add(Price(product_id=product_id, retailer_id=1, price=price,
+                         scraped_at=now - timedelta(hours=len(prices) - hours)))
+    db.add(PriceAlert(product_id=alerted.id, target_price=490, condition="below"))
+    db.commit()
+
+    product_ids = [stable.id, volatile.id, alerted.id]
+    before = count_queries()
+    intervals = scrape_priority.reschedule_many(db, 1, product_ids)
+    assert count_queries() - before == 3  # volatility, latest prices, alert targets
+
+    assert intervals[volatile.id] == scrape_priority.MIN_INTERVAL_MINUTES
+    assert intervals[alerted.id] < intervals[stable.id]
+    assert intervals[stable.id] > 6 * 60
+    assert intervals[stable.id] <= scrape_priority.MAX_INTERVAL_MINUTES
+
+    # Each interval follows from the pair's own statistics
+    from statistics import mean, pstdev
+    cv = {product_id: pstdev(prices) / mean(prices) for product_id, prices in series.items()}
+    assert intervals[stable.id] == pytest.approx(scrape_priority.schedule_interval(4, cv[stable.id], None))
+    assert intervals[alerted.id] == pytest.approx(scrape_priority.schedule_interval(4, cv[alerted.id], 10 / 490))
+    assert scrape_priority.schedule_interval(2, 1.0, None) == scrape_priority.DEFAULT_INTERVAL_MINUTES
+    assert scrape_priority.schedule_interval(2, 0.0, 0.0) < scrape_priority.DEFAULT_INTERVAL_MINUTES
+
+    # A second batch updates the schedules in place
+    assert scrape_priority.reschedule_many(db, 1, product_ids) == pytest.approx(intervals)
+    schedules = {schedule.product_id: schedule for schedule in db.query(ScrapeSchedule).all()}
+    assert len(schedules) == 3
+    assert schedules[alerted.id].alert_proximity == pytest.approx(10 / 490)
+    assert schedules[stable.id].alert_proximity is None
+    assert schedules[volatile.id].volatility == pytest.approx(cv[volatile.id])
+
+def test_sweep_skips_products_not_due(db):
+    """Test prioritized sweep only scrapes due products"""
+    from datetime import datetime, timedelta
+    from app.models import Product, Retailer, ScrapeSchedule
+    from app.services.scraper_service import ScraperService
+    from scrapers.runner import ScraperRunner
+
+    db.add(Retailer(id=1, name="Due Test", base_url="https://example.com"))
+    products = [Product(name=f"Product {i}", category="mac") for i in range(3)]
+    db.add_all(products)
+    db.flush()
+    db.add(ScrapeSchedule(product_id=products[1].id, retailer_id=1,
+                          next_due_at=datetime.utcnow() + timedelta(hours=1)))
+    db.add(ScrapeSchedule(product_id=products[2].id, retailer_id=1,
+                          next_due_at=datetime.utcnow() - timedelta(minutes=1)))
+    db.commit()
+
+    scraper = _RecordingScraper({'now': 0.0})
+    ScraperRunner(use_async=False).sweep(db, scraper, ScraperService(db), 1, time_budget=60)
+    assert scraper.searched == ["Product 0", "Product 2"]
+
+    # Just-scraped products are no longer due
+    ScraperRunner(use_async=False).sweep(db, scraper, ScraperService(db), 1, time_budget=60)
+    assert scraper.searched == ["Product 0", "Product 2"]
+    assert db.query(ScrapeSchedule).filter(ScrapeSchedule.next_due_at > datetime.utcnow()).count() == 3
+
+def test_scrape_job_leases_are_exclusive_and_expire(db):
+    """Test workers never share a lease and abandoned leases are retried"""
+    from datetime import datetime, timedelta
+    from app.models import Product, Retailer, ScrapeJob
+    from scrapers import job_queue
+
+    db.add(Retailer(id=1, name="Queue Test", base_url="https://example.com"))
+    db.add_all([Product(name=f"Product {i}", category="mac") for i in range(5)])
+    db.commit()
+
+    assert job_queue.enqueue_due_jobs(db, 1) == 5
+    assert job_queue.enqueue_due_jobs(db, 1) == 0  # already queued
+
+    first = job_queue.claim_jobs(db, "worker-a", limit=3)
+    second = job_queue.claim_jobs(db, "worker-b", limit=3)
+    assert len(first) == 3 and len(second) == 2
+    assert not {job.id for job in first} & {job.id for job in second}
+    assert job_queue.claim_jobs(db, "worker-c") == []
+
+    # worker-a dies: its leases lapse and worker-c picks them up
+    db.query(ScrapeJob).filter(ScrapeJob.lease_owner == "worker-a").update(
+        {ScrapeJob.leased_until: datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db.commit()
+    retried = job_queue.claim_jobs(db, "worker-c")
+    assert sorted(job.id for job in retried) == sorted(job.id for job in first)
+    assert all(job.attempts == 2 for job in retried)
+
+    # The old owner can no longer heartbeat or complete them
+    assert job_queue.heartbeat(db, "worker-a", [job.id for job in first]) == 0
+    assert job_queue.complete_jobs(db, "worker-a", [job.id for job in first]) == 0
+    assert job_queue.complete_jobs(db, "worker-c", [job.id for job in retried]) == 3
+    assert job_queue.queue_stats(db) == {'done': 3, 'leased': 2}
+
+def test_scrape_worker_completes_claimed_jobs(db):
+    """Test a worker scrapes its leased jobs and reschedules them"""
+    from app.models import Product, Retailer, Price, ScrapeJob, ScrapeSchedule
+    from scrapers.job_queue import enqueue_due_jobs
+    from scrapers.worker import ScrapeWorker
+    from tests.conftest import TestingSessionLocal
+
+    class FakeScraper(_RecordingScraper):
+        def __init__(self, retailer_id, base_url):
+            super().__init__({'now': 0.0})
+
+    db.add(Retailer(id=1, name="Worker Test", base_url="https://example.com", scraper_type="fake"))
+    db.add_all([Product(name=f"Product {i}", category="mac") for i in range(3)])
+    db.commit()
+    enqueue_due_jobs(db, 1)
+
+    worker = ScrapeWorker("worker-a", session_factory=TestingSessionLocal, use_async=False,
+                          scraper_classes={'fake': FakeScraper})
+    assert worker.run_once() == 3
+    assert worker.run_once() == 0
+
+    db.expire_all()
+    assert {job.status for job in db.query(ScrapeJob).all()} == {'done'}
+    assert db.query(Price).count() == 3
+    assert db.query(ScrapeSchedule).count() == 3
+
+def test_scrape_worker_retries_jobs_when_ingest_fails(db, monkeypatch):
+    """Test a failed ingest leaves the claimed jobs retryable instead of done"""
+    from app.models import Product, Retailer, Price, ScrapeJob, ScrapeSchedule
+    from app.services.scraper_service import ScraperService
+    from scrapers.job_queue import enqueue_due_jobs
+    from scrapers.worker import ScrapeWorker
+    from tests.conftest import TestingSessionLocal
+
+    class FakeScraper(_RecordingScraper):
+        def __init__(self, retailer_id, base_url):
+            super().__init__({'now': 0.0})
+
+    def failing_batch(self, items):
+        raise RuntimeError("database is down")
+
+    monkeypatch.setattr(ScraperService, "process_scraped_batch", failing_batch)
+    db.add(Retailer(id=1, name="Worker Test", base_url="https://example.com", scraper_type="fake"))
+    db.add_all([Product(name=f"Product {i}", category="mac") for i in range(3)])
+    db.commit()
+    enqueue_due_jobs(db, 1)
+
+    worker = ScrapeWorker("worker-a", session_factory=TestingSessionLocal, use_async=False,
+                          scraper_classes={'fake': FakeScraper})
+    assert worker.run_once() == 3
+
+    db.expire_all()
+    jobs = db.query(ScrapeJob).all()
+    assert {job.status for job in jobs} == {'pending'}
+    assert all(job.attempts == 1 and "database is down" in job.last_error for job in jobs)
+    assert db.query(Price).count() == 0
+    assert db.query(ScrapeSchedule).count() == 0
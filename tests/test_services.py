@@ -0,0 +1,683 @@
+"""
+Tests for services
+"""
+
+import pytest
+from datetime import datetime, timedelta
+
+from app.models import Product, Retailer, Price, PriceAlert, PriceHistory
+from app.services.scraper_service import ScraperService
+
+@pytest.fixture
+def retailer(db):
+    retailer = Retailer(id=1, name="Test Retailer", base_url="https://example.com")
+    db.add(retailer)
+    db.commit()
+    return retailer
+
+def _price(price, **extra):
+    return {'retailer_id': 1, 'price': price, 'condition': 'used', **extra}
+
+def test_process_scraped_batch(db, retailer, count_queries):
+    """Test batch ingest resolves keys once and evaluates alerts per batch"""
+    existing = Product(name="MacBook Air M2", category="mac")
+    db.add(existing)
+    db.flush()
+    db.add(PriceAlert(product_id=existing.id, target_price=900, condition="below", trigger_count=0))
+    db.commit()
+
+    service = ScraperService(db)
+    items = [
+        {'product': {'name': "MacBook Air M2", 'category': "mac"}, 'prices': [_price(950), _price(899)]},
+        {'product': {'name': "Mac mini M2", 'category': "mac"}, 'prices': [_price(499)]},
+        {'product': {'name': "Mac mini M2", 'category': "mac"}, 'prices': [_price(489)]},
+        {'product': {'name': "Mac mini M2", 'category': "audio"}, 'prices': []}
+    ]
+    before = count_queries()
+    product_ids = service.process_scraped_batch(items)
+    # Key lookup and re-read of the inserted keys, the alert index load, then
+    # the triggered alert read back to queue its notifications
+    assert count_queries() - before <= 6
+
+    assert product_ids[0] == existing.id
+    assert product_ids[1] == product_ids[2] != product_ids[3]
+    assert db.query(Product).count() == 3
+    assert db.query(Price).count() == 4
+
+    alert = db.query(PriceAlert).one()
+    assert alert.trigger_count == 1
+
+def test_process_scraped_batch_mixed_optional_fields(db, retailer):
+    """Test price rows with different optional fields are stored as given, with one INSERT statement"""
+    from sqlalchemy import event
+    from tests.conftest import engine
+
+    inserts = []
+    count_inserts = lambda conn, cursor, statement, *args: inserts.append(statement) if statement.startswith("INSERT INTO prices") else None
+    event.listen(engine, "before_cursor_execute", count_inserts)
+    service = ScraperService(db)
+    service.process_scraped_batch([
+        {'product': {'name': "AirPods Pro", 'category': "audio"}, 'prices': [
+            _price(199, shipping_cost=5.0),
+            _price(189, listing_url="https://example.com/a", seller_rating=4.8),
+            _price(179),
+            _price(209, currency="EUR", availability="in_stock"),
+        ]}
+    ])
+    event.remove(engine, "before_cursor_execute", count_inserts)
+    assert len(set(inserts)) == 1  # one column set: a single executemany batch on Postgres
+    stored = {p.price: p for p in db.query(Price)}
+    assert (stored[199].shipping_cost, stored[199].listing_url) == (5.0, None)
+    assert (stored[189].shipping_cost, stored[189].listing_url, stored[189].seller_rating) == (None, "https://example.com/a", 4.8)
+    assert (stored[179].currency, stored[209].currency, stored[209].availability) == ("USD", "EUR", "in_stock")
+
+def test_product_key_cache_skips_lookup(db, retailer, count_queries):
+    """Test cached product keys skip the lookup and stale ids are dropped"""
+    from app.services.product_cache import ProductKeyCache, get_product_cache
+
+    cache = get_product_cache()
+    service = ScraperService(db)
+    item = {'product': {'name': "iPad Pro", 'category': "mac"}, 'prices': [_price(799)]}
+
+    product_id = service.process_scraped_batch([item])[0]
+    before = count_queries()
+    assert service.process_scraped_batch([item]) == [product_id]
+    assert count_queries() == before  # no key lookup, and alerts matched in memory
+    assert db.query(Product).count() == 1
+
+    cache.invalidate(product_id)
+    assert cache.get(("iPad Pro", "mac")) is None
+
+    small = ProductKeyCache(maxsize=2)
+    for i in range(3):
+        small.put((f"Product {i}", "mac"), i)
+    assert small.get(("Product 0", "mac")) is None
+    assert small.get(("Product 2", "mac")) == 2
+
+def test_resolve_products_upserts_on_conflict(db, retailer, monkeypatch):
+    """Test find-or-create converges on one row per (name, category)"""
+    db.add(Product(name="Raced", category="mac"))
+    db.commit()
+    service = ScraperService(db)
+
+    # The first lookup misses, as if another scraper inserted the row just after it
+    lookup = service._lookup_products
+    calls = []
+    monkeypatch.setattr(service, '_lookup_products', lambda keys: lookup(keys) if calls.append(keys) or len(calls) > 1 else {})
+
+    ids = service._resolve_products([{'name': "Raced", 'category': "mac"}, {'name': "Fresh", 'category': "mac"}])
+    assert len(set(ids)) == 2
+    assert db.query(Product).filter(Product.name == "Raced").count() == 1
+
+def test_create_duplicate_product_conflicts(client):
+    """Test the unique (name, category) index surfaces as 409"""
+    product = {"name": "Duplicate Mac", "category": "mac"}
+    assert client.post("/api/v1/products/", json=product).status_code == 200
+    assert client.post("/api/v1/products/", json=product).status_code == 409
+    assert client.post("/api/v1/products/", json={**product, "category": "other"}).status_code == 200
+
+def test_latest_prices_maintained_on_ingest(db, retailer):
+    """Test ingest keeps latest_prices equal to a rebuild from history"""
+    from datetime import datetime, timedelta
+    from app.models import LatestPrice
+    from app.services.latest_prices import rebuild_latest_prices
+
+    service = ScraperService(db)
+    product = {'name': "MacBook Air M2", 'category': "mac"}
+    service.process_scraped_batch([{'product': product, 'prices': [_price(950), _price(920), _price(999, condition='new')]}])
+    service.process_scraped_batch([{'product': product, 'prices': [_price(980), _price(940)]}])
+
+    # A manual, older observation only lowers the all-time low
+    service.process_scraped_data(product, [_price(700, scraped_at=datetime.utcnow() - timedelta(days=3))])
+
+    def snapshot():
+        db.expire_all()
+        return {
+            row.condition: (row.price, row.previous_price, row.lowest_price)
+            for row in db.query(LatestPrice).order_by(LatestPrice.condition)
+        }
+
+    maintained = snapshot()
+    assert maintained == {'used': (940, 920, 700), 'new': (999, None, 999)}
+    assert db.query(Product.best_price).scalar() == 940
+
+    assert rebuild_latest_prices(db) == 2
+    assert snapshot() == maintained
+
+def _daily_prices(db, product_id, start, days, per_day=3):
+    """per_day prices a day, rising through each day"""
+    db.add_all([
+        Price(product_id=product_id, retailer_id=1, price=100 + day * 10 + i,
+              scraped_at=start + timedelta(days=day, hours=6 * i))
+        for day in range(days) for i in range(per_day)
+    ])
+    db.commit()
+
+def test_retention_rolls_up_then_prunes(db, retailer, monkeypatch):
+    """Test complete days roll up into price_history before raw rows are pruned"""
+    from app.services import retention
+
+    monkeypatch.setattr(retention, "PRICE_RETENTION_DAYS", 5)
+    product = Product(name="MacBook Pro", category="mac")
+    db.add(product)
+    db.commit()
+    start = datetime(2026, 1, 1)
+    _daily_prices(db, product.id, start, days=10)
+
+    now = start + timedelta(days=9, hours=12)
+    result = retention.run_retention(db, now=now)
+    # Days 0-8 are complete; day 9 is still raw
+    assert result["rolled_up"] == 9
+    assert result["deleted"] == 4 * 3
+
+    first = db.query(PriceHistory).order_by(PriceHistory.recorded_at).first()
+    assert first.recorded_at == start
+    assert (first.price, first.min_price, first.avg_price, first.max_price) == (102, 100, 101, 102)
+    assert db.query(Price).count() == 6 * 3
+    assert min(p.scraped_at for p in db.query(Price)) == start + timedelta(days=4)
+
+    # Re-running the same day adds nothing
+    assert retention.run_retention(db, now=now)["rolled_up"] == 0
+
+def test_retention_rolls_up_each_product_independently(db, retailer, monkeypatch):
+    """Test a newer rollup for one product neither skips nor prunes another's days"""
+    from app.services import retention
+
+    monkeypatch.setattr(retention, "PRICE_RETENTION_DAYS", 5)
+    ahead = Product(name="Mac mini", category="mac")
+    behind = Product(name="Mac Studio", category="mac")
+    db.add_all([ahead, behind])
+    db.commit()
+    start = datetime(2026, 1, 1)
+    _daily_prices(db, behind.id, start, days=10)
+    # A rollup written elsewhere, newer than anything behind has rolled up
+    db.add(PriceHistory(product_id=ahead.id, retailer_id=1, price=1, recorded_at=start + timedelta(days=8)))
+    db.commit()
+
+    now = start + timedelta(days=9, hours=12)
+    assert retention.prune_prices(db, now=now) == 0  # nothing of behind's is rolled up yet
+    result = retention.run_retention(db, now=now)
+    assert result["rolled_up"] == 9
+    assert result["deleted"] == 4 * 3
+    assert db.query(PriceHistory).filter(PriceHistory.product_id == behind.id).count() == 9
+
+    # A late price for a day without a rollup is rolled up on the next run
+    db.add(Price(product_id=ahead.id, retailer_id=1, price=50, scraped_at=start + timedelta(days=6)))
+    db.commit()
+    assert retention.run_retention(db, now=now)["rolled_up"] == 1
+
+def test_long_history_reads_rollups(client, db, retailer):
+    """Test long windows return daily rollups then raw prices after the horizon"""
+    from app.services.retention import RAW_HISTORY_DAYS, day_start, rollup_prices
+
+    product = Product(name="iPad Air", category="mac")
+    db.add(product)
+    db.commit()
+    today = day_start(datetime.utcnow())
+    _daily_prices(db, product.id, today - timedelta(days=RAW_HISTORY_DAYS + 10), days=RAW_HISTORY_DAYS + 11)
+    rollup_prices(db)
+
+    short = client.get(f"/api/v1/products/{product.id}/prices/history?days=7").json()
+    assert short["resolution"] == "raw"
+    assert short["data_points"] >= 7 * 3 and "avg_price" not in short["history"][0]
+
+    long = client.get(f"/api/v1/products/{product.id}/prices/history?days={RAW_HISTORY_DAYS + 5}").json()
+    assert long["resolution"] == "day"
+    # Daily rollups, then today's raw prices bucketed the same way
+    assert long["data_points"] == RAW_HISTORY_DAYS + 5 + 1
+    assert long["history"][0]["points"] == 1 and long["history"][-1]["points"] == 3
+    assert long["history"][-1]["min_price"] < long["history"][-1]["max_price"] == long["history"][-1]["price"]
+
+def test_history_buckets_per_retailer(client, db, retailer):
+    """Test hour/week buckets aggregate last/min/avg/max per retailer in SQL"""
+    from app.services.retention import day_start
+
+    db.add(Retailer(id=2, name="Other Retailer", base_url="https://other.example.com"))
+    product = Product(name="iPhone 15", category="mac")
+    db.add(product)
+    db.commit()
+    start = day_start(datetime.utcnow()) - timedelta(days=3)
+    db.add_all([
+        Price(product_id=product.id, retailer_id=retailer_id, price=price, scraped_at=start + timedelta(minutes=minutes))
+        for retailer_id, price, minutes in [(1, 500, 0), (1, 480, 20), (1, 490, 40), (2, 520, 10), (1, 470, 70)]
+    ])
+    db.commit()
+
+    hourly = client.get(f"/api/v1/products/{product.id}/prices/history?days=7&resolution=hour").json()
+    assert [(p["retailer_id"], p["price"], p["min_price"], p["avg_price"], p["max_price"], p["points"]) for p in hourly["history"]] == [
+        (1, 490, 480, 490, 500, 3), (2, 520, 520, 520, 520, 1), (1, 470, 470, 470, 470, 1)
+    ]
+    assert hourly["history"][0]["scraped_at"].startswith(start.strftime("%Y-%m-%dT%H:00:00"))
+
+    weekly = client.get(f"/api/v1/products/{product.id}/prices/history?days=7&buckets=2").json()
+    assert weekly["resolution"] == "week"
+    assert {p["retailer_id"]: p["points"] for p in weekly["history"]} == {1: 4, 2: 1}
+
+def test_history_downsampled_with_lttb(client, db, retailer):
+    """Test max_points caps raw history and keeps the extremes"""
+    from app.services.price_history import lttb
+
+    assert lttb([(x, 0) for x in range(10)], 20) == list(range(10))
+    assert lttb([(x, 0) for x in range(100)], 10)[0::9] == [0, 99]
+
+    product = Product(name="AirPods Pro", category="audio")
+    db.add(product)
+    db.commit()
+    start = datetime.utcnow() - timedelta(days=2)
+    prices = [100 + (i % 10) for i in range(500)]
+    prices[250] = 10  # a flash sale the chart must not lose
+    db.add_all([
+        Price(product_id=product.id, retailer_id=1, price=price, scraped_at=start + timedelta(minutes=5 * i))
+        for i, price in enumerate(prices)
+    ])
+    db.commit()
+
+    history = client.get(f"/api/v1/products/{product.id}/prices/history?days=7&max_points=50").json()
+    assert history["downsampled"] is True
+    assert history["data_points"] == 50
+    assert 10 in [point["price"] for point in history["history"]]
+
+    full = client.get(f"/api/v1/products/{product.id}/prices/history?days=7").json()
+    assert (full["downsampled"], full["data_points"]) == (False, 500)
+
+def test_downsample_many_series_within_max_points():
+    """Test the point budget holds however many retailers share it"""
+    from app.services.price_history import downsample, series_budgets
+
+    start = datetime(2024, 1, 1)
+    history = [
+        {"retailer_id": r, "price": 100 + (i % 7), "scraped_at": start + timedelta(minutes=i)}
+        for r in range(40) for i in range(20 if r else 5)
+    ]
+    for max_points in (3, 50, 79, 100, 500):
+        result = downsample(history, max_points)
+        assert len(result) <= max_points
+    assert len(downsample(history, 1000)) == len(history)
+
+    # The short series keeps everything, the remainder goes to the longest
+    assert series_budgets([5, 100, 200], 60) == [5, 27, 28]
+    # Series left fewer than 3 points keep first and last (or drop out)
+    assert series_budgets([100] * 5, 3) == [0, 0, 1, 1, 1]
+    pair = downsample([p for p in history if p["retailer_id"] == 1], 2)
+    assert [p["scraped_at"] for p in pair] == [start, start + timedelta(minutes=19)]
+
+def test_response_cache_off_for_queue_workers_without_redis():
+    """Test queue workers' writes can't leave the in-process cache stale"""
+    from app.services.response_cache import response_cache_enabled
+
+    assert response_cache_enabled(True, work_queue=False, redis_url=None) is True
+    assert response_cache_enabled(True, work_queue=True, redis_url=None) is False
+    assert response_cache_enabled(True, work_queue=True, redis_url="redis://localhost:6379/0") is True
+    assert response_cache_enabled(False, work_queue=False, redis_url=None) is False
+
+def test_response_cache_shared_backend():
+    """Test invalidation in one process reaches another through the shared backend"""
+    from app.services.response_cache import MemoryBackend, ResponseCache, etag_matches, product_tag
+
+    shared = MemoryBackend()
+    api, worker = ResponseCache(shared=shared), ResponseCache(shared=shared)
+    url, tags = "/api/v1/products/1?", [product_tag(1)]
+
+    entry = api.put(api.key(url, tags), b'{"id": 1}', "application/json")
+    assert worker.get(worker.key(url, tags))[:3] == entry[:3]  # filled from the shared backend
+    assert etag_matches(f'W/{entry.etag}, "other"', entry.etag) and not etag_matches('"other"', entry.etag)
+
+    worker.invalidate(tags)
+    assert api.get(api.key(url, tags)) is None
+    assert api.get(api.key("/api/v1/products/2?", [product_tag(2)])) is None
+    assert (api.stats()["hits"], api.stats()["misses"]) == (0, 2)
+
+def test_alerts_evaluated_in_one_query(db, retailer, count_queries):
+    """Test below/above targets, 5% drops and the 24h cooldown are applied in SQL"""
+    from app.routers.alerts import check_and_trigger_alerts
+
+    service = ScraperService(db)
+    scrapes = {"MacBook Air": (1000, 990), "Mac mini": (500, 470), "iMac": (300, 290)}
+    for i in range(2):
+        service.process_scraped_batch([
+            {'product': {'name': name, 'category': "mac"}, 'prices': [_price(prices[i])]} for name, prices in scrapes.items()
+        ])
+    air, mini, imac = (db.query(Product).filter(Product.name == name).one().id for name in scrapes)
+    unpriced = Product(name="Mac Pro", category="mac")
+    db.add(unpriced)
+    db.flush()
+
+    now = datetime.utcnow()
+    alerts = [
+        PriceAlert(product_id=air, target_price=995, condition="below"),    # fires
+        PriceAlert(product_id=air, target_price=900, condition="below"),    # 1% drop only
+        PriceAlert(product_id=air, target_price=980, condition="above"),    # fires
+        PriceAlert(product_id=air, target_price=1200, condition="above"),
+        PriceAlert(product_id=mini, target_price=100, condition="below"),   # fires on the 6% drop
+        PriceAlert(product_id=imac, target_price=295, condition="below", last_triggered=now - timedelta(hours=1)),
+        PriceAlert(product_id=imac, target_price=295, condition="below", last_triggered=now - timedelta(days=2), trigger_count=3),
+        PriceAlert(product_id=air, target_price=10000, condition="below", is_active=False),
+        PriceAlert(product_id=unpriced.id, target_price=10000, condition="below"),
+    ]
+    db.add_all(alerts)
+    db.commit()
+    ids = [alert.id for alert in alerts]
+
+    before = count_queries()
+    assert check_and_trigger_alerts(db) == [ids[0], ids[2], ids[4], ids[6]]
+    assert count_queries() - before == 1
+
+    db.expire_all()
+    assert [alert.trigger_count for alert in alerts] == [1, 0, 1, 0, 1, 0, 4, 0, 0]
+    assert check_and_trigger_alerts(db) == []  # all inside the cooldown now
+
+def test_alert_index_fires_at_ingest(client, db, retailer, count_queries):
+    """Test ingest matches prices against indexed targets, kept current by the alerts API"""
+    from app.services.alert_index import Thresholds, get_alert_index
+
+    thresholds = Thresholds([(900, 1), (950, 2), (950, 3), (1000, 4)])
+    assert thresholds.at_or_above(950) == [2, 3, 4] and thresholds.at_or_below(950) == [1, 2, 3]
+    thresholds.remove(950, 2)
+    assert thresholds.at_or_above(901) == [3, 4]
+
+    service = ScraperService(db)
+    item = lambda price: {'product': {'name': "MacBook Air M2", 'category': "mac"}, 'prices': [_price(price), _price(price + 50)]}
+    product_id = service.process_scraped_batch([item(1000)])[0]
+    service.process_scraped_batch([{**item(500), 'product': {'name': "Mac mini", 'category': "mac"}}])[0]
+
+    create = lambda **alert: client.post("/api/v1/alerts/", json={'product_id': product_id, **alert}).json()["id"]
+    below = create(target_price=950, condition="below")
+    above = create(target_price=1100, condition="above")
+    toggled = create(target_price=990, condition="below")
+    client.put(f"/api/v1/alerts/{toggled}/toggle")
+    deleted = create(target_price=990, condition="below")
+    client.delete(f"/api/v1/alerts/{deleted}")
+    assert get_alert_index().stats() == {'alerts': 2, 'products': 1}
+
+    # No target met: matched in memory without touching the database
+    before = count_queries()
+    service.process_scraped_batch([item(980)])
+    service.process_scraped_batch([{**item(100), 'product': {'name': "Mac mini", 'category': "mac"}}])
+    assert count_queries() == before
+    assert db.query(PriceAlert).filter(PriceAlert.trigger_count > 0).count() == 0
+
+    service.process_scraped_batch([item(940)])
+    service.process_scraped_batch([item(930)])  # inside the cooldown
+    service.process_scraped_batch([item(1150)])
+    db.expire_all()
+    assert {alert.id: alert.trigger_count for alert in db.query(PriceAlert)} == {below: 1, above: 1, toggled: 0}
+
+    client.put(f"/api/v1/alerts/{toggled}/toggle")
+    client.delete(f"/api/v1/products/{product_id}")
+    assert get_alert_index().stats() == {'alerts': 0, 'products': 0}
+
+def test_notification_outbox_queued_with_claim_and_retried(db, retailer, monkeypatch):
+    """Test fired alerts queue one notification per channel and the dispatcher retries failures"""
+    import asyncio
+    from concurrent.futures import Future
+    from app.models import NotificationOutbox
+    from app.routers.alerts import check_and_trigger_alerts
+    from app.services import notification_outbox as outbox
+    from app.services.alert_evaluation import alert_rows_query
+    from app.services.alert_index import get_alert_index
+    from app.services.email_sender import NotificationService
+    from app.services.telegram_service import TelegramClient
+    from benchmarks.mock_telegram import MockBotApi
+    from tests.conftest import TestingSessionLocal
+
+    # The ingesting process has no Telegram or SMTP settings; only the dispatcher needs them
+    monkeypatch.setattr(outbox, "telegram_configured", lambda: False)
+    monkeypatch.delenv("SMTP_USERNAME", raising=False)
+
+    service = ScraperService(db)
+    item = lambda price: {'product': {'name': "MacBook Air M2", 'category': "mac"}, 'prices': [_price(price)]}
+    product_id = service.process_scraped_batch([item(1000)])[0]
+    alert = PriceAlert(product_id=product_id, target_price=950, condition="below",
+                       email="doug@example.com", webhook_url="http://127.0.0.1:9/hook")
+    db.add(alert)
+    db.commit()
+    get_alert_index().add(alert)
+
+    # Ingest claims the alert and queues its notifications; nothing is sent inline
+    service.process_scraped_batch([item(940)])
+    queued = lambda: [(n.channel, n.target, n.status, n.attempts) for n in db.query(NotificationOutbox).order_by(NotificationOutbox.id)]
+    assert queued() == [("telegram", None, "pending", 0), ("email", "doug@example.com", "pending", 0),
+                        ("webhook", "http://127.0.0.1:9/hook", "pending", 0)]
+    assert db.query(NotificationOutbox).first().payload["current_price"] == 940
+
+    # Re-queueing the same trigger is a no-op; the cron check is inside the cooldown
+    db.refresh(alert)
+    outbox.enqueue_alert_notifications(db, db.execute(alert_rows_query([alert.id])).all(), alert.last_triggered)
+    db.commit()
+    assert check_and_trigger_alerts(db) == []
+    assert db.query(NotificationOutbox).count() == 3
+
+    monkeypatch.setattr(outbox, "telegram_configured", lambda: True)
+    monkeypatch.setattr(outbox, "TELEGRAM_CHAT_ID", "42")
+    monkeypatch.setenv("SMTP_USERNAME", "alerts")
+    monkeypatch.setenv("SMTP_PASSWORD", "secret")
+
+    class FlakyEmail(NotificationService):
+        sends = []
+
+        def submit_email(self, to_email, subject, body, html=False):
+            self.sends.append(to_email)
+            future = Future()
+            future.set_result(len(self.sends) > 1)
+            return future
+
+    async def drain(dispatcher):
+        try:
+            return await dispatcher.drain()
+        finally:
+            await dispatcher.close()
+            await dispatcher.telegram.close()
+
+    with MockBotApi(latency=0) as mock:
+        dispatcher = lambda: outbox.OutboxDispatcher("test", session_factory=TestingSessionLocal,
+                                                     telegram=TelegramClient(api_url=mock.api_url), notification=FlakyEmail())
+        assert asyncio.run(drain(dispatcher())) == 3
+        db.expire_all()
+        assert [row[2:] for row in queued()] == [("sent", 1), ("pending", 1), ("pending", 1)]
+        assert mock.messages == {"42": 1}
+        assert asyncio.run(drain(dispatcher())) == 0  # retries wait out their backoff
+
+        db.query(NotificationOutbox).update({NotificationOutbox.next_attempt_at: datetime.utcnow()})
+        db.commit()
+        monkeypatch.setattr(outbox, "NOTIFICATION_MAX_ATTEMPTS", 2)
+        assert asyncio.run(drain(dispatcher())) == 2
+        db.expire_all()
+        assert [row[2:] for row in queued()] == [("sent", 1), ("sent", 2), ("failed", 2)]
+        assert mock.messages == {"42": 1}
+    assert db.query(NotificationOutbox).filter(NotificationOutbox.status == "failed").one().last_error
+
+    # A dispatcher without a channel's settings records the row as skipped, not sent or retried
+    monkeypatch.setattr(outbox, "telegram_configured", lambda: False)
+    db.add(NotificationOutbox(idempotency_key="unconfigured", channel="telegram", payload={}, next_attempt_at=datetime.utcnow()))
+    db.commit()
+    unconfigured = outbox.OutboxDispatcher("test", session_factory=TestingSessionLocal, telegram=object())
+    assert asyncio.run(unconfigured.drain()) == 1
+    assert unconfigured.stats() == {'sent': 0, 'skipped': 1, 'failed': 0}
+    db.expire_all()
+    skipped = db.query(NotificationOutbox).filter_by(idempotency_key="unconfigured").one()
+    assert (skipped.status, skipped.last_error) == ("skipped", "Telegram not configured")
+
+def test_smtp_pool_reuses_connections_and_reconnects():
+    """Test pooled emails share logged-in connections, rejections don't retry and dropped connections reopen"""
+    pytest.importorskip("aiosmtpd")
+    import socket
+    from email.message import EmailMessage
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import AuthResult
+    from app.services.email_sender import SMTPPool
+
+    class Sink:
+        def __init__(self):
+            self.recipients = []
+            self.sessions = {}
+            self.logins = 0
+
+        async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+            if address.startswith("bounce"):
+                return "550 No such user"
+            envelope.rcpt_tos.append(address)
+            return "250 OK"
+
+        async def handle_DATA(self, server, session, envelope):
+            self.recipients.extend(envelope.rcpt_tos)
+            self.sessions[id(session)] = session
+            return "250 OK"
+
+        def authenticate(self, server, session, envelope, mechanism, auth_data):
+            self.logins += 1
+            return AuthResult(success=True)
+
+    def message(to):
+        message = EmailMessage()
+        message['From'] = "alerts@example.com"
+        message['To'] = to
+        message['Subject'] = "Price Alert"
+        message.set_content("Now $899")
+        return message
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    sink = Sink()
+    start = lambda: Controller(sink, hostname="127.0.0.1", port=port, authenticator=sink.authenticate, auth_require_tls=False)
+    controller = start()
+    controller.start()
+    pool = SMTPPool("127.0.0.1", port, "alerts", "secret", starttls=False, size=2, batch_size=10, timeout=5)
+    try:
+        results = pool.send_many([message(f"user{i}@example.com") for i in range(30)] + [message("bounce@example.com")])
+        assert results == [True] * 30 + [False]
+        assert len(sink.recipients) == 30
+        assert len(sink.sessions) == sink.logins == pool.stats()["connections"] <= 2
+        assert pool.stats()["reconnects"] == 0
+
+        # A server restart drops every connection; the next send reconnects and succeeds
+        controller.stop()
+        controller = start()
+        controller.start()
+        assert pool.send(message("after@example.com"))
+        assert sink.recipients[-1] == "after@example.com"
+        assert pool.stats()["reconnects"] == 1 and pool.stats()["failed"] == 1
+    finally:
+        pool.close()
+        controller.stop()
+
+def test_smtp_pool_resolves_futures_on_unexpected_errors(monkeypatch):
+    """Test non-SMTP errors fail only their message and a stuck email times out in the outbox"""
+    import asyncio
+    import smtplib
+    from concurrent.futures import Future
+    from email.message import EmailMessage
+    from app.services import notification_outbox as outbox
+    from app.services.email_sender import SMTPPool
+
+    class FakeSMTP:
+        starttls_error = None
+
+        def __init__(self, host, port, timeout=None):
+            pass
+
+        def starttls(self):
+            if FakeSMTP.starttls_error:
+                raise FakeSMTP.starttls_error
+
+        def login(self, username, password):
+            pass
+
+        def send_message(self, message):
+            if message['To'] == "broken@example.com":
+                raise UnicodeEncodeError("ascii", "é", 0, 1, "ordinal not in range")
+
+        def rset(self):
+            pass
+
+        def quit(self):
+            pass
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(smtplib, "SMTP", FakeSMTP)
+
+    def message(to):
+        message = EmailMessage()
+        message['To'] = to
+        message.set_content("Now $899")
+        return message
+
+    pool = SMTPPool("smtp.example.com", 587, "alerts", "secret", size=1, timeout=5)
+    try:
+        assert pool.send_many([message("broken@example.com"), message("ok@example.com")]) == [False, True]
+        FakeSMTP.starttls_error = RuntimeError("STARTTLS extension not supported by server")
+        pool.close()
+        assert pool.send(message("ok@example.com")) is False
+        assert pool.stats()["failed"] == 2
+    finally:
+        pool.close()
+
+    class StuckEmail:
+        email_configured = True
+
+        @staticmethod
+        def alert_email(*args):
+            return "subject", "body"
+
+        def submit_email(self, *args):
+            return Future()  # never resolves
+
+    monkeypatch.setattr(outbox, "EMAIL_TIMEOUT_SECONDS", 0.05)
+    dispatcher = outbox.OutboxDispatcher("test", telegram=object(), notification=StuckEmail())
+    payload = {'product_name': "iMac", 'current_price': 899, 'target_price': 900, 'condition': "below", 'url': ""}
+    error = asyncio.run(dispatcher.deliver({'channel': "email", 'target': "doug@example.com", 'payload': payload}))
+    assert error and "not sent within" in error
+
+def test_telegram_client_pools_paces_and_retries():
+    """Test concurrent sends share one session, respect per-chat pacing and retry 429s"""
+    import asyncio
+    import time
+    from app.services.telegram_service import TelegramClient
+    from benchmarks.mock_telegram import MockBotApi
+
+    async def send(client, messages):
+        try:
+            return await asyncio.gather(*(client.send_message(text, chat_id=chat_id) for chat_id, text in messages))
+        finally:
+            await client.close()
+
+    with MockBotApi(latency=0.05, chat_rate=100, global_rate=1000, retry_after=0.2) as mock:
+        client = TelegramClient(api_url=mock.api_url, max_concurrency=4, messages_per_second=1000, chat_messages_per_second=100)
+        assert asyncio.run(send(client, [(str(chat), "hi") for chat in range(12)])) == [True] * 12
+        assert 1 < mock.max_in_flight <= 4
+
+        # One chat is paced by its own bucket
+        client = TelegramClient(api_url=mock.api_url, messages_per_second=1000, chat_messages_per_second=20)
+        start = time.perf_counter()
+        asyncio.run(send(client, [("7", "a"), ("7", "b"), ("7", "c")]))
+        assert time.perf_counter() - start >= 0.1
+
+        # A 429 waits retry_after and retries; other errors give up
+        mock.reject_next = 1
+        client = TelegramClient(api_url=mock.api_url, messages_per_second=1000, chat_messages_per_second=100)
+        start = time.perf_counter()
+        assert asyncio.run(send(client, [("retry", "retry me")])) == [True]
+        assert time.perf_counter() - start >= 0.2
+        assert client.stats() == {'sent': 1, 'failed': 0, 'retried': 1, 'chats': 1}
+        assert mock.messages["retry"] == 1
+
+        client = TelegramClient(api_url=mock.api_url + "/missing", max_retries=1)
+        assert asyncio.run(send(client, [("9", "lost")])) == [False]
+        assert client.stats()["failed"] == 1 and client.stats()["retried"] == 0
+
+        # One session per client: a second live loop is refused, not given a leaked session
+        client = TelegramClient(api_url=mock.api_url, messages_per_second=1000, chat_messages_per_second=100)
+        bound = asyncio.new_event_loop()
+        try:
+            assert bound.run_until_complete(client.send_message("a", chat_id="loop"))
+            session = client._session
+            with pytest.raises(RuntimeError):
+                asyncio.run(client.send_message("b", chat_id="loop"))
+            assert bound.run_until_complete(client.send_message("c", chat_id="loop")) and client._session is session
+            bound.run_until_complete(client.close())
+            assert session.closed
+        finally:
+            bound.close()
+        assert asyncio.run(send(client, [("loop", "d")])) == [True]  # free to rebind once closed